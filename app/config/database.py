@@ -1,5 +1,7 @@
+import os
 from pymongo import MongoClient
 from .settings import settings
+from app.utils.db_profiler import command_profiler
 
 class Database:
     client = None
@@ -9,7 +11,16 @@ class Database:
     def connect(cls):
         """Connect to MongoDB"""
         if cls.client is None:
-            cls.client = MongoClient(settings.mongodb_uri)
+            cls.client = MongoClient(
+                settings.mongodb_uri,
+                minPoolSize=settings.mongo_min_pool_size,
+                maxPoolSize=settings.mongo_max_pool_size,
+                # Fail fast instead of pymongo's 30 s defaults while the
+                # primary is unreachable; the circuit breaker takes it from there
+                serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+                connectTimeoutMS=settings.mongo_connect_timeout_ms,
+                event_listeners=[command_profiler]
+            )
             cls.db = cls.client[settings.database_name]
         return cls.db
 
@@ -20,6 +31,19 @@ class Database:
             cls.connect()
         return cls.db
 
+    @classmethod
+    def _reset_after_fork(cls):
+        """
+        Drop a client inherited from the parent process.
+
+        MongoClient is not fork-safe: its sockets and monitor threads belong to
+        the parent. The child builds its own client on the next get_db().
+        The inherited client is deliberately not closed, that would end the
+        parent's sessions.
+        """
+        cls.client = None
+        cls.db = None
+
     @classmethod
     def close(cls):
         """Close database connection"""
@@ -27,3 +51,6 @@ class Database:
             cls.client.close()
             cls.client = None
             cls.db = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Database._reset_after_fork)
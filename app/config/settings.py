@@ -9,9 +9,145 @@ class Settings(BaseSettings):
     smtp_host: str = "p1432.use1.mysecurecloudhost.com"
     smtp_port: int = 465
     smtp_use_ssl: bool = True
+    smtp_starttls: bool = True  # Only used when not connecting over SSL
     frontend_url: str = "http://localhost:3000"
     jwt_secret: str = "default_secret_change_in_production"
 
+    # Production server (python -m app.server)
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0  # 0 = one worker per CPU core
+    server_loop: str = "auto"  # "auto" picks uvloop when installed
+    server_http: str = "auto"  # "auto" picks httptools when installed
+    server_keepalive_timeout: int = 5
+    server_backlog: int = 2048
+    server_graceful_timeout: int = 30  # Seconds to drain in-flight requests on shutdown
+    server_limit_max_requests: Optional[int] = None  # Recycle workers after this many requests
+
+    # Storage backend: "mongo" or "memory" (process-local, for tests and benchmarks)
+    storage_backend: str = "mongo"
+
+    # MongoDB connection pool
+    mongo_min_pool_size: int = 5
+    mongo_max_pool_size: int = 100
+
+    # MongoDB timeouts, circuit breaker and stale assistant reads
+    mongo_server_selection_timeout_ms: int = 2000
+    mongo_connect_timeout_ms: int = 2000
+    mongo_operation_timeout_s: float = 5.0  # per request-path operation, retries included
+    circuit_failure_threshold: int = 5  # consecutive failures opening the circuit
+    circuit_reset_timeout_s: float = 10.0  # then one trial call is let through
+    stale_cache_size: int = 10000  # last-known-good assistant reads kept per worker
+    stale_revalidate_budget_ms: float = 250.0  # serve the cached copy if the read takes longer
+
+    # Shared memory table for the workers of one host (app.utils.shared_memory)
+    shared_memory_path: str = ""  # "" = convis-<port>.shm under /dev/shm or the temp dir
+    shared_memory_slots: int = 65536
+    shared_memory_key_size: int = 64
+    shared_memory_value_size: int = 64
+
+    # Startup warm-up
+    warmup_smtp: bool = False
+    warmup_retry_interval_s: float = 2.0
+
+    # Idempotency-Key support
+    idempotency_ttl_s: float = 86400.0
+    idempotency_max_entries: int = 100000
+    idempotency_wait_timeout_s: float = 30.0
+    idempotency_claim_ttl_s: float = 120.0  # a key whose request never finished (worker died) frees up after this
+    idempotency_poll_interval_s: float = 0.2  # waiting on a request running in another worker
+
+    # Single-flight reads
+    singleflight_wait_timeout_s: float = 5.0
+
+    # Assistant change events (server-sent events)
+    change_stream_enabled: bool = True
+    sse_keepalive_s: float = 15.0
+    sse_queue_size: int = 256
+    sse_replay_buffer_size: int = 1000
+
+    # Runtime config bundles (per-user assistant snapshots)
+    config_bundle_cache_size: int = 10000
+    config_bundle_ttl_s: float = 30.0  # only applies without a change stream
+    config_bundle_gzip_level: int = 6
+
+    # Maintenance jobs (run by one worker, elected through a lease)
+    maintenance_enabled: bool = True
+    maintenance_lease_ttl_s: float = 60.0
+    maintenance_interval_s: float = 300.0
+    maintenance_batch_size: int = 500
+    maintenance_batch_pause_s: float = 0.5
+    maintenance_max_batches: int = 100
+    otp_ttl_s: float = 900.0
+    unverified_account_ttl_s: float = 604800.0
+    analytics_reconcile_interval_s: float = 3600.0
+    analytics_reconcile_days: int = 30  # daily created counts recomputed this far back
+    analytics_flush_interval_s: float = 1.0  # assistant analytics increments are merged and written this often
+
+    # Password reset: unknown emails per client before 429 (each miss still costs a bcrypt hash)
+    reset_password_unknown_email_limit: int = 10
+    reset_password_unknown_email_window_s: float = 60.0
+
+    # Bulk user import
+    import_batch_size: int = 500
+    import_hash_workers: int = 0  # 0 = one process per CPU
+    import_max_row_bytes: int = 65536
+
+    # Verification email outbox
+    email_outbox_size: int = 10000
+    email_batch_size: int = 50
+    email_max_attempts: int = 5  # then the email is given up and logged
+    email_retry_backoff_s: float = 30.0  # doubled after every failed attempt
+
+    # Authentication audit log (buffered, written in batches)
+    audit_enabled: bool = True
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval_s: float = 1.0
+    audit_enqueue_timeout_s: float = 0.5  # then the event is dropped
+    audit_max_attempts: int = 3  # writes of a batch before it is dropped
+    audit_retry_backoff_s: float = 1.0  # doubled after every failed write
+    audit_retention_s: float = 7776000.0  # 90 days (time-series collection)
+    audit_capped_bytes: int = 268435456  # 256 MB (capped collection fallback)
+
+    # Load shedding: per cost class concurrency limit, queue bound and target queue delay
+    load_shedding_enabled: bool = True
+    load_shedding_classes: dict[str, dict[str, float]] = {
+        "auth_cpu": {"limit": 8, "queue": 64, "target_ms": 500},
+        "db_reads": {"limit": 64, "queue": 512, "target_ms": 100},
+        "db_writes": {"limit": 32, "queue": 256, "target_ms": 200},
+        "smtp": {"limit": 8, "queue": 64, "target_ms": 1000},
+    }
+
+    # Request tracing
+    tracing_enabled: bool = True
+    trace_sample_rate: float = 0.01
+    trace_slow_ms: float = 1000.0  # slower traces are kept even when not sampled
+    trace_buffer_size: int = 500
+    trace_service_name: str = "convis-backend"
+    trace_export: str = ""  # "", "file" or "otlp_http"
+    trace_export_format: str = "json"  # "json" or "otlp" (file export only)
+    trace_export_path: str = "traces.ndjson"
+    trace_export_endpoint: str = "http://localhost:4318/v1/traces"
+
+    # MongoDB profiling
+    slow_query_threshold_ms: float = 100.0
+
+    # Logging
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_queue_size: int = 10000
+    log_sample_rates: dict[str, float] = {}  # e.g. {"app.routes": 0.1}
+
+    # Event loop monitoring
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 100.0
+    loop_block_threshold_ms: float = 100.0
+
+    # On-demand profiling (/debug/profile)
+    profiler_max_seconds: float = 60.0
+    profiler_min_interval_ms: float = 1.0
+
     class Config:
         env_file = ".env"
         case_sensitive = False
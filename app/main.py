@@ -1,17 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.register import registration_router, verify_email_router, check_user_router
 from app.routes.forgot_password import send_otp_router, verify_otp_router, reset_password_router
 from app.routes.access import login_router, logout_router
 from app.routes.ai_assistant import assistants_router
-from app.config.database import Database
+from app.routes.monitoring import metrics_router, debug_router
+from app.routes.admin import import_users_router, audit_router, analytics_router
+from app.middleware import (
+    MetricsMiddleware,
+    ServerTimingMiddleware,
+    IdempotencyMiddleware,
+    LoadSheddingMiddleware,
+    TracingMiddleware,
+    instrument_fastapi
+)
+from app.storage import get_storage
+from app.config.logging_config import setup_logging, shutdown_logging
+from app.config.settings import settings
+from app.utils.loop_monitor import loop_monitor
+from app.utils.warmup import warm_up, warmup_state
+from app.utils.assistant_events import assistant_events
+from app.utils.maintenance import maintenance_scheduler
+from app.utils.email_outbox import email_outbox
+from app.utils.audit_log import audit_log
+from app.utils.assistant_analytics import analytics_buffer
+from app.utils.password_hashing import shutdown_hash_pool
+from app.utils.tracing import start_exporter, stop_exporter
+import asyncio
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (queued, written by a background thread)
+setup_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -20,7 +40,50 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS
+# Replay responses of retried POSTs carrying an Idempotency-Key header
+app.add_middleware(
+    IdempotencyMiddleware,
+    routes={("POST", "/api/register/"), ("POST", "/api/ai-assistants/")}
+)
+
+# Attribute MongoDB commands to requests and report them in Server-Timing
+app.add_middleware(ServerTimingMiddleware)
+
+# Bound concurrency per cost class and shed overload with 503 + Retry-After
+if settings.load_shedding_enabled:
+    app.add_middleware(
+        LoadSheddingMiddleware,
+        routes={
+            # bcrypt, tens of milliseconds of CPU each
+            ("POST", "/api/access/login"): "auth_cpu",
+            ("POST", "/api/register/"): "auth_cpu",
+            ("POST", "/api/forgot_password/reset-password"): "auth_cpu",
+            # Waits on the SMTP server
+            ("POST", "/api/forgot_password/send-otp"): "smtp",
+            ("POST", "/api/register/check-user"): "db_reads",
+            ("POST", "/api/forgot_password/verify-otp"): "db_reads",
+            ("GET", "/api/ai-assistants/user/{user_id}"): "db_reads",
+            ("GET", "/api/ai-assistants/user/{user_id}/bundle"): "db_reads",
+            ("GET", "/api/ai-assistants/{assistant_id}"): "db_reads",
+            ("POST", "/api/register/verify-email"): "db_writes",
+            ("POST", "/api/ai-assistants/"): "db_writes",
+            ("PUT", "/api/ai-assistants/{assistant_id}"): "db_writes",
+            ("DELETE", "/api/ai-assistants/{assistant_id}"): "db_writes",
+        },
+        classes=settings.load_shedding_classes
+    )
+
+# Record per-route request metrics
+app.add_middleware(MetricsMiddleware)
+
+# Root span of each request (outside the other middlewares, so the trace
+# covers the full latency)
+if settings.tracing_enabled:
+    instrument_fastapi()
+    app.add_middleware(TracingMiddleware)
+
+# Configure CORS (added last, so it is outermost: the 503s and 4xxs the
+# load shedding and idempotency middlewares answer themselves get CORS headers too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001"],  # Add your frontend URLs
@@ -46,17 +109,47 @@ app.include_router(logout_router, prefix="/api/access", tags=["Access"])
 # AI Assistant routers
 app.include_router(assistants_router, prefix="/api/ai-assistants", tags=["AI Assistants"])
 
+# Admin routers
+app.include_router(import_users_router, prefix="/api/admin", tags=["Admin"])
+app.include_router(audit_router, prefix="/api/admin", tags=["Admin"])
+app.include_router(analytics_router, prefix="/api/admin", tags=["Admin"])
+
+# Monitoring routers
+app.include_router(metrics_router, tags=["Monitoring"])
+app.include_router(debug_router, prefix="/debug", tags=["Monitoring"])
+
 @app.on_event("startup")
 async def startup_event():
     """Connect to database on startup"""
-    Database.connect()
+    get_storage().connect()
     logging.info("Connected to MongoDB")
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    assistant_events.start()
+    email_outbox.start()
+    audit_log.start()
+    analytics_buffer.start()
+    start_exporter()
+    if settings.maintenance_enabled:
+        maintenance_scheduler.start()
+    # Runs in the background so /health can report the worker as starting
+    app.state.warmup_task = asyncio.create_task(warm_up(app))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection on shutdown"""
-    Database.close()
+    app.state.warmup_task.cancel()
+    await loop_monitor.stop()
+    await assistant_events.stop()
+    await maintenance_scheduler.stop()
+    await email_outbox.stop()
+    await audit_log.stop()
+    await analytics_buffer.stop()
+    shutdown_hash_pool()
+    stop_exporter()
+    get_storage().close()
     logging.info("Closed MongoDB connection")
+    shutdown_logging()
 
 @app.get("/")
 async def root():
@@ -69,5 +162,18 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Readiness check endpoint
+
+    Returns 503 until the startup warm-up has finished, so load balancers
+    only route traffic to warm workers.
+    """
+    if not warmup_state.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting", "warmup": warmup_state.as_dict()}
+        )
+    if warmup_state.duplicate_emails:
+        # Still serving, but registration cannot rely on the unique email index
+        return {"status": "healthy", "duplicate_emails": warmup_state.duplicate_emails}
     return {"status": "healthy"}
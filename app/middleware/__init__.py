@@ -0,0 +1,7 @@
+from .metrics import MetricsMiddleware
+from .server_timing import ServerTimingMiddleware
+from .idempotency import IdempotencyMiddleware
+from .load_shedding import LoadSheddingMiddleware
+from .tracing import TracingMiddleware, instrument_fastapi
+
+__all__ = ['MetricsMiddleware', 'ServerTimingMiddleware', 'IdempotencyMiddleware', 'LoadSheddingMiddleware', 'TracingMiddleware', 'instrument_fastapi']
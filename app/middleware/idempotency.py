@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+from app.config.settings import settings
+from app.utils.circuit_breaker import mongo_breaker
+from app.utils.idempotency import IdempotencyKeyMismatch, IdempotencyStore, IdempotencyStoreFull, StoredResponse
+
+MAX_KEY_LENGTH = 255
+
+
+async def _send_json(send, status_code: int, content: dict, headers: list = ()):
+    body = json.dumps(content).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware honouring the Idempotency-Key header on selected routes
+
+    The first request with a key runs normally and its response is stored.
+    Retries with the same key and body replay the stored response; concurrent
+    duplicates wait for the first request to finish, on whichever worker it
+    runs. Server errors are not stored, so a retry after a 5xx runs the
+    handler again.
+    """
+
+    def __init__(self, app, routes: set):
+        self.app = app
+        self.routes = routes
+        self.store = IdempotencyStore(
+            settings.idempotency_ttl_s,
+            settings.idempotency_max_entries,
+            settings.idempotency_claim_ttl_s,
+            settings.idempotency_poll_interval_s
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        key = None
+        for name, value in scope["headers"]:
+            if name == b"idempotency-key":
+                key = value.decode("latin-1").strip()
+                break
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": "Invalid Idempotency-Key header"})
+            return
+
+        # Buffer the body to fingerprint it, then hand it to the app unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        store_key = f"{scope['method']} {scope['path']} {key}"
+
+        try:
+            stored = await self.store.begin(store_key, fingerprint, settings.idempotency_wait_timeout_s)
+        except IdempotencyKeyMismatch:
+            await _send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request body"})
+            return
+        except asyncio.TimeoutError:
+            await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"})
+            return
+        except IdempotencyStoreFull:
+            await _send_json(send, 503, {"detail": "Too many requests with an Idempotency-Key in progress"},
+                             [(b"retry-after", b"1")])
+            return
+        except mongo_breaker.unavailable_errors:
+            await _send_json(send, 503, {"detail": "Idempotency keys are temporarily unavailable"},
+                             [(b"retry-after", str(max(int(settings.circuit_reset_timeout_s), 1)).encode())])
+            return
+
+        if stored is not None:
+            await send({
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": stored.headers + [(b"idempotent-replayed", b"true")],
+            })
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.abandon(store_key)
+            raise
+
+        if response["status"] >= 500:
+            await self.store.abandon(store_key)
+        else:
+            await self.store.complete(store_key, StoredResponse(
+                response["status"],
+                response["headers"],
+                b"".join(response["body"])
+            ))
@@ -0,0 +1,62 @@
+import json
+import time
+from app.middleware.metrics import resolve_route
+from app.utils.load_shedding import ConcurrencyLimiter, Overloaded
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware bounding concurrency per cost class and shedding overload
+
+    Each (method, route template) pair mapped in `routes` belongs to a cost
+    class with its own ConcurrencyLimiter, so a login storm saturating the
+    bcrypt class leaves the DB read class untouched. Shed requests get a 503
+    with Retry-After before any handler code runs. Unmapped routes (health,
+    metrics, streams) are not limited.
+    """
+
+    def __init__(self, app, routes: dict, classes: dict):
+        self.app = app
+        self.routes = routes
+        self.limiters = {
+            name: ConcurrencyLimiter(
+                name,
+                limit=int(config["limit"]),
+                max_queue=int(config["queue"]),
+                target_delay_s=config["target_ms"] / 1000,
+            )
+            for name, config in classes.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = scope.get("route_template") or resolve_route(scope)
+        limiter = self.limiters.get(self.routes.get((scope["method"], route)))
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except Overloaded as error:
+            body = json.dumps({"detail": "Server is overloaded, retry later"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(error.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
@@ -0,0 +1,73 @@
+import time
+from starlette.routing import compile_path
+from app.utils.metrics import (
+    http_requests_total,
+    http_requests_in_progress,
+    http_request_duration_seconds,
+)
+
+
+def _route_table(app) -> list:
+    """
+    Build (and cache on app.state) the list of route templates with their
+    compiled regex and allowed methods, in routing order
+    """
+    table = getattr(app.state, "route_table", None)
+    if table is None:
+        table = []
+        for path, operations in app.openapi().get("paths", {}).items():
+            path_regex, _, _ = compile_path(path)
+            table.append((path_regex, {method.upper() for method in operations}, path))
+        app.state.route_table = table
+    return table
+
+
+def resolve_route(scope) -> str:
+    """
+    Resolve the route template for a request, e.g. /api/ai-assistants/{assistant_id}
+
+    Using the template instead of the raw path keeps label cardinality bounded.
+    """
+    app = scope.get("app")
+    if app is not None:
+        path = scope["path"]
+        method = scope["method"]
+        for path_regex, methods, template in _route_table(app):
+            if method in methods and path_regex.match(path):
+                return template
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route request counts, status codes,
+    in-flight requests and latency
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = resolve_route(scope)
+        scope["route_template"] = route
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration_seconds.observe(time.perf_counter() - start, method=method, route=route)
+            http_requests_total.inc(method=method, route=route, status=str(status_code))
+            http_requests_in_progress.dec(method=method, route=route)
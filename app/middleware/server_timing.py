@@ -0,0 +1,32 @@
+from starlette.datastructures import MutableHeaders
+from app.middleware.metrics import resolve_route
+from app.utils.db_profiler import RequestDBStats, current_db_stats
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that attributes MongoDB commands to the current request
+    and reports DB time, round trips and storage operations in a Server-Timing header
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDBStats(scope.get("route_template") or resolve_route(scope))
+        token = current_db_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_db_stats.reset(token)
@@ -0,0 +1,81 @@
+import fastapi.routing
+from starlette.datastructures import MutableHeaders
+from app.utils.tracing import current_span, format_traceparent, span, start_trace, trace_buffer
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every request
+
+    Continues the caller's trace from the W3C traceparent header, returns
+    this request's span in a traceresponse header and hands the finished
+    trace to the trace buffer, which decides whether to keep it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        root = start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        )
+        token = current_span.set(root)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("traceresponse", format_traceparent(root))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_span.reset(token)
+            # Name by template once routing resolved it, to group traces per route
+            route = scope.get("route_template")
+            if route:
+                root.name = f"{scope['method']} {route}"
+            root.set_attribute("http.status_code", status_code)
+            root.end()
+            trace_buffer.finish(root, failed=status_code >= 500)
+
+
+_original_run_endpoint_function = fastapi.routing.run_endpoint_function
+_original_serialize_response = fastapi.routing.serialize_response
+
+
+async def _traced_run_endpoint_function(**kwargs):
+    with span("handler"):
+        return await _original_run_endpoint_function(**kwargs)
+
+
+async def _traced_serialize_response(**kwargs):
+    with span("serialize"):
+        return await _original_serialize_response(**kwargs)
+
+
+def instrument_fastapi():
+    """
+    Add "handler" and "serialize" spans around FastAPI's endpoint call and
+    response model serialization
+
+    FastAPI has no hook between the two, so this wraps the module-level
+    functions its request handler calls them through.
+    """
+    fastapi.routing.run_endpoint_function = _traced_run_endpoint_function
+    fastapi.routing.serialize_response = _traced_serialize_response
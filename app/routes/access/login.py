@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Response
+from fastapi import APIRouter, HTTPException, Request, status, Response
 from app.models.login import Login, LoginResponse
-from app.config.database import Database
+from app.storage import get_storage
+from app.utils.metrics import timed_section
+from app.utils.audit_log import audit_log
 from app.config.settings import settings
+from starlette.concurrency import run_in_threadpool
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
@@ -12,12 +15,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/login", response_model=LoginResponse, status_code=status.HTTP_200_OK)
-async def login(login_data: Login, response: Response):
+async def login(login_data: Login, request: Request, response: Response):
     """
     User login
 
     Args:
         login_data: Email and password
+        request: Incoming request, for the audit log
         response: FastAPI Response object to set cookies
 
     Returns:
@@ -27,41 +31,39 @@ async def login(login_data: Login, response: Response):
         HTTPException: If credentials invalid or user not verified
     """
     try:
-        logger.info(f"Incoming login request: {login_data.email}")
-
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
+        logger.info("Incoming login request: %s", login_data.email)
 
         # Find user by email
-        user = users_collection.find_one({"email": login_data.email})
-        logger.info(f"Database lookup result: {'Found' if user else 'Not found'}")
+        user = get_storage().users.find_by_email(login_data.email)
+        logger.info("Database lookup result: %s", 'Found' if user else 'Not found')
 
         if not user:
-            logger.warning(f"User not found for email: {login_data.email}")
+            logger.warning("User not found for email: %s", login_data.email)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found"
             )
 
-        # Validate password
-        is_password_valid = bcrypt.checkpw(
-            login_data.password.strip().encode('utf-8'),
-            user['password'].encode('utf-8')
-        )
+        # Validate password (off the event loop, it takes tens of milliseconds)
+        with timed_section("bcrypt"):
+            is_password_valid = await run_in_threadpool(
+                bcrypt.checkpw,
+                login_data.password.strip().encode('utf-8'),
+                user['password'].encode('utf-8')
+            )
 
         if not is_password_valid:
-            logger.warning(f"Password does not match for user: {login_data.email}")
+            logger.warning("Password does not match for user: %s", login_data.email)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
 
-        logger.info(f"Login attempt successful for user: {login_data.email}")
+        logger.info("Login attempt successful for user: %s", login_data.email)
 
         # Check if user is verified
         if not user.get('verified', False):
-            logger.warning(f"User not verified: {login_data.email}")
+            logger.warning("User not verified: %s", login_data.email)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Please verify your email first."
@@ -74,7 +76,7 @@ async def login(login_data: Login, response: Response):
             "exp": datetime.utcnow() + timedelta(days=1)
         }
         token = jwt.encode(token_payload, settings.jwt_secret, algorithm="HS256")
-        logger.info(f"Token generated for user: {login_data.email}")
+        logger.info("Token generated for user: %s", login_data.email)
 
         # Set cookie in response
         response.set_cookie(
@@ -87,6 +89,8 @@ async def login(login_data: Login, response: Response):
             path="/"
         )
 
+        await audit_log.record("login", "success", login_data.email, request)
+
         # Return response
         return LoginResponse(
             redirectUrl=f"/client-dashboard/{str(user['_id'])}",
@@ -95,11 +99,13 @@ async def login(login_data: Login, response: Response):
             token=token
         )
 
-    except HTTPException:
+    except HTTPException as error:
+        await audit_log.record("login", "failure", login_data.email, request, reason=error.detail)
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Login error: {str(error)}")
+        await audit_log.record("login", "error", login_data.email, request, reason=str(error))
+        logger.error("Login error: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
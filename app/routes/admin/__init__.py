@@ -0,0 +1,5 @@
+from .import_users import router as import_users_router
+from .audit import router as audit_router
+from .analytics import router as analytics_router
+
+__all__ = ['import_users_router', 'audit_router', 'analytics_router']
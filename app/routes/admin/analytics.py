@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+from app.utils.assistant_analytics import summary
+from app.utils.auth import require_admin
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/analytics/assistants", status_code=status.HTTP_200_OK)
+async def assistant_analytics(
+    days: int = Query(default=30, ge=1, le=366),
+    top_users: int = Query(default=10, ge=0, le=100)
+):
+    """
+    Assistant counts, voice distribution, temperature histogram and creation rate
+
+    Read from the assistant_stats summary, which the assistant write paths
+    keep current with $inc and a maintenance job rebuilds periodically, so
+    the cost does not depend on the number of assistants.
+
+    Args:
+        days: Number of days of created/deleted counts, ending today (UTC)
+        top_users: Number of users with the most assistants to list
+
+    Returns:
+        dict: total, voices, temperature, daily, top_users and reconciled_at
+
+    Raises:
+        HTTPException: If the statistics cannot be read
+    """
+    try:
+        return await run_in_threadpool(summary, days, top_users)
+    except Exception as error:
+        logger.error("Error reading assistant analytics: %s", error)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read assistant analytics: {str(error)}"
+        )
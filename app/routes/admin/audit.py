@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
+from app.storage import get_storage
+from app.utils.auth import require_admin
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/audit", status_code=status.HTTP_200_OK)
+async def list_audit_events(
+    event: Optional[str] = Query(default=None, description="login, send_otp, verify_otp, verify_email or reset_password"),
+    email: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=1000)
+):
+    """
+    Most recent authentication audit events
+
+    Events are buffered and written in batches, so the last second or so
+    of activity may not be visible yet.
+
+    Args:
+        event: Only events of this type
+        email: Only events about this account
+        limit: Maximum number of events to return
+
+    Returns:
+        dict: Events, newest first
+
+    Raises:
+        HTTPException: If the audit log cannot be read
+    """
+    try:
+        events = await run_in_threadpool(get_storage().audit.recent, limit, event, email)
+    except Exception as error:
+        logger.error("Error reading audit log: %s", error)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read audit log: {str(error)}"
+        )
+    for doc in events:
+        doc['ts'] = doc['ts'].isoformat() + "Z"
+        doc.pop('_id', None)
+    return {"events": events, "total": len(events)}
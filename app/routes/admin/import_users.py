@@ -0,0 +1,261 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.models.user import UserRegistration
+from app.storage import get_storage
+from app.utils.auth import require_admin
+from app.utils.email_outbox import email_outbox
+from app.utils.otp import generate_otp
+from app.utils.password_hashing import hash_passwords
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+# Report rows stay in memory up to this size, then spill to a temporary file
+REPORT_SPOOL_BYTES = 1024 * 1024
+
+async def _iter_lines(stream, max_bytes: int):
+    """
+    Split a byte stream into lines without holding more than one line
+
+    Yields:
+        bytes: Each line without its line ending, or None for a line longer
+        than max_bytes (which is skipped)
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in stream:
+        start = 0
+        while True:
+            index = chunk.find(b"\n", start)
+            end = len(chunk) if index < 0 else index
+            if not skipping:
+                buffer += chunk[start:end]
+                if len(buffer) > max_bytes:
+                    buffer.clear()
+                    skipping = True
+                    yield None
+            if index < 0:
+                break
+            if not skipping:
+                yield bytes(buffer).rstrip(b"\r")
+            buffer.clear()
+            skipping = False
+            start = index + 1
+    if buffer and not skipping:
+        yield bytes(buffer).rstrip(b"\r")
+
+async def _iter_rows(request: Request, file_format: str):
+    """
+    Parse the upload into rows
+
+    Yields:
+        tuple: (row number, dict of fields) or (row number, error message)
+    """
+    header = None
+    row_number = 0
+    first_line = True
+    async for line in _iter_lines(request.stream(), settings.import_max_row_bytes):
+        if line is not None and not line.strip():
+            continue
+        is_header = file_format == "csv" and header is None
+        # Counted before parsing, so an unreadable row reports its own number
+        if not is_header:
+            row_number += 1
+        if line is None:
+            if is_header:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"CSV header longer than {settings.import_max_row_bytes} bytes"
+                )
+            yield row_number, f"Row longer than {settings.import_max_row_bytes} bytes"
+            continue
+        try:
+            # Only the first line can start with a byte order mark
+            text = line.decode('utf-8-sig' if first_line else 'utf-8')
+            first_line = False
+            if file_format == "csv":
+                fields = next(csv.reader([text]))
+                if is_header:
+                    header = [field.strip() for field in fields]
+                    continue
+                yield row_number, dict(zip(header, fields))
+            else:
+                row = json.loads(text)
+                yield row_number, row if isinstance(row, dict) else "Row is not a JSON object"
+        except (UnicodeDecodeError, ValueError, csv.Error) as error:
+            if file_format == "ndjson" or header is not None:
+                yield row_number, f"Unreadable row: {error}"
+            else:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unreadable CSV header: {error}"
+                )
+
+class _ImportReport:
+    """Per-row results written as NDJSON to a spooled temporary file"""
+
+    def __init__(self):
+        self.file = SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+        self.counts = {"created": 0, "duplicate": 0, "invalid": 0}
+
+    def add(self, row_number: int, status_name: str, email=None, **fields):
+        self.counts[status_name] += 1
+        entry = {"row": row_number, "status": status_name, "email": email, **fields}
+        self.file.write(json.dumps(entry).encode('utf-8') + b"\n")
+
+    def finish(self):
+        summary = {"summary": dict(self.counts, total=sum(self.counts.values()))}
+        self.file.write(json.dumps(summary).encode('utf-8') + b"\n")
+        self.file.seek(0)
+        return summary["summary"]
+
+    def chunks(self):
+        try:
+            while True:
+                chunk = self.file.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.file.close()
+
+async def _import_batch(batch: list, send_emails: bool, report: _ImportReport):
+    """Hash, insert and queue emails for one batch of validated rows"""
+    users = get_storage().users
+
+    # Earlier batches are already stored, so checking the store also catches
+    # duplicates across batches; a dict catches them within this batch
+    unique = {}
+    for row_number, user in batch:
+        if user.email in unique:
+            report.add(row_number, "duplicate", user.email, error="Email repeated in the import")
+        else:
+            unique[user.email] = (row_number, user)
+    existing = await run_in_threadpool(users.existing_emails, list(unique))
+    for email in existing:
+        row_number, _ = unique.pop(email)
+        report.add(row_number, "duplicate", email, error="Email already in use")
+    if not unique:
+        return
+
+    rows = list(unique.values())
+    hashes = await hash_passwords([user.password for _, user in rows], settings.import_hash_workers)
+
+    now = datetime.utcnow()
+    docs = []
+    for (_, user), hashed_password in zip(rows, hashes):
+        docs.append({
+            "email": user.email,
+            "password": hashed_password,
+            "role": "client",
+            "firstLogin": True,
+            "verified": False,
+            "otp": generate_otp(),
+            "otp_created_at": now,
+            "created_at": now,
+            "companyName": user.companyName,
+            "phoneNumber": user.phoneNumber
+        })
+
+    # Unordered upserts: an email registered meanwhile is skipped alone
+    ids = await run_in_threadpool(users.insert_many, docs)
+
+    for (row_number, user), doc, user_id in zip(rows, docs, ids):
+        if user_id is None:
+            report.add(row_number, "duplicate", user.email, error="Email already in use")
+            continue
+        report.add(row_number, "created", user.email, userId=str(user_id))
+        if send_emails:
+            await email_outbox.enqueue(user.email, doc['otp'])
+
+def _first_error(error: Exception) -> str:
+    """Short description of why a row failed validation"""
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        location = ".".join(str(part) for part in first.get("loc", ()))
+        return f"{location}: {first.get('msg')}" if location else first.get('msg')
+    return str(error)
+
+@router.post("/users/import", status_code=status.HTTP_200_OK)
+async def import_users(
+    request: Request,
+    send_emails: bool = Query(default=True, description="Queue a verification email for every created user")
+):
+    """
+    Create users in bulk from a CSV or NDJSON upload
+
+    The request body is the raw file, with Content-Type text/csv (header
+    row: email,password,companyName,phoneNumber) or application/x-ndjson
+    (one object with those fields per line). Rows are read as they arrive
+    and processed in batches: passwords are hashed on a process pool, users
+    are written with one unordered bulk upsert per batch and verification
+    emails are queued to the outbox. Memory use does not grow with the
+    file size. CSV fields cannot contain line breaks.
+
+    Args:
+        request: Incoming request, whose body is streamed
+        send_emails: Queue a verification email for every created user
+
+    Returns:
+        StreamingResponse: NDJSON report, one line per row
+        ({"row", "status": created|duplicate|invalid, "email", "userId"|"error"})
+        followed by a {"summary": {...}} line
+
+    Raises:
+        HTTPException: If the content type is not CSV or NDJSON
+    """
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        file_format = "csv"
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        file_format = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload a text/csv or application/x-ndjson body"
+        )
+
+    logger.info("Bulk user import started (%s)", file_format)
+    report = _ImportReport()
+    batch = []
+    try:
+        async for row_number, row in _iter_rows(request, file_format):
+            if isinstance(row, str):
+                report.add(row_number, "invalid", error=row)
+                continue
+            try:
+                user = UserRegistration(**row)
+            except (ValidationError, TypeError) as error:
+                report.add(row_number, "invalid", row.get('email'), error=_first_error(error))
+                continue
+            batch.append((row_number, user))
+            if len(batch) >= settings.import_batch_size:
+                await _import_batch(batch, send_emails, report)
+                batch = []
+        if batch:
+            await _import_batch(batch, send_emails, report)
+    except HTTPException:
+        report.file.close()
+        raise
+    except Exception as error:
+        import traceback
+        report.file.close()
+        logger.error("Bulk user import failed: %s", error)
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Bulk user import failed: {str(error)}"
+        )
+
+    summary = report.finish()
+    logger.info("Bulk user import finished: %s", summary)
+    return StreamingResponse(report.chunks(), media_type="application/x-ndjson")
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from app.models.ai_assistant import (
     AIAssistantCreate,
     AIAssistantUpdate,
@@ -6,15 +7,46 @@ from app.models.ai_assistant import (
     AIAssistantListResponse,
     DeleteResponse
 )
-from app.config.database import Database
+from app.config.settings import settings
+from app.storage import get_storage
+from app.utils.singleflight import assistant_reads
+from app.utils.stale_cache import assistant_cache
+from app.utils.circuit_breaker import mongo_breaker
+from app.utils.assistant_events import RESET, assistant_events
+from app.utils.config_bundles import config_bundles
+from app.utils.assistant_analytics import record_created, record_deleted, record_updated
+from app.utils.http_cache import (
+    collection_etag,
+    document_etag,
+    has_conditional_headers,
+    is_not_modified,
+    not_modified,
+    set_cache_headers,
+    set_stale_headers
+)
 from bson import ObjectId
 from datetime import datetime
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Only the fields needed to compute validators for conditional requests
+VERSION_PROJECTION = {"_id": 1, "updated_at": 1}
+
+def _find_assistant(assistant_obj_id: ObjectId, projection: dict = None):
+    """Fetch one assistant document (blocking, run through single-flight)"""
+    return get_storage().assistants.find_by_id(assistant_obj_id, projection)
+
+def _find_user_assistants(user_obj_id: ObjectId, projection: dict = None) -> list:
+    """Fetch all assistant documents of a user (blocking, run through single-flight)"""
+    return get_storage().assistants.find_by_user(user_obj_id, projection)
+
 @router.post("/", response_model=AIAssistantResponse, status_code=status.HTTP_201_CREATED)
 async def create_assistant(assistant_data: AIAssistantCreate):
     """
@@ -30,11 +62,9 @@ async def create_assistant(assistant_data: AIAssistantCreate):
         HTTPException: If user not found or error occurs
     """
     try:
-        db = Database.get_db()
-        users_collection = db['users']
-        assistants_collection = db['assistants']
+        storage = get_storage()
 
-        logger.info(f"Creating AI assistant for user: {assistant_data.user_id}")
+        logger.info("Creating AI assistant for user: %s", assistant_data.user_id)
 
         # Verify user exists
         try:
@@ -45,7 +75,7 @@ async def create_assistant(assistant_data: AIAssistantCreate):
                 detail="Invalid user_id format"
             )
 
-        user = users_collection.find_one({"_id": user_obj_id})
+        user = storage.users.find_by_id(user_obj_id, {"_id": 1})
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -64,11 +94,13 @@ async def create_assistant(assistant_data: AIAssistantCreate):
             "updated_at": now
         }
 
-        result = assistants_collection.insert_one(assistant_doc)
-        logger.info(f"AI assistant created with ID: {result.inserted_id}")
+        inserted_id = storage.assistants.insert(assistant_doc)
+        logger.info("AI assistant created with ID: %s", inserted_id)
+        assistant_events.publish_local("created", inserted_id, assistant_doc)
+        record_created(assistant_doc)
 
         return AIAssistantResponse(
-            id=str(result.inserted_id),
+            id=str(inserted_id),
             user_id=str(assistant_data.user_id),
             name=assistant_data.name,
             system_message=assistant_data.system_message,
@@ -82,7 +114,7 @@ async def create_assistant(assistant_data: AIAssistantCreate):
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Error creating AI assistant: {str(error)}")
+        logger.error("Error creating AI assistant: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -90,24 +122,30 @@ async def create_assistant(assistant_data: AIAssistantCreate):
         )
 
 @router.get("/user/{user_id}", response_model=AIAssistantListResponse, status_code=status.HTTP_200_OK)
-async def get_user_assistants(user_id: str):
+async def get_user_assistants(user_id: str, request: Request, response: Response):
     """
     Get all AI assistants for a specific user
 
+    Supports If-None-Match: when the client's ETag still matches, answers
+    304 after reading only _id and updated_at of the user's assistants.
+
+    While MongoDB is down or slow, answers from this worker's last-known-good
+    copy of the list, marked with Age and Warning: 110 headers.
+
     Args:
         user_id: User ID
+        request: Incoming request, for conditional headers
+        response: Outgoing response, for ETag/Last-Modified headers
 
     Returns:
         AIAssistantListResponse: List of user's assistants
 
     Raises:
-        HTTPException: If user not found or error occurs
+        HTTPException: If user not found, the database is unavailable with
+            nothing cached (503) or error occurs
     """
     try:
-        db = Database.get_db()
-        assistants_collection = db['assistants']
-
-        logger.info(f"Fetching AI assistants for user: {user_id}")
+        logger.info("Fetching AI assistants for user: %s", user_id)
 
         # Convert user_id to ObjectId
         try:
@@ -118,11 +156,43 @@ async def get_user_assistants(user_id: str):
                 detail="Invalid user_id format"
             )
 
-        # Find all assistants for this user
-        assistants_cursor = assistants_collection.find({"user_id": user_obj_id})
+        # Cheap validator check before reading and serializing full documents
+        # (skipped while MongoDB is known to be down)
+        if has_conditional_headers(request) and not mongo_breaker.is_open:
+            try:
+                versions = await assistant_reads.do(
+                    ("user_assistant_versions", user_obj_id),
+                    _find_user_assistants,
+                    user_obj_id,
+                    VERSION_PROJECTION,
+                    timeout=settings.singleflight_wait_timeout_s
+                )
+            except mongo_breaker.unavailable_errors:
+                # Answered below from the last-known-good list, if there is one
+                versions = None
+            if versions is not None:
+                etag = collection_etag(versions)
+                if is_not_modified(request, etag):
+                    return not_modified(etag)
+
+        # Find all assistants for this user, sharing the query with identical
+        # requests already in flight, or the last-known-good list when
+        # MongoDB is down or slow
+        assistant_docs, stale_age = await assistant_cache.read(
+            ("user_assistants", user_obj_id),
+            _find_user_assistants,
+            user_obj_id
+        )
+        etag = collection_etag(assistant_docs)
+        if stale_age is not None:
+            set_stale_headers(response, stale_age)
+            if is_not_modified(request, etag):
+                stale_response = not_modified(etag)
+                set_stale_headers(stale_response, stale_age)
+                return stale_response
         assistants = []
 
-        for assistant in assistants_cursor:
+        for assistant in assistant_docs:
             assistants.append(AIAssistantResponse(
                 id=str(assistant['_id']),
                 user_id=str(assistant['user_id']),
@@ -134,7 +204,10 @@ async def get_user_assistants(user_id: str):
                 updated_at=assistant['updated_at'].isoformat() + "Z"
             ))
 
-        logger.info(f"Found {len(assistants)} assistants for user {user_id}")
+        logger.info("Found %s assistants for user %s", len(assistants), user_id)
+
+        last_modified = max((doc['updated_at'] for doc in assistant_docs), default=None)
+        set_cache_headers(response, etag, last_modified)
 
         return AIAssistantListResponse(
             assistants=assistants,
@@ -143,34 +216,205 @@ async def get_user_assistants(user_id: str):
 
     except HTTPException:
         raise
+    except asyncio.TimeoutError:
+        logger.error("Timed out fetching AI assistants for user: %s", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Timed out fetching AI assistants"
+        )
+    except mongo_breaker.unavailable_errors as error:
+        logger.error("Database unavailable fetching AI assistants for user %s: %s", user_id, error)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable",
+            headers={"Retry-After": str(int(settings.circuit_reset_timeout_s))}
+        )
     except Exception as error:
         import traceback
-        logger.error(f"Error fetching AI assistants: {str(error)}")
+        logger.error("Error fetching AI assistants: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch AI assistants: {str(error)}"
         )
 
+def _format_event(event) -> str:
+    """Render one change event in the text/event-stream format"""
+    if event is RESET:
+        return "event: reset\ndata: {}\n\n"
+    if event.document is not None:
+        assistant = event.document
+        data = AIAssistantResponse(
+            id=str(assistant['_id']),
+            user_id=str(assistant['user_id']),
+            name=assistant['name'],
+            system_message=assistant['system_message'],
+            voice=assistant['voice'],
+            temperature=assistant['temperature'],
+            created_at=assistant['created_at'].isoformat() + "Z",
+            updated_at=assistant['updated_at'].isoformat() + "Z"
+        ).model_dump_json()
+    else:
+        data = json.dumps({"id": str(event.assistant_id)}, separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.operation}\ndata: {data}\n\n"
+
+@router.get("/user/{user_id}/events", status_code=status.HTTP_200_OK)
+async def stream_user_assistant_events(
+    user_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(default=None)
+):
+    """
+    Stream changes to a user's assistants as server-sent events
+
+    Sends "created" and "updated" events carrying the assistant and
+    "deleted" events carrying its id. Browsers' EventSource reconnects with
+    Last-Event-ID and receives the events it missed; a "reset" event means
+    they could not be replayed and the client should refetch the list.
+    Open the stream before fetching the list so no change falls in between.
+
+    Args:
+        user_id: User ID
+        request: Incoming request, to detect client disconnects
+        last_event_id: Id of the last event received before reconnecting
+
+    Returns:
+        StreamingResponse: text/event-stream of assistant changes
+
+    Raises:
+        HTTPException: If user_id is invalid or error occurs
+    """
+    try:
+        user_obj_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid user_id format"
+        )
+
+    try:
+        # Deletes only carry the assistant's _id, so tell the hub who owns what
+        owned = await run_in_threadpool(get_storage().assistants.find_by_user, user_obj_id, {"_id": 1})
+    except Exception as error:
+        logger.error("Error opening assistant event stream: %s", error)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to open assistant event stream: {str(error)}"
+        )
+
+    subscription = assistant_events.subscribe(
+        user_obj_id,
+        [doc['_id'] for doc in owned],
+        last_event_id
+    )
+    logger.info("Assistant event stream opened for user %s", user_id)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.sse_keepalive_s)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield _format_event(event)
+                if event is RESET and subscription.overflowed:
+                    break
+        finally:
+            assistant_events.unsubscribe(subscription)
+            logger.info("Assistant event stream closed for user %s", user_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/user/{user_id}/bundle", status_code=status.HTTP_200_OK)
+async def get_user_config_bundle(user_id: str, request: Request):
+    """
+    Get all of a user's assistants as a prebuilt runtime config bundle
+
+    Meant for call setup: the bundle is serialized and gzipped once, kept
+    in memory and rewritten whenever one of the user's assistants changes,
+    so a request is a cache lookup and a send. The body is
+    {"user_id", "version", "assistants": [...], "total"}, where version is
+    the ETag without its quotes; If-None-Match with the ETag answers 304.
+
+    Args:
+        user_id: User ID
+        request: Incoming request, for If-None-Match and Accept-Encoding
+
+    Returns:
+        Response: The bundle as JSON, gzip-encoded if the client accepts it
+
+    Raises:
+        HTTPException: If user_id is invalid or error occurs
+    """
+    try:
+        user_obj_id = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid user_id format"
+        )
+
+    try:
+        bundle = await config_bundles.get(user_obj_id)
+    except asyncio.TimeoutError:
+        logger.error("Timed out building config bundle for user: %s", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Timed out fetching AI assistants"
+        )
+    except Exception as error:
+        import traceback
+        logger.error("Error building config bundle: %s", error)
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch AI assistants: {str(error)}"
+        )
+
+    if is_not_modified(request, bundle.etag):
+        return not_modified(bundle.etag)
+
+    headers = {"ETag": bundle.etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=bundle.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=bundle.body, media_type="application/json", headers=headers)
+
 @router.get("/{assistant_id}", response_model=AIAssistantResponse, status_code=status.HTTP_200_OK)
-async def get_assistant(assistant_id: str):
+async def get_assistant(assistant_id: str, request: Request, response: Response):
     """
     Get a specific AI assistant by ID
 
+    Supports If-None-Match and If-Modified-Since: when the client's copy is
+    current, answers 304 after reading only _id and updated_at.
+
+    While MongoDB is down or slow, answers from this worker's last-known-good
+    copy of the assistant, marked with Age and Warning: 110 headers.
+
     Args:
         assistant_id: Assistant ID
+        request: Incoming request, for conditional headers
+        response: Outgoing response, for ETag/Last-Modified headers
 
     Returns:
         AIAssistantResponse: Assistant details
 
     Raises:
-        HTTPException: If assistant not found or error occurs
+        HTTPException: If assistant not found, the database is unavailable
+            with nothing cached (503) or error occurs
     """
     try:
-        db = Database.get_db()
-        assistants_collection = db['assistants']
-
-        logger.info(f"Fetching AI assistant: {assistant_id}")
+        logger.info("Fetching AI assistant: %s", assistant_id)
 
         # Convert to ObjectId
         try:
@@ -181,7 +425,36 @@ async def get_assistant(assistant_id: str):
                 detail="Invalid assistant_id format"
             )
 
-        assistant = assistants_collection.find_one({"_id": assistant_obj_id})
+        # Cheap validator check before reading and serializing the full document
+        # (skipped while MongoDB is known to be down)
+        if has_conditional_headers(request) and not mongo_breaker.is_open:
+            try:
+                version = await assistant_reads.do(
+                    ("assistant_version", assistant_obj_id),
+                    _find_assistant,
+                    assistant_obj_id,
+                    VERSION_PROJECTION,
+                    timeout=settings.singleflight_wait_timeout_s
+                )
+                checked = True
+            except mongo_breaker.unavailable_errors:
+                # Answered below from the last-known-good copy, if there is one
+                checked = False
+            if checked and not version:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="AI assistant not found"
+                )
+            if checked:
+                etag = document_etag(version)
+                if is_not_modified(request, etag, version['updated_at']):
+                    return not_modified(etag, version['updated_at'])
+
+        assistant, stale_age = await assistant_cache.read(
+            ("assistant", assistant_obj_id),
+            _find_assistant,
+            assistant_obj_id
+        )
 
         if not assistant:
             raise HTTPException(
@@ -189,6 +462,15 @@ async def get_assistant(assistant_id: str):
                 detail="AI assistant not found"
             )
 
+        etag = document_etag(assistant)
+        if stale_age is not None:
+            set_stale_headers(response, stale_age)
+            if is_not_modified(request, etag, assistant['updated_at']):
+                stale_response = not_modified(etag, assistant['updated_at'])
+                set_stale_headers(stale_response, stale_age)
+                return stale_response
+        set_cache_headers(response, etag, assistant['updated_at'])
+
         return AIAssistantResponse(
             id=str(assistant['_id']),
             user_id=str(assistant['user_id']),
@@ -202,9 +484,22 @@ async def get_assistant(assistant_id: str):
 
     except HTTPException:
         raise
+    except asyncio.TimeoutError:
+        logger.error("Timed out fetching AI assistant: %s", assistant_id)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Timed out fetching AI assistant"
+        )
+    except mongo_breaker.unavailable_errors as error:
+        logger.error("Database unavailable fetching AI assistant %s: %s", assistant_id, error)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database temporarily unavailable",
+            headers={"Retry-After": str(int(settings.circuit_reset_timeout_s))}
+        )
     except Exception as error:
         import traceback
-        logger.error(f"Error fetching AI assistant: {str(error)}")
+        logger.error("Error fetching AI assistant: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -227,10 +522,7 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
         HTTPException: If assistant not found or error occurs
     """
     try:
-        db = Database.get_db()
-        assistants_collection = db['assistants']
-
-        logger.info(f"Updating AI assistant: {assistant_id}")
+        logger.info("Updating AI assistant: %s", assistant_id)
 
         # Convert to ObjectId
         try:
@@ -241,14 +533,6 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
                 detail="Invalid assistant_id format"
             )
 
-        # Check if assistant exists
-        assistant = assistants_collection.find_one({"_id": assistant_obj_id})
-        if not assistant:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="AI assistant not found"
-            )
-
         # Build update document
         update_doc = {"updated_at": datetime.utcnow()}
 
@@ -261,16 +545,18 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
         if update_data.temperature is not None:
             update_doc["temperature"] = update_data.temperature
 
-        # Update the assistant
-        assistants_collection.update_one(
-            {"_id": assistant_obj_id},
-            {"$set": update_doc}
-        )
-
-        # Fetch updated assistant
-        updated_assistant = assistants_collection.find_one({"_id": assistant_obj_id})
+        # Update the assistant, getting the previous version back for analytics
+        previous_assistant = get_storage().assistants.update(assistant_obj_id, update_doc)
+        if not previous_assistant:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="AI assistant not found"
+            )
+        updated_assistant = {**previous_assistant, **update_doc}
 
-        logger.info(f"AI assistant {assistant_id} updated successfully")
+        logger.info("AI assistant %s updated successfully", assistant_id)
+        assistant_events.publish_local("updated", assistant_obj_id, updated_assistant)
+        record_updated(previous_assistant, update_doc)
 
         return AIAssistantResponse(
             id=str(updated_assistant['_id']),
@@ -287,7 +573,7 @@ async def update_assistant(assistant_id: str, update_data: AIAssistantUpdate):
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Error updating AI assistant: {str(error)}")
+        logger.error("Error updating AI assistant: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -309,10 +595,7 @@ async def delete_assistant(assistant_id: str):
         HTTPException: If assistant not found or error occurs
     """
     try:
-        db = Database.get_db()
-        assistants_collection = db['assistants']
-
-        logger.info(f"Deleting AI assistant: {assistant_id}")
+        logger.info("Deleting AI assistant: %s", assistant_id)
 
         # Convert to ObjectId
         try:
@@ -324,15 +607,17 @@ async def delete_assistant(assistant_id: str):
             )
 
         # Delete the assistant
-        result = assistants_collection.delete_one({"_id": assistant_obj_id})
+        deleted = get_storage().assistants.delete(assistant_obj_id)
 
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="AI assistant not found"
             )
 
-        logger.info(f"AI assistant {assistant_id} deleted successfully")
+        logger.info("AI assistant %s deleted successfully", assistant_id)
+        assistant_events.publish_local("deleted", assistant_obj_id)
+        record_deleted(deleted)
 
         return DeleteResponse(message="AI assistant deleted successfully")
 
@@ -340,7 +625,7 @@ async def delete_assistant(assistant_id: str):
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Error deleting AI assistant: {str(error)}")
+        logger.error("Error deleting AI assistant: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from app.config.settings import settings
 from app.models.reset_password import ResetPassword, ResetPasswordResponse
-from app.config.database import Database
+from app.storage import get_storage
+from app.utils.audit_log import audit_log
+from app.utils.metrics import timed_section
+from app.utils.shared_memory import get_shared_table
+from starlette.concurrency import run_in_threadpool
 import bcrypt
 import logging
 
@@ -9,55 +14,66 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/reset-password", response_model=ResetPasswordResponse, status_code=status.HTTP_200_OK)
-async def reset_password(reset_data: ResetPassword):
+async def reset_password(reset_data: ResetPassword, request: Request):
     """
     Reset user password
 
     Args:
         reset_data: Email and new password
+        request: Incoming request, for the audit log
 
     Returns:
         ResetPasswordResponse: Success message
 
     Raises:
-        HTTPException: If user not found or internal error occurs
+        HTTPException: If user not found, too many unknown emails were tried
+            or internal error occurs
     """
     try:
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
+        users = get_storage().users
 
-        logger.info(f"Password reset request for email: {reset_data.email}")
+        logger.info("Password reset request for email: %s", reset_data.email)
 
-        # Find user by email
-        user = users_collection.find_one({"email": reset_data.email})
-
-        if not user:
-            logger.warning(f"User not found for email: {reset_data.email}")
+        # The update below is the only database call, so an unknown email is
+        # found out after the bcrypt hash; clients that keep missing are
+        # throttled instead of paying a lookup on every reset
+        client = request.client.host if request.client else "unknown"
+        misses_key = f"reset-miss:{client}"
+        if get_shared_table().count(misses_key) >= settings.reset_password_unknown_email_limit:
+            logger.warning("Too many unknown-email password resets from %s", client)
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many password reset attempts",
+                headers={"Retry-After": str(int(settings.reset_password_unknown_email_window_s))}
             )
 
         # Hash the new password
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(reset_data.newPassword.encode('utf-8'), salt)
+        with timed_section("bcrypt"):
+            salt = bcrypt.gensalt()
+            hashed_password = await run_in_threadpool(bcrypt.hashpw, reset_data.newPassword.encode('utf-8'), salt)
 
         # Update user password
-        users_collection.update_one(
-            {"email": reset_data.email},
-            {"$set": {"password": hashed_password.decode('utf-8')}}
-        )
+        if not users.update_by_email(reset_data.email, {"password": hashed_password.decode('utf-8')}):
+            get_shared_table().incr(misses_key, ttl=settings.reset_password_unknown_email_window_s)
+            logger.warning("User not found for email: %s", reset_data.email)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+        logger.info("Password reset successful for %s", reset_data.email)
 
-        logger.info(f"Password reset successful for {reset_data.email}")
+        await audit_log.record("reset_password", "success", reset_data.email, request)
 
         return ResetPasswordResponse(message="Password reset successful")
 
-    except HTTPException:
+    except HTTPException as error:
+        await audit_log.record("reset_password", "failure", reset_data.email, request, reason=error.detail)
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Reset password error: {str(error)}")
+        await audit_log.record("reset_password", "error", reset_data.email, request, reason=str(error))
+        logger.error("Reset password error: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from app.models.forgot_password import SendOTP, SendOTPResponse
-from app.config.database import Database
+from app.storage import get_storage
+from app.utils.audit_log import audit_log
 from app.utils.otp import generate_otp
+from app.utils.metrics import timed_section
 from app.config.settings import settings
 import smtplib
 from email.mime.text import MIMEText
@@ -13,12 +15,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/send-otp", response_model=SendOTPResponse, status_code=status.HTTP_200_OK)
-async def send_otp(otp_data: SendOTP):
+async def send_otp(otp_data: SendOTP, request: Request):
     """
     Send OTP to user's email for password reset
 
     Args:
         otp_data: Email address to send OTP to
+        request: Incoming request, for the audit log
 
     Returns:
         SendOTPResponse: Success message
@@ -27,32 +30,22 @@ async def send_otp(otp_data: SendOTP):
         HTTPException: If user not found, email fails, or internal error occurs
     """
     try:
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
+        storage = get_storage()
 
-        logger.info(f"OTP request for email: {otp_data.email}")
+        logger.info("OTP request for email: %s", otp_data.email)
 
-        # Find user by email
-        user = users_collection.find_one({"email": otp_data.email})
+        # Generate OTP
+        otp = generate_otp()
+        logger.info("Generated OTP for %s", otp_data.email)
 
-        if not user:
-            logger.warning(f"User not found for email: {otp_data.email}")
+        # Update user with OTP (matches nothing if there is no such user)
+        if not storage.otps.set_otp(otp_data.email, otp):
+            logger.warning("User not found for email: %s", otp_data.email)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
-
-        # Generate OTP
-        otp = generate_otp()
-        logger.info(f"Generated OTP for {otp_data.email}: {otp}")
-
-        # Update user with OTP
-        users_collection.update_one(
-            {"email": otp_data.email},
-            {"$set": {"otp": otp}}
-        )
-        logger.info(f"OTP saved in DB for {otp_data.email}")
+        logger.info("OTP saved in DB for %s", otp_data.email)
 
         # Send OTP email
         try:
@@ -74,32 +67,38 @@ async def send_otp(otp_data: SendOTP):
 
             # Connect to SMTP server
             logger.info("Connecting to SMTP server...")
-            if settings.smtp_use_ssl and settings.smtp_port == 465:
-                # Use SMTP_SSL for port 465
-                with smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port) as server:
-                    server.login(settings.email_user, settings.email_pass)
-                    server.send_message(message)
-            else:
-                # Use SMTP with STARTTLS for port 587
-                with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
-                    server.starttls()
-                    server.login(settings.email_user, settings.email_pass)
-                    server.send_message(message)
-
-            logger.info(f"OTP email sent successfully to {otp_data.email}")
+            with timed_section("smtp"):
+                if settings.smtp_use_ssl and settings.smtp_port == 465:
+                    # Use SMTP_SSL for port 465
+                    with smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port) as server:
+                        server.login(settings.email_user, settings.email_pass)
+                        server.send_message(message)
+                else:
+                    # Use SMTP with STARTTLS for port 587 (plain SMTP if disabled)
+                    with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
+                        if settings.smtp_starttls:
+                            server.starttls()
+                        server.login(settings.email_user, settings.email_pass)
+                        server.send_message(message)
+
+            logger.info("OTP email sent successfully to %s", otp_data.email)
 
         except Exception as email_error:
-            logger.error(f"Failed to send OTP email: {str(email_error)}")
+            logger.error("Failed to send OTP email: %s", email_error)
             # Don't fail the request if email fails - OTP is already saved
             logger.warning("OTP saved in DB but email failed to send")
 
+        await audit_log.record("send_otp", "success", otp_data.email, request)
+
         return SendOTPResponse(message="OTP sent to email.")
 
-    except HTTPException:
+    except HTTPException as error:
+        await audit_log.record("send_otp", "failure", otp_data.email, request, reason=error.detail)
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Error sending OTP: {str(error)}")
+        await audit_log.record("send_otp", "error", otp_data.email, request, reason=str(error))
+        logger.error("Error sending OTP: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
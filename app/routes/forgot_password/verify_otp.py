@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from app.models.verify_otp import VerifyOTP, VerifyOTPResponse
-from app.config.database import Database
+from app.storage import get_storage
+from app.utils.audit_log import audit_log
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,12 +9,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/verify-otp", response_model=VerifyOTPResponse, status_code=status.HTTP_200_OK)
-async def verify_otp(otp_data: VerifyOTP):
+async def verify_otp(otp_data: VerifyOTP, request: Request):
     """
     Verify OTP for password reset
 
     Args:
         otp_data: Email and OTP to verify
+        request: Incoming request, for the audit log
 
     Returns:
         VerifyOTPResponse: Success message
@@ -22,32 +24,32 @@ async def verify_otp(otp_data: VerifyOTP):
         HTTPException: If OTP is invalid or internal error occurs
     """
     try:
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
+        logger.info("OTP verification request for email: %s", otp_data.email)
 
-        logger.info(f"OTP verification request for email: {otp_data.email}")
-
-        # Find user by email
-        user = users_collection.find_one({"email": otp_data.email})
+        # Look up the user's OTP (None if there is no such user)
+        stored_otp = get_storage().otps.get_otp(otp_data.email)
 
         # Check if user exists and OTP matches
-        if not user or user.get('otp') != otp_data.otp:
-            logger.warning(f"Invalid OTP for email: {otp_data.email}")
+        if stored_otp is None or stored_otp != otp_data.otp:
+            logger.warning("Invalid OTP for email: %s", otp_data.email)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid OTP"
             )
 
-        logger.info(f"OTP verified successfully for {otp_data.email}")
+        logger.info("OTP verified successfully for %s", otp_data.email)
+
+        await audit_log.record("verify_otp", "success", otp_data.email, request)
 
         return VerifyOTPResponse(message="OTP verified successfully")
 
-    except HTTPException:
+    except HTTPException as error:
+        await audit_log.record("verify_otp", "failure", otp_data.email, request, reason=error.detail)
         raise
     except Exception as error:
         import traceback
-        logger.error(f"OTP verification error: {str(error)}")
+        await audit_log.record("verify_otp", "error", otp_data.email, request, reason=str(error))
+        logger.error("OTP verification error: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,4 @@
+from .metrics import router as metrics_router
+from .debug import router as debug_router
+
+__all__ = ['metrics_router', 'debug_router']
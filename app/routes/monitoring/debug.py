@@ -0,0 +1,166 @@
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.utils.auth import require_admin
+from app.utils.loop_monitor import loop_monitor
+from app.utils.sampling_profiler import ProfilerBusy, allocation_tracker, sampling_profiler
+from app.utils.tracing import trace_buffer
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/blocking")
+async def blocking_handlers(limit: int = Query(default=20, ge=1, le=200)):
+    """
+    Handlers ranked by how long they blocked the event loop
+
+    Args:
+        limit: Maximum number of handlers to return
+
+    Returns:
+        dict: Ranked handlers with stall counts, total/max/avg blocked time and last stack
+    """
+    return {"handlers": loop_monitor.report(limit)}
+
+@router.get("/traces")
+async def recent_traces(limit: int = Query(default=50, ge=1, le=500)):
+    """
+    Recently kept request traces, newest first
+
+    A trace is kept when it was sampled, failed with a 5xx or took longer
+    than trace_slow_ms.
+
+    Args:
+        limit: Maximum number of traces to return
+
+    Returns:
+        dict: Trace summaries and the kept/discarded counts since startup
+    """
+    return {
+        "kept": trace_buffer.kept,
+        "discarded": trace_buffer.discarded,
+        "traces": [
+            {
+                "trace_id": trace.trace_id,
+                "name": trace.root.name,
+                "status_code": trace.root.attributes.get("http.status_code"),
+                "duration_ms": round(trace.root.duration_ms, 3),
+                "spans": len(trace.spans),
+                "sampled": trace.sampled,
+            }
+            for trace in trace_buffer.recent(limit)
+        ]
+    }
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str, format: str = Query(default="json", pattern="^(json|otlp)$")):
+    """
+    One kept trace with all its spans
+
+    Args:
+        trace_id: 32 hex digit trace id (see the traceresponse header)
+        format: "json" for a flat span list, "otlp" for OTLP/JSON
+
+    Returns:
+        dict: The trace
+
+    Raises:
+        HTTPException: If the trace was not kept or has left the buffer
+    """
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace not found")
+    return trace.as_otlp() if format == "otlp" else trace.as_dict()
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10.0, gt=0),
+    interval_ms: float = Query(default=10.0, gt=0),
+    include_idle: bool = Query(default=False, description="Keep stacks of threads parked waiting for work")
+):
+    """
+    Sample the stacks of every thread of this worker for a while
+
+    Covers the event loop thread (labelled "event-loop"), threadpool and
+    executor threads alike. The sampler runs in a worker thread, so the
+    event loop keeps serving while it samples. Save the output to a file
+    and feed it to flamegraph.pl or speedscope.
+
+    Args:
+        seconds: Sampling duration, capped at profiler_max_seconds
+        interval_ms: Time between samples, at least profiler_min_interval_ms
+        include_idle: Keep stacks of threads parked waiting for work
+
+    Returns:
+        PlainTextResponse: Collapsed stacks ("thread;outer;...;inner count" per line)
+
+    Raises:
+        HTTPException: If a profile is already running on this worker
+    """
+    loop_thread_id = threading.get_ident()
+    try:
+        stacks = await run_in_threadpool(
+            sampling_profiler.profile,
+            min(seconds, settings.profiler_max_seconds),
+            max(interval_ms, settings.profiler_min_interval_ms) / 1000,
+            loop_thread_id,
+            include_idle
+        )
+    except ProfilerBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running on this worker")
+    return PlainTextResponse(stacks, headers={"Content-Disposition": 'attachment; filename="profile.folded"'})
+
+@router.post("/memory/start")
+async def start_allocation_tracing(frames: int = Query(default=1, ge=1, le=50)):
+    """
+    Start tracemalloc on this worker
+
+    Allocations are noticeably slower while tracing, so stop it when done.
+
+    Args:
+        frames: Stack frames recorded per allocation site
+
+    Returns:
+        dict: Tracing state
+    """
+    allocation_tracker.start(frames)
+    return {"tracing": allocation_tracker.tracing}
+
+@router.post("/memory/stop")
+async def stop_allocation_tracing():
+    """
+    Stop tracemalloc on this worker and free its traces
+
+    Returns:
+        dict: Tracing state
+    """
+    allocation_tracker.stop()
+    return {"tracing": allocation_tracker.tracing}
+
+@router.get("/memory")
+async def allocation_snapshot(
+    limit: int = Query(default=20, ge=1, le=200),
+    group_by: str = Query(default="lineno", pattern="^(lineno|filename|traceback)$"),
+    compare: bool = Query(default=False, description="Rank by growth since the previous snapshot")
+):
+    """
+    Top allocation sites from a tracemalloc snapshot
+
+    Args:
+        limit: Number of sites to return
+        group_by: Group allocations by "lineno", "filename" or "traceback"
+        compare: Rank by growth since the previous snapshot instead of size
+
+    Returns:
+        dict: Traced/peak memory and the top sites
+
+    Raises:
+        HTTPException: If tracemalloc has not been started
+    """
+    if not allocation_tracker.tracing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="tracemalloc is not running, POST /debug/memory/start first"
+        )
+    return await run_in_threadpool(allocation_tracker.snapshot, limit, group_by, compare)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint
+
+    Returns:
+        Response: All registered metrics in Prometheus text format
+    """
+    return Response(
+        content=registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
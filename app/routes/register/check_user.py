@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, status
 from app.models.check_user import CheckUser, CheckUserResponse
-from app.config.database import Database
+from app.storage import get_storage
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,19 +22,15 @@ async def check_user(user_data: CheckUser):
         HTTPException: If internal error occurs
     """
     try:
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
-
         # Find user by email
-        user = users_collection.find_one({"email": user_data.email})
+        user = get_storage().users.find_by_email(user_data.email, {"_id": 1})
 
         # Return whether user exists
         return CheckUserResponse(exists=bool(user))
 
     except Exception as error:
         import traceback
-        logger.error(f"Error checking user existence: {str(error)}")
+        logger.error("Error checking user existence: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
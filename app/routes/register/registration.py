@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, status
 from app.models.user import UserRegistration, UserResponse
-from app.config.database import Database
+from app.storage import DuplicateKeyError, get_storage
+from app.utils.metrics import timed_section
 from app.utils.otp import generate_otp
 from app.utils.email import send_otp_email_with_retry
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
 import bcrypt
 import logging
 
@@ -25,24 +28,16 @@ async def register_user(user_data: UserRegistration):
         HTTPException: If email already exists or internal error occurs
     """
     try:
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
-
-        # Check if the user already exists
-        existing_user = users_collection.find_one({"email": user_data.email})
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already in use"
-            )
+        users = get_storage().users
 
         # Hash the password
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(user_data.password.encode('utf-8'), salt)
+        with timed_section("bcrypt"):
+            salt = bcrypt.gensalt()
+            hashed_password = await run_in_threadpool(bcrypt.hashpw, user_data.password.encode('utf-8'), salt)
 
         # Generate OTP
         otp = generate_otp()
+        now = datetime.utcnow()
 
         # Create new user document
         new_user = {
@@ -52,32 +47,42 @@ async def register_user(user_data: UserRegistration):
             "firstLogin": True,
             "verified": False,
             "otp": otp,
+            "otp_created_at": now,
+            "created_at": now,
             "companyName": user_data.companyName,
             "phoneNumber": user_data.phoneNumber
         }
 
-        # Insert user into database
-        result = users_collection.insert_one(new_user)
+        # Insert user into database; the unique email index rejects an
+        # existing email in the same round trip, race-free (the store checks
+        # the email first until the index is known to exist)
+        try:
+            user_id = users.insert(new_user)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already in use"
+            )
 
         # Try to send OTP email (don't fail if email fails)
         try:
             await send_otp_email_with_retry(user_data.email, otp)
-            logger.info(f"OTP sent successfully to {user_data.email}")
+            logger.info("OTP sent successfully to %s", user_data.email)
         except Exception as email_error:
-            logger.warning(f"Failed to send OTP email: {str(email_error)}")
+            logger.warning("Failed to send OTP email: %s", email_error)
             # Continue anyway - user is registered, just email failed
 
         # Return success response
         return UserResponse(
             message="User registered successfully. Please check your email for the OTP to verify your account.",
-            userId=str(result.inserted_id)
+            userId=str(user_id)
         )
 
     except HTTPException:
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Error during registration: {str(error)}")
+        logger.error("Error during registration: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from app.models.verify import VerifyEmail, VerifyResponse
-from app.config.database import Database
+from app.storage import get_storage
+from app.utils.audit_log import audit_log
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,12 +9,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/verify-email", response_model=VerifyResponse, status_code=status.HTTP_200_OK)
-async def verify_email(verify_data: VerifyEmail):
+async def verify_email(verify_data: VerifyEmail, request: Request):
     """
     Verify user email with OTP
 
     Args:
         verify_data: Email and OTP for verification
+        request: Incoming request, for the audit log
 
     Returns:
         VerifyResponse: Success message
@@ -22,44 +24,34 @@ async def verify_email(verify_data: VerifyEmail):
         HTTPException: If user not found, invalid OTP, or internal error occurs
     """
     try:
-        # Get database connection
-        db = Database.get_db()
-        users_collection = db['users']
-
-        # Find user by email
-        user = users_collection.find_one({"email": verify_data.email})
-
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User not found"
-            )
-
-        # Check if the provided OTP matches the one stored in the database
-        if user.get('otp') != verify_data.otp:
+        storage = get_storage()
+
+        # Mark the user verified and remove the OTP, only if the OTP matches
+        if not storage.otps.consume_otp(verify_data.email, verify_data.otp, {"verified": True}):
+            # Failure path only: tell a wrong OTP from an unknown email
+            if not storage.users.find_by_email(verify_data.email, {"_id": 1}):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="User not found"
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid OTP"
             )
 
-        # Update the user status to verified and remove the OTP
-        users_collection.update_one(
-            {"email": verify_data.email},
-            {
-                "$set": {"verified": True},
-                "$unset": {"otp": ""}
-            }
-        )
+        logger.info("Email verified successfully for %s", verify_data.email)
 
-        logger.info(f"Email verified successfully for {verify_data.email}")
+        await audit_log.record("verify_email", "success", verify_data.email, request)
 
         return VerifyResponse(message="Email verified successfully!")
 
-    except HTTPException:
+    except HTTPException as error:
+        await audit_log.record("verify_email", "failure", verify_data.email, request, reason=error.detail)
         raise
     except Exception as error:
         import traceback
-        logger.error(f"Error during OTP verification: {str(error)}")
+        await audit_log.record("verify_email", "error", verify_data.email, request, reason=str(error))
+        logger.error("Error during OTP verification: %s", error)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
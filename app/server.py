@@ -0,0 +1,63 @@
+"""
+Production entry point: python -m app.server
+
+Runs uvicorn with several worker processes configured through Settings
+(SERVER_WORKERS, SERVER_LOOP, SERVER_HTTP, SERVER_KEEPALIVE_TIMEOUT,
+SERVER_BACKLOG, SERVER_GRACEFUL_TIMEOUT). Use run.py for development.
+"""
+import os
+import uvicorn
+from app.config.settings import settings
+from app.utils.shared_memory import reset_shared_table, shared_memory_available
+
+
+def worker_count() -> int:
+    """Configured worker count, defaulting to one per CPU core"""
+    if settings.server_workers > 0:
+        return settings.server_workers
+    return os.cpu_count() or 1
+
+
+def build_config(**overrides) -> dict:
+    """
+    Keyword arguments for uvicorn.run() built from Settings
+
+    Args:
+        overrides: Values replacing the settings-derived ones
+
+    Returns:
+        dict: uvicorn.run() keyword arguments
+    """
+    config = {
+        "host": settings.server_host,
+        "port": settings.server_port,
+        "workers": worker_count(),
+        "loop": settings.server_loop,
+        "http": settings.server_http,
+        "timeout_keep_alive": settings.server_keepalive_timeout,
+        "backlog": settings.server_backlog,
+        "timeout_graceful_shutdown": settings.server_graceful_timeout,
+        "limit_max_requests": settings.server_limit_max_requests,
+        "proxy_headers": True,
+        "reload": False,
+        # Logging is configured by the app itself (app.config.logging_config)
+        "log_config": None,
+    }
+    config.update(overrides)
+    return config
+
+
+def main():
+    """Start the production server"""
+    # Each worker imports app.main itself and connects to MongoDB in its own
+    # startup hook, so no MongoClient is ever shared across processes.
+    # The shared memory table is the one thing they do share: start it empty
+    # so entries from a previous run never leak into this one. Without fcntl
+    # (Windows) each worker keeps a private table and there is nothing to reset.
+    if shared_memory_available:
+        reset_shared_table()
+    uvicorn.run("app.main:app", **build_config())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+from app.config.settings import settings
+from .base import (
+    AssistantStatsStore,
+    AssistantStore,
+    AuditStore,
+    DuplicateKeyError,
+    IdempotencyKeyStore,
+    LeaseStore,
+    OTPStore,
+    Storage,
+    UserStore
+)
+
+_storage = None
+
+
+def get_storage() -> Storage:
+    """
+    Return the storage backend selected by settings.storage_backend
+
+    Returns:
+        Storage: MongoStorage for "mongo" (default), MemoryStorage for "memory"
+    """
+    global _storage
+    if _storage is None:
+        if settings.storage_backend == "memory":
+            from .memory import MemoryStorage
+            _storage = MemoryStorage()
+        elif settings.storage_backend == "mongo":
+            from .mongo import MongoStorage
+            _storage = MongoStorage()
+        else:
+            raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+    return _storage
+
+
+__all__ = ['get_storage', 'Storage', 'UserStore', 'OTPStore', 'AssistantStore', 'LeaseStore', 'IdempotencyKeyStore', 'AuditStore', 'AssistantStatsStore', 'DuplicateKeyError']
@@ -0,0 +1,273 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+
+
+# Assistant temperatures (0.0 - 2.0) are counted in buckets of this width
+TEMPERATURE_BUCKET_WIDTH = 0.2
+TEMPERATURE_BUCKETS = 10
+
+
+def temperature_bucket(temperature: float) -> str:
+    """Key of the histogram bucket a temperature falls in ("0" - "9")"""
+    return str(min(int((temperature + 1e-9) / TEMPERATURE_BUCKET_WIDTH), TEMPERATURE_BUCKETS - 1))
+
+
+def voice_key(voice: str) -> str:
+    """Voice name usable as a field name (no dots)"""
+    return voice.replace(".", "_")
+
+
+class DuplicateKeyError(Exception):
+    """A write violated a unique constraint, e.g. an email already registered"""
+
+
+class UserStore(ABC):
+    """Users, keyed by _id and unique by email"""
+
+    @abstractmethod
+    def find_by_email(self, email: str, projection: Optional[dict] = None) -> Optional[dict]:
+        """Return the user with this email, or None"""
+
+    @abstractmethod
+    def find_by_id(self, user_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        """Return the user with this _id, or None"""
+
+    @abstractmethod
+    def insert(self, user: dict) -> ObjectId:
+        """
+        Insert a user and return its _id
+
+        Raises:
+            DuplicateKeyError: If the email is already registered
+        """
+
+    @abstractmethod
+    def insert_many(self, users: list) -> list:
+        """
+        Insert users without stopping at the first failure
+
+        Returns:
+            list: The _id of each user, or None where the email was already registered
+        """
+
+    @abstractmethod
+    def existing_emails(self, emails: list) -> set:
+        """Return which of these emails are already registered"""
+
+    @abstractmethod
+    def update_by_email(self, email: str, set_fields: Optional[dict] = None, unset_fields: Optional[list] = None) -> int:
+        """Set and/or remove fields of the user with this email, returning the matched count"""
+
+    @abstractmethod
+    def clear_expired_otps(self, cutoff: datetime, limit: int) -> int:
+        """
+        Remove up to `limit` OTPs issued before cutoff
+
+        OTPs with no issue time (stored before it was recorded) are given the
+        current time instead, so they expire one TTL later.
+
+        Returns:
+            int: Number of OTPs removed
+        """
+
+    @abstractmethod
+    def delete_unverified(self, created_before: datetime, limit: int) -> list:
+        """
+        Delete up to `limit` unverified users created before created_before
+
+        Returns:
+            list: _ids of the deleted users
+        """
+
+
+class OTPStore(ABC):
+    """One-time passwords, one per user email"""
+
+    @abstractmethod
+    def set_otp(self, email: str, otp: str) -> bool:
+        """Store a new OTP for the user, returning False if there is no such user"""
+
+    @abstractmethod
+    def get_otp(self, email: str) -> Optional[str]:
+        """Return the current OTP of the user, or None"""
+
+    @abstractmethod
+    def consume_otp(self, email: str, otp: str, set_fields: Optional[dict] = None) -> bool:
+        """
+        Remove the user's OTP and set set_fields, in one write, if otp is the current OTP
+
+        Returns:
+            bool: False if there is no such user or otp does not match (nothing changed)
+        """
+
+    @abstractmethod
+    def clear_otp(self, email: str):
+        """Remove the user's OTP"""
+
+
+class LeaseStore(ABC):
+    """Named, expiring leases used to elect one worker for background jobs"""
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, ttl_s: float) -> bool:
+        """Take or renew the lease for ttl_s seconds, returning False if another owner holds it"""
+
+    @abstractmethod
+    def release(self, name: str, owner: str):
+        """Give the lease up if owner holds it"""
+
+
+class IdempotencyKeyStore(ABC):
+    """
+    Idempotency keys shared by every worker: a claim while the first request
+    runs, then its response until the key expires
+
+    Records are {"fingerprint", "response"} where response is None while the
+    request is in progress, else {"status", "headers", "body"}.
+    """
+
+    @abstractmethod
+    def claim(self, key: str, fingerprint: str, ttl_s: float) -> Optional[dict]:
+        """
+        Claim a key for ttl_s seconds unless it holds an unexpired record
+
+        Returns:
+            dict: The existing record, or None when the key was claimed
+        """
+
+    @abstractmethod
+    def complete(self, key: str, fingerprint: str, response: dict, ttl_s: float):
+        """Store the response of a claimed key, keeping it for ttl_s seconds"""
+
+    @abstractmethod
+    def release(self, key: str, fingerprint: str):
+        """Drop a claim that has no response, so the key can be claimed again"""
+
+
+class AuditStore(ABC):
+    """Append-only log of authentication events"""
+
+    @abstractmethod
+    def insert_many(self, events: list):
+        """Append events ({"ts", "meta": {"event", "outcome"}, ...}) in one write, safe to retry with the same list"""
+
+    @abstractmethod
+    def recent(self, limit: int, event: Optional[str] = None, email: Optional[str] = None) -> list:
+        """Return the newest events first, optionally only one event type or email"""
+
+
+class AssistantStore(ABC):
+    """AI assistant configurations, indexed by _id and by user_id"""
+
+    @abstractmethod
+    def insert(self, assistant: dict) -> ObjectId:
+        """Insert an assistant and return its _id"""
+
+    @abstractmethod
+    def find_by_id(self, assistant_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        """Return the assistant with this _id, or None"""
+
+    @abstractmethod
+    def find_by_user(self, user_id: ObjectId, projection: Optional[dict] = None) -> list:
+        """Return every assistant of the user"""
+
+    @abstractmethod
+    def update(self, assistant_id: ObjectId, set_fields: dict) -> Optional[dict]:
+        """
+        Set fields of the assistant
+
+        Returns:
+            dict: The document as it was before the update (merge set_fields
+            into it for the updated one), or None if not found
+        """
+
+    @abstractmethod
+    def delete(self, assistant_id: ObjectId) -> Optional[dict]:
+        """Delete the assistant, returning the deleted document, or None if it did not exist"""
+
+    @abstractmethod
+    def delete_by_users(self, user_ids: list) -> int:
+        """Delete every assistant of these users, returning the deleted count"""
+
+    def watch(self, resume_after: Optional[dict] = None):
+        """
+        Open a change stream of assistant inserts, updates and deletes
+
+        Args:
+            resume_after: Resume token of the last change already seen
+
+        Returns:
+            A pymongo-style change stream, or None if the backend has none
+        """
+        return None
+
+
+class AssistantStatsStore(ABC):
+    """
+    Materialized assistant analytics, one document per statistic:
+    "totals" ({total, voices, temperature}), "day:<YYYY-MM-DD>"
+    ({created, deleted}) and "user:<user_id>" ({user_id, assistants})
+    """
+
+    @abstractmethod
+    def increment(self, updates: dict):
+        """
+        Apply counter increments in one write, creating missing documents
+
+        Args:
+            updates: stat _id -> {dotted field: amount}
+        """
+
+    @abstractmethod
+    def get(self, stat_ids: list) -> list:
+        """Return the documents with these _ids that exist"""
+
+    @abstractmethod
+    def top_users(self, limit: int) -> list:
+        """Return the "user:" documents with the most assistants"""
+
+    @abstractmethod
+    def reconcile(self, since: datetime):
+        """
+        Recompute the statistics from the assistants themselves
+
+        Replaces "totals" and every "user:" document, drops users left with
+        no assistants and raises the created count of days since `since`
+        to at least the number of their assistants still existing. Corrects drift from writes that bypass increment() (such as
+        deleting the assistants of expired accounts) or failed increments.
+        """
+
+
+class Storage(ABC):
+    """A storage backend: one store per kind of data"""
+
+    users: UserStore
+    otps: OTPStore
+    assistants: AssistantStore
+    leases: LeaseStore
+    idempotency_keys: IdempotencyKeyStore
+    audit: AuditStore
+    assistant_stats: AssistantStatsStore
+
+    @abstractmethod
+    def connect(self):
+        """Open connections (called from the startup hook)"""
+
+    @abstractmethod
+    def ping(self, connections: int = 1):
+        """Check the backend is reachable, warming up to `connections` pooled connections"""
+
+    @abstractmethod
+    def close(self):
+        """Release connections (called from the shutdown hook)"""
+
+    def ensure_indexes(self) -> list:
+        """
+        Create the indexes the queries rely on (idempotent)
+
+        Returns:
+            list: Emails registered more than once, which keep emails from being enforced unique
+        """
+        return []
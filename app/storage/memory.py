@@ -0,0 +1,401 @@
+import copy
+import heapq
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from app.utils.db_profiler import current_db_stats
+from .base import (
+    AssistantStatsStore,
+    AssistantStore,
+    AuditStore,
+    DuplicateKeyError,
+    IdempotencyKeyStore,
+    LeaseStore,
+    OTPStore,
+    Storage,
+    UserStore,
+    temperature_bucket,
+    voice_key
+)
+
+
+@contextmanager
+def _operation(lock: threading.RLock):
+    """
+    One storage operation: counted for the current request, like a MongoDB
+    operation, and made under the storage lock
+    """
+    stats = current_db_stats.get()
+    if stats is not None:
+        stats.operations += 1
+    with lock:
+        yield
+
+
+def _project(doc: Optional[dict], projection: Optional[dict]) -> Optional[dict]:
+    """Apply a MongoDB-style inclusion projection, returning a copy"""
+    if doc is None:
+        return None
+    if not projection:
+        return dict(doc)
+    included = {field for field, flag in projection.items() if flag}
+    if projection.get("_id", 1):
+        included.add("_id")
+    return {field: value for field, value in doc.items() if field in included}
+
+
+class MemoryUserStore(UserStore):
+    def __init__(self, lock: threading.RLock):
+        self._lock = lock
+        self._by_id = {}
+        self._id_by_email = {}
+
+    def find_by_email(self, email: str, projection: Optional[dict] = None) -> Optional[dict]:
+        with _operation(self._lock):
+            user_id = self._id_by_email.get(email)
+            return _project(self._by_id.get(user_id), projection)
+
+    def find_by_id(self, user_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        with _operation(self._lock):
+            return _project(self._by_id.get(user_id), projection)
+
+    def _insert(self, user: dict) -> ObjectId:
+        if user['email'] in self._id_by_email:
+            raise DuplicateKeyError(f"duplicate email: {user['email']}")
+        user_id = user.setdefault('_id', ObjectId())
+        self._by_id[user_id] = dict(user)
+        self._id_by_email[user['email']] = user_id
+        return user_id
+
+    def insert(self, user: dict) -> ObjectId:
+        with _operation(self._lock):
+            return self._insert(user)
+
+    def insert_many(self, users: list) -> list:
+        ids = []
+        with _operation(self._lock):
+            for user in users:
+                try:
+                    ids.append(self._insert(user))
+                except DuplicateKeyError:
+                    ids.append(None)
+        return ids
+
+    def existing_emails(self, emails: list) -> set:
+        with _operation(self._lock):
+            return {email for email in emails if email in self._id_by_email}
+
+    def update_by_email(self, email: str, set_fields: Optional[dict] = None, unset_fields: Optional[list] = None) -> int:
+        with _operation(self._lock):
+            user = self._by_id.get(self._id_by_email.get(email))
+            if user is None:
+                return 0
+            user.update(set_fields or {})
+            for field in unset_fields or []:
+                user.pop(field, None)
+            return 1
+
+    def clear_expired_otps(self, cutoff: datetime, limit: int) -> int:
+        cleared = 0
+        now = datetime.utcnow()
+        with _operation(self._lock):
+            for user in self._by_id.values():
+                if 'otp' in user and 'otp_created_at' not in user:
+                    user['otp_created_at'] = now
+                if cleared >= limit:
+                    break
+                if 'otp' in user and user['otp_created_at'] < cutoff:
+                    user.pop('otp')
+                    user.pop('otp_created_at', None)
+                    cleared += 1
+        return cleared
+
+    def delete_unverified(self, created_before: datetime, limit: int) -> list:
+        cutoff = ObjectId.from_datetime(created_before)
+        with _operation(self._lock):
+            ids = [
+                user_id for user_id, user in self._by_id.items()
+                if user.get('verified') is False and user_id < cutoff
+            ][:limit]
+            for user_id in ids:
+                user = self._by_id.pop(user_id)
+                self._id_by_email.pop(user['email'], None)
+        return ids
+
+
+class MemoryOTPStore(OTPStore):
+    """OTPs live on the user record, like the MongoDB backend"""
+
+    def __init__(self, users: MemoryUserStore):
+        self._users = users
+
+    def set_otp(self, email: str, otp: str) -> bool:
+        return self._users.update_by_email(email, {"otp": otp, "otp_created_at": datetime.utcnow()}) > 0
+
+    def get_otp(self, email: str) -> Optional[str]:
+        user = self._users.find_by_email(email, {"otp": 1})
+        return user.get('otp') if user else None
+
+    def consume_otp(self, email: str, otp: str, set_fields: Optional[dict] = None) -> bool:
+        with _operation(self._users._lock):
+            user = self._users._by_id.get(self._users._id_by_email.get(email))
+            if user is None or user.get('otp') != otp:
+                return False
+            user.update(set_fields or {})
+            user.pop('otp', None)
+            user.pop('otp_created_at', None)
+            return True
+
+    def clear_otp(self, email: str):
+        self._users.update_by_email(email, unset_fields=["otp", "otp_created_at"])
+
+
+class MemoryAssistantStore(AssistantStore):
+    def __init__(self, lock: threading.RLock):
+        self._lock = lock
+        self._by_id = {}
+        # user_id -> assistant ids in insertion order (dict used as an ordered set)
+        self._ids_by_user = {}
+
+    def insert(self, assistant: dict) -> ObjectId:
+        with _operation(self._lock):
+            assistant_id = assistant.setdefault('_id', ObjectId())
+            self._by_id[assistant_id] = dict(assistant)
+            self._ids_by_user.setdefault(assistant['user_id'], {})[assistant_id] = None
+            return assistant_id
+
+    def find_by_id(self, assistant_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        with _operation(self._lock):
+            return _project(self._by_id.get(assistant_id), projection)
+
+    def find_by_user(self, user_id: ObjectId, projection: Optional[dict] = None) -> list:
+        with _operation(self._lock):
+            return [_project(self._by_id[assistant_id], projection) for assistant_id in self._ids_by_user.get(user_id, ())]
+
+    def update(self, assistant_id: ObjectId, set_fields: dict) -> Optional[dict]:
+        with _operation(self._lock):
+            assistant = self._by_id.get(assistant_id)
+            if assistant is None:
+                return None
+            previous = dict(assistant)
+            assistant.update(set_fields)
+            return previous
+
+    def delete(self, assistant_id: ObjectId) -> Optional[dict]:
+        with _operation(self._lock):
+            assistant = self._by_id.pop(assistant_id, None)
+            if assistant is None:
+                return None
+            user_ids = self._ids_by_user.get(assistant['user_id'])
+            if user_ids is not None:
+                user_ids.pop(assistant_id, None)
+                if not user_ids:
+                    del self._ids_by_user[assistant['user_id']]
+            return assistant
+
+    def delete_by_users(self, user_ids: list) -> int:
+        deleted = 0
+        with _operation(self._lock):
+            for user_id in user_ids:
+                for assistant_id in self._ids_by_user.pop(user_id, {}):
+                    self._by_id.pop(assistant_id, None)
+                    deleted += 1
+        return deleted
+
+
+class MemoryLeaseStore(LeaseStore):
+    """Leases within this process (there is nothing to share them with)"""
+
+    def __init__(self, lock: threading.RLock):
+        self._lock = lock
+        self._leases = {}
+
+    def acquire(self, name: str, owner: str, ttl_s: float) -> bool:
+        now = time.monotonic()
+        with _operation(self._lock):
+            holder, expires_at = self._leases.get(name, (owner, now))
+            if holder != owner and expires_at > now:
+                return False
+            self._leases[name] = (owner, now + ttl_s)
+            return True
+
+    def release(self, name: str, owner: str):
+        with _operation(self._lock):
+            if self._leases.get(name, (None, 0))[0] == owner:
+                del self._leases[name]
+
+
+class MemoryIdempotencyKeyStore(IdempotencyKeyStore):
+    """Idempotency keys within this process: key -> (record, expires_at)"""
+
+    def __init__(self, lock: threading.RLock):
+        self._lock = lock
+        self._records = {}
+        # (expires_at, key) for every expiry set; entries whose key was
+        # re-stamped since are skipped when they come up
+        self._expiries = []
+
+    def _set(self, key: str, record: dict, expires_at: float):
+        self._records[key] = (record, expires_at)
+        heapq.heappush(self._expiries, (expires_at, key))
+
+    def _expire(self, now: float):
+        # Like the TTL index: only what has expired, from the earliest on
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiries)
+            if self._records.get(key, (None, None))[1] == expires_at:
+                del self._records[key]
+
+    def claim(self, key: str, fingerprint: str, ttl_s: float) -> Optional[dict]:
+        now = time.monotonic()
+        with _operation(self._lock):
+            self._expire(now)
+            record, _ = self._records.get(key, (None, None))
+            if record is not None:
+                return record
+            self._set(key, {"fingerprint": fingerprint, "response": None}, now + ttl_s)
+            return None
+
+    def complete(self, key: str, fingerprint: str, response: dict, ttl_s: float):
+        with _operation(self._lock):
+            record, _ = self._records.get(key, (None, None))
+            if record is not None and record["fingerprint"] == fingerprint:
+                self._set(key, {"fingerprint": fingerprint, "response": response}, time.monotonic() + ttl_s)
+
+    def release(self, key: str, fingerprint: str):
+        with _operation(self._lock):
+            record, _ = self._records.get(key, (None, None))
+            if record is not None and record["fingerprint"] == fingerprint and record["response"] is None:
+                # Its heap entry is skipped when it comes up
+                del self._records[key]
+
+
+class MemoryAuditStore(AuditStore):
+    """The most recent audit events, dropping the oldest like a capped collection"""
+
+    def __init__(self, lock: threading.RLock, max_events: int = 100000):
+        self._lock = lock
+        self._events = deque(maxlen=max_events)
+
+    def insert_many(self, events: list):
+        with _operation(self._lock):
+            self._events.extend(dict(event) for event in events)
+
+    def recent(self, limit: int, event: Optional[str] = None, email: Optional[str] = None) -> list:
+        with _operation(self._lock):
+            events = list(self._events)
+        matched = []
+        for doc in reversed(events):
+            if event is not None and doc['meta']['event'] != event:
+                continue
+            if email is not None and doc.get('email') != email:
+                continue
+            matched.append(dict(doc))
+            if len(matched) >= limit:
+                break
+        return matched
+
+
+class MemoryAssistantStatsStore(AssistantStatsStore):
+    """Statistics documents in a dict; reconcile() reads the memory assistant store"""
+
+    def __init__(self, lock: threading.RLock, assistants: MemoryAssistantStore):
+        self._lock = lock
+        self._assistants = assistants
+        self._stats = {}
+
+    def increment(self, updates: dict):
+        with _operation(self._lock):
+            for stat_id, fields in updates.items():
+                doc = self._stats.get(stat_id)
+                if doc is None:
+                    doc = self._stats[stat_id] = self._new(stat_id)
+                for path, amount in fields.items():
+                    *parents, leaf = path.split(".")
+                    target = doc
+                    for part in parents:
+                        target = target.setdefault(part, {})
+                    target[leaf] = target.get(leaf, 0) + amount
+
+    @staticmethod
+    def _new(stat_id: str) -> dict:
+        kind, _, key = stat_id.partition(":")
+        if kind == "user":
+            return {"_id": stat_id, "kind": "user", "user_id": ObjectId(key)}
+        if kind == "day":
+            return {"_id": stat_id, "kind": "day", "day": key}
+        return {"_id": stat_id, "kind": kind}
+
+    def get(self, stat_ids: list) -> list:
+        with _operation(self._lock):
+            return [copy.deepcopy(self._stats[stat_id]) for stat_id in stat_ids if stat_id in self._stats]
+
+    def top_users(self, limit: int) -> list:
+        with _operation(self._lock):
+            users = [dict(doc) for doc in self._stats.values() if doc['kind'] == "user" and doc.get('assistants', 0) > 0]
+        return sorted(users, key=lambda doc: doc['assistants'], reverse=True)[:limit]
+
+    def reconcile(self, since: datetime):
+        with _operation(self._lock):
+            assistants = list(self._assistants._by_id.values())
+            totals = {
+                "_id": "totals",
+                "kind": "totals",
+                "total": len(assistants),
+                "voices": {},
+                "temperature": {},
+                "reconciled_at": datetime.utcnow(),
+            }
+            users = {}
+            days = {}
+            for assistant in assistants:
+                voice = voice_key(assistant['voice'])
+                bucket = temperature_bucket(assistant['temperature'])
+                totals['voices'][voice] = totals['voices'].get(voice, 0) + 1
+                totals['temperature'][bucket] = totals['temperature'].get(bucket, 0) + 1
+                users[assistant['user_id']] = users.get(assistant['user_id'], 0) + 1
+                if assistant['created_at'] >= since:
+                    day = assistant['created_at'].strftime("%Y-%m-%d")
+                    days[day] = days.get(day, 0) + 1
+            self._stats = {
+                stat_id: doc for stat_id, doc in self._stats.items()
+                if doc['kind'] == "day"
+            }
+            self._stats["totals"] = totals
+            for user_id, count in users.items():
+                self._stats[f"user:{user_id}"] = {"_id": f"user:{user_id}", "kind": "user", "user_id": user_id, "assistants": count}
+            for day, count in days.items():
+                doc = self._stats.setdefault(f"day:{day}", self._new(f"day:{day}"))
+                doc['created'] = max(doc.get('created', 0), count)
+
+
+class MemoryStorage(Storage):
+    """
+    Process-local storage in indexed dicts
+
+    Nothing is persisted and nothing is shared between workers. Meant for
+    hermetic benchmarks, local development and single-process edge deployments.
+    """
+
+    def __init__(self):
+        lock = threading.RLock()
+        self.users = MemoryUserStore(lock)
+        self.otps = MemoryOTPStore(self.users)
+        self.assistants = MemoryAssistantStore(lock)
+        self.leases = MemoryLeaseStore(lock)
+        self.idempotency_keys = MemoryIdempotencyKeyStore(lock)
+        self.audit = MemoryAuditStore(lock)
+        self.assistant_stats = MemoryAssistantStatsStore(lock, self.assistants)
+
+    def connect(self):
+        pass
+
+    def ping(self, connections: int = 1):
+        pass
+
+    def close(self):
+        pass
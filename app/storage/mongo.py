@@ -0,0 +1,541 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+from bson import ObjectId
+import pymongo
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo import errors as pymongo_errors
+from app.config.database import Database
+from app.config.settings import settings
+from app.utils.circuit_breaker import mongo_breaker
+from app.utils.db_profiler import current_db_stats
+from app.utils.metrics import timed_section
+from .base import (
+    TEMPERATURE_BUCKET_WIDTH,
+    TEMPERATURE_BUCKETS,
+    AssistantStatsStore,
+    AssistantStore,
+    AuditStore,
+    DuplicateKeyError,
+    IdempotencyKeyStore,
+    LeaseStore,
+    OTPStore,
+    Storage,
+    UserStore
+)
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _operation(limited: bool = True):
+    """
+    One MongoDB operation: timed, counted for the current request, refused
+    outright while the circuit breaker is open and, when limited, given
+    mongo_operation_timeout_s in total (server selection and retries included)
+    """
+    stats = current_db_stats.get()
+    if stats is not None:
+        stats.operations += 1
+    timeout = settings.mongo_operation_timeout_s if limited else None
+    with mongo_breaker.guard(), timed_section("mongo"), pymongo.timeout(timeout):
+        yield
+
+
+class MongoUserStore(UserStore):
+    def __init__(self):
+        # Until the unique email index is known to exist, insert looks the
+        # email up first
+        self.unique_email_enforced = False
+
+    def _collection(self):
+        return Database.get_db()['users']
+
+    def find_by_email(self, email: str, projection: Optional[dict] = None) -> Optional[dict]:
+        with _operation():
+            return self._collection().find_one({"email": email}, projection)
+
+    def find_by_id(self, user_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        with _operation():
+            return self._collection().find_one({"_id": user_id}, projection)
+
+    def insert(self, user: dict) -> ObjectId:
+        if not self.unique_email_enforced and self.find_by_email(user['email'], {"_id": 1}):
+            raise DuplicateKeyError(f"duplicate email: {user['email']}")
+        try:
+            with _operation():
+                return self._collection().insert_one(user).inserted_id
+        except pymongo_errors.DuplicateKeyError as error:
+            raise DuplicateKeyError(str(error)) from error
+
+    def insert_many(self, users: list) -> list:
+        if not users:
+            return []
+        ids = [user.setdefault('_id', ObjectId()) for user in users]
+        # Upserts that only insert when the email is absent, so registered
+        # emails are skipped whether or not the unique email index exists
+        requests = [UpdateOne({"email": user['email']}, {"$setOnInsert": user}, upsert=True) for user in users]
+        try:
+            with _operation():
+                result = self._collection().bulk_write(requests, ordered=False)
+            upserted = set(result.upserted_ids.values())
+        except pymongo_errors.BulkWriteError as error:
+            # With the index, a concurrent registration of the same email
+            # makes its upsert fail with a duplicate key error
+            write_errors = error.details.get("writeErrors", [])
+            if any(write_error.get("code") != 11000 for write_error in write_errors):
+                raise
+            upserted = {upsert["_id"] for upsert in error.details.get("upserted", [])}
+        # Matched by _id: a skipped user's _id is the one it would have had
+        return [user_id if user_id in upserted else None for user_id in ids]
+
+    def ensure_unique_email_index(self) -> list:
+        """
+        Create the unique email index, unless emails are already registered more than once
+
+        Returns:
+            list: Up to 100 duplicated emails that kept the index from being created
+        """
+        collection = self._collection()
+        with _operation(limited=False):
+            try:
+                collection.create_index([("email", ASCENDING)], name="unique_email", unique=True)
+            except pymongo_errors.DuplicateKeyError:
+                return [doc['_id'] for doc in collection.aggregate([
+                    {"$group": {"_id": "$email", "count": {"$sum": 1}}},
+                    {"$match": {"count": {"$gt": 1}}},
+                    {"$limit": 100}
+                ])]
+        self.unique_email_enforced = True
+        return []
+
+    def existing_emails(self, emails: list) -> set:
+        with _operation():
+            return {doc['email'] for doc in self._collection().find({"email": {"$in": emails}}, {"email": 1, "_id": 0})}
+
+    def update_by_email(self, email: str, set_fields: Optional[dict] = None, unset_fields: Optional[list] = None) -> int:
+        update = {}
+        if set_fields:
+            update["$set"] = set_fields
+        if unset_fields:
+            update["$unset"] = {field: "" for field in unset_fields}
+        with _operation():
+            return self._collection().update_one({"email": email}, update).matched_count
+
+    def clear_expired_otps(self, cutoff: datetime, limit: int) -> int:
+        collection = self._collection()
+        expired = {"otp": {"$exists": True}, "otp_created_at": {"$lt": cutoff}}
+        with _operation():
+            # OTPs stored before otp_created_at was recorded start their TTL now
+            collection.update_many(
+                {"otp": {"$exists": True}, "otp_created_at": {"$exists": False}},
+                {"$set": {"otp_created_at": datetime.utcnow()}}
+            )
+            ids = [doc['_id'] for doc in collection.find(expired, {"_id": 1}).limit(limit)]
+            if not ids:
+                return 0
+            # Re-check the filter so an OTP reissued in between survives
+            return collection.update_many(
+                {"_id": {"$in": ids}, **expired},
+                {"$unset": {"otp": "", "otp_created_at": ""}}
+            ).modified_count
+
+    def delete_unverified(self, created_before: datetime, limit: int) -> list:
+        collection = self._collection()
+        # _id carries the creation time, so this also covers users without created_at
+        stale = {"verified": False, "_id": {"$lt": ObjectId.from_datetime(created_before)}}
+        with _operation():
+            ids = [doc['_id'] for doc in collection.find(stale, {"_id": 1}).limit(limit)]
+            if not ids:
+                return []
+            # The ids are already old enough; re-check verified so users who
+            # verified in between are kept
+            collection.delete_many({"_id": {"$in": ids}, "verified": False})
+            kept = {doc['_id'] for doc in collection.find({"_id": {"$in": ids}}, {"_id": 1})}
+        return [user_id for user_id in ids if user_id not in kept]
+
+
+class MongoOTPStore(OTPStore):
+    """OTPs live on the user document, in the otp field"""
+
+    def _collection(self):
+        return Database.get_db()['users']
+
+    def set_otp(self, email: str, otp: str) -> bool:
+        with _operation():
+            return self._collection().update_one(
+                {"email": email},
+                {"$set": {"otp": otp, "otp_created_at": datetime.utcnow()}}
+            ).matched_count > 0
+
+    def get_otp(self, email: str) -> Optional[str]:
+        with _operation():
+            user = self._collection().find_one({"email": email}, {"otp": 1})
+        return user.get('otp') if user else None
+
+    def consume_otp(self, email: str, otp: str, set_fields: Optional[dict] = None) -> bool:
+        update = {"$unset": {"otp": "", "otp_created_at": ""}}
+        if set_fields:
+            update["$set"] = set_fields
+        with _operation():
+            return self._collection().update_one({"email": email, "otp": otp}, update).matched_count > 0
+
+    def clear_otp(self, email: str):
+        with _operation():
+            self._collection().update_one({"email": email}, {"$unset": {"otp": "", "otp_created_at": ""}})
+
+
+class MongoAssistantStore(AssistantStore):
+    def _collection(self):
+        return Database.get_db()['assistants']
+
+    def insert(self, assistant: dict) -> ObjectId:
+        with _operation():
+            return self._collection().insert_one(assistant).inserted_id
+
+    def find_by_id(self, assistant_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+        with _operation():
+            return self._collection().find_one({"_id": assistant_id}, projection)
+
+    def find_by_user(self, user_id: ObjectId, projection: Optional[dict] = None) -> list:
+        with _operation():
+            return list(self._collection().find({"user_id": user_id}, projection))
+
+    def update(self, assistant_id: ObjectId, set_fields: dict) -> Optional[dict]:
+        with _operation():
+            return self._collection().find_one_and_update(
+                {"_id": assistant_id},
+                {"$set": set_fields},
+                return_document=ReturnDocument.BEFORE
+            )
+
+    def delete(self, assistant_id: ObjectId) -> Optional[dict]:
+        with _operation():
+            return self._collection().find_one_and_delete({"_id": assistant_id})
+
+    def delete_by_users(self, user_ids: list) -> int:
+        if not user_ids:
+            return 0
+        with _operation():
+            return self._collection().delete_many({"user_id": {"$in": user_ids}}).deleted_count
+
+    def watch(self, resume_after: Optional[dict] = None):
+        # Change streams need a replica set; standalone servers raise OperationFailure
+        return self._collection().watch(
+            [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}],
+            full_document="updateLookup",
+            resume_after=resume_after,
+            max_await_time_ms=1000
+        )
+
+
+class MongoLeaseStore(LeaseStore):
+    """One document per lease in the leases collection: {_id: name, owner, expires_at}"""
+
+    def _collection(self):
+        return Database.get_db()['leases']
+
+    def acquire(self, name: str, owner: str, ttl_s: float) -> bool:
+        now = datetime.utcnow()
+        try:
+            with _operation():
+                self._collection().update_one(
+                    {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                    {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_s)}},
+                    upsert=True
+                )
+            return True
+        except pymongo_errors.DuplicateKeyError:
+            # The lease exists, is held by someone else and has not expired
+            return False
+
+    def release(self, name: str, owner: str):
+        with _operation():
+            self._collection().delete_one({"_id": name, "owner": owner})
+
+
+class MongoIdempotencyKeyStore(IdempotencyKeyStore):
+    """
+    One document per key in the idempotency_keys collection:
+    {_id: key, fingerprint, response, expires_at}, removed by a TTL index
+    """
+
+    def _collection(self):
+        return Database.get_db()['idempotency_keys']
+
+    def claim(self, key: str, fingerprint: str, ttl_s: float) -> Optional[dict]:
+        # The TTL monitor runs once a minute, so expired records may still be
+        # there; retried in case the record is removed between both calls
+        for _ in range(3):
+            now = datetime.utcnow()
+            try:
+                with _operation():
+                    self._collection().update_one(
+                        {"_id": key, "expires_at": {"$lte": now}},
+                        {"$set": {"fingerprint": fingerprint, "response": None,
+                                  "expires_at": now + timedelta(seconds=ttl_s)}},
+                        upsert=True
+                    )
+                return None
+            except pymongo_errors.DuplicateKeyError:
+                # An unexpired record exists
+                with _operation():
+                    record = self._collection().find_one({"_id": key}, {"fingerprint": 1, "response": 1, "_id": 0})
+                if record is not None:
+                    return record
+        raise DuplicateKeyError(f"idempotency key kept changing: {key}")
+
+    def complete(self, key: str, fingerprint: str, response: dict, ttl_s: float):
+        with _operation():
+            self._collection().update_one(
+                {"_id": key, "fingerprint": fingerprint},
+                {"$set": {"response": response, "expires_at": datetime.utcnow() + timedelta(seconds=ttl_s)}}
+            )
+
+    def release(self, key: str, fingerprint: str):
+        with _operation():
+            self._collection().delete_one({"_id": key, "fingerprint": fingerprint, "response": None})
+
+
+class MongoAuditStore(AuditStore):
+    """
+    The audit_log collection, created on first use as a time-series
+    collection (MongoDB 5.0+) expiring after audit_retention_s, or as a
+    capped collection of audit_capped_bytes on older servers, or as a plain
+    collection with a TTL index where neither is supported (e.g. mongomock)
+    """
+
+    def __init__(self):
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _collection(self):
+        db = Database.get_db()
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self._create(db)
+                    self._ready = True
+        return db['audit_log']
+
+    @staticmethod
+    def _create(db):
+        if db.list_collection_names(filter={"name": "audit_log"}):
+            return
+        # OperationFailure: the server rejects the option; NotImplementedError:
+        # the client does not implement it (mongomock)
+        unsupported = (pymongo_errors.OperationFailure, NotImplementedError)
+        try:
+            db.create_collection(
+                "audit_log",
+                timeseries={"timeField": "ts", "metaField": "meta", "granularity": "seconds"},
+                expireAfterSeconds=int(settings.audit_retention_s)
+            )
+            logger.info("Created time-series collection audit_log")
+            return
+        except pymongo_errors.CollectionInvalid:
+            # Another worker created it first
+            return
+        except unsupported as error:
+            logger.info("Time-series collections unavailable (%s), creating a capped audit_log", error)
+        try:
+            db.create_collection("audit_log", capped=True, size=settings.audit_capped_bytes)
+            return
+        except pymongo_errors.CollectionInvalid:
+            return
+        except unsupported as error:
+            logger.info("Capped collections unavailable (%s), creating audit_log with a TTL index", error)
+        db['audit_log'].create_index("ts", name="expire_ts", expireAfterSeconds=int(settings.audit_retention_s))
+
+    def insert_many(self, events: list):
+        if not events:
+            return
+        collection = self._collection()
+        try:
+            with _operation():
+                collection.insert_many(events, ordered=False)
+        except pymongo_errors.BulkWriteError as error:
+            # A retried batch: the events that carry an _id from an earlier,
+            # partly successful attempt are already written
+            if any(write_error.get("code") != 11000 for write_error in error.details.get("writeErrors", [])):
+                raise
+
+    def recent(self, limit: int, event: Optional[str] = None, email: Optional[str] = None) -> list:
+        query = {}
+        if event is not None:
+            query["meta.event"] = event
+        if email is not None:
+            query["email"] = email
+        collection = self._collection()
+        with _operation():
+            return list(collection.find(query, {"_id": 0}).sort("ts", DESCENDING).limit(limit))
+
+
+def _counts_object(field_expression) -> dict:
+    """Pipeline stages' expression turning [{_id: key, n: count}] into {key: count}"""
+    return {"$arrayToObject": {"$map": {
+        "input": field_expression,
+        "in": {"k": "$$this._id", "v": "$$this.n"}
+    }}}
+
+
+class MongoAssistantStatsStore(AssistantStatsStore):
+    """The assistant_stats collection, maintained with $inc and rebuilt with $merge"""
+
+    def _collection(self):
+        return Database.get_db()['assistant_stats']
+
+    def increment(self, updates: dict):
+        if not updates:
+            return
+        operations = [
+            UpdateOne({"_id": stat_id}, {"$inc": fields, "$setOnInsert": self._identity(stat_id)}, upsert=True)
+            for stat_id, fields in updates.items()
+        ]
+        with _operation():
+            self._collection().bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def _identity(stat_id: str) -> dict:
+        """Fields set when a statistics document is first created"""
+        kind, _, key = stat_id.partition(":")
+        if kind == "user":
+            return {"kind": "user", "user_id": ObjectId(key)}
+        if kind == "day":
+            return {"kind": "day", "day": key}
+        return {"kind": kind}
+
+    def get(self, stat_ids: list) -> list:
+        with _operation():
+            return list(self._collection().find({"_id": {"$in": stat_ids}}))
+
+    def top_users(self, limit: int) -> list:
+        with _operation():
+            return list(
+                self._collection().find({"kind": "user", "assistants": {"$gt": 0}})
+                .sort("assistants", DESCENDING)
+                .limit(limit)
+            )
+
+    def reconcile(self, since: datetime):
+        assistants = Database.get_db()['assistants']
+        run_id = ObjectId()
+        bucket = {"$toString": {"$toInt": {"$min": [
+            {"$floor": {"$divide": [{"$add": ["$temperature", 1e-9]}, TEMPERATURE_BUCKET_WIDTH]}},
+            TEMPERATURE_BUCKETS - 1
+        ]}}}
+        # Full-collection aggregations: no request-sized time limit
+        with _operation(limited=False):
+            assistants.aggregate([
+                {"$facet": {
+                    "total": [{"$count": "n"}],
+                    "voices": [{"$group": {
+                        "_id": {"$replaceAll": {"input": "$voice", "find": ".", "replacement": "_"}},
+                        "n": {"$sum": 1}
+                    }}],
+                    "temperature": [{"$group": {"_id": bucket, "n": {"$sum": 1}}}],
+                }},
+                {"$project": {
+                    "_id": "totals",
+                    "kind": "totals",
+                    "total": {"$ifNull": [{"$arrayElemAt": ["$total.n", 0]}, 0]},
+                    "voices": _counts_object("$voices"),
+                    "temperature": _counts_object("$temperature"),
+                    "reconciled_at": "$$NOW",
+                }},
+                {"$merge": {"into": "assistant_stats", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+            ])
+            assistants.aggregate([
+                {"$group": {"_id": "$user_id", "n": {"$sum": 1}}},
+                {"$project": {
+                    "_id": {"$concat": ["user:", {"$toString": "$_id"}]},
+                    "kind": "user",
+                    "user_id": "$_id",
+                    "assistants": "$n",
+                    "reconciled_at": "$$NOW",
+                    "reconcile_run": run_id,
+                }},
+                {"$merge": {"into": "assistant_stats", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+            ])
+            # Users not seen above have no assistants left (documents created
+            # by increment() since the aggregation have no reconcile_run yet)
+            self._collection().delete_many({"kind": "user", "reconcile_run": {"$exists": True, "$ne": run_id}})
+            assistants.aggregate([
+                {"$match": {"created_at": {"$gte": since}}},
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "n": {"$sum": 1}}},
+                {"$project": {
+                    "_id": {"$concat": ["day:", "$_id"]},
+                    "kind": "day",
+                    "day": "$_id",
+                    "created": "$n",
+                    "reconciled_at": "$$NOW",
+                }},
+                # Assistants deleted since cannot be counted any more, so the
+                # surviving ones only raise a created count that fell short;
+                # deleted counts are kept as they are
+                {"$merge": {
+                    "into": "assistant_stats",
+                    "on": "_id",
+                    "whenMatched": [{"$set": {
+                        "created": {"$max": [{"$ifNull": ["$created", 0]}, "$$new.created"]},
+                        "reconciled_at": "$$new.reconciled_at",
+                    }}],
+                    "whenNotMatched": "insert",
+                }},
+            ])
+
+
+class MongoStorage(Storage):
+    """Storage backed by MongoDB through app.config.database.Database"""
+
+    def __init__(self):
+        self.users = MongoUserStore()
+        self.otps = MongoOTPStore()
+        self.assistants = MongoAssistantStore()
+        self.leases = MongoLeaseStore()
+        self.idempotency_keys = MongoIdempotencyKeyStore()
+        self.audit = MongoAuditStore()
+        self.assistant_stats = MongoAssistantStatsStore()
+
+    def connect(self):
+        Database.connect()
+
+    def ping(self, connections: int = 1):
+        db = Database.get_db()
+        db.command("ping")
+        if connections > 1:
+            # Concurrent pings force the pool to open that many sockets now
+            # instead of on the first requests
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(lambda _: db.command("ping"), range(connections)))
+
+    def close(self):
+        Database.close()
+
+    def ensure_indexes(self) -> list:
+        # First, so a failure of the other indexes cannot leave registration
+        # looking emails up before every insert
+        duplicates = self.users.ensure_unique_email_index()
+        if duplicates:
+            logger.error(
+                "Emails registered more than once, the unique email index cannot be created "
+                "until they are merged (registration keeps checking emails first): %s",
+                ", ".join(duplicates)
+            )
+        Database.get_db()['assistant_stats'].create_index(
+            [("kind", ASCENDING), ("assistants", DESCENDING)],
+            name="users_by_assistants"
+        )
+        Database.get_db()['idempotency_keys'].create_index("expires_at", name="expire_at", expireAfterSeconds=0)
+        users = Database.get_db()['users']
+        # Only users with a pending OTP are indexed
+        users.create_index([("otp", ASCENDING)], name="pending_otp", sparse=True)
+        users.create_index(
+            [("verified", ASCENDING), ("_id", ASCENDING)],
+            name="unverified_by_age",
+            partialFilterExpression={"verified": False}
+        )
+        return duplicates
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.storage import get_storage
+from app.storage.base import TEMPERATURE_BUCKET_WIDTH, TEMPERATURE_BUCKETS, temperature_bucket, voice_key
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+analytics_flushes_total = registry.counter(
+    "analytics_flushes_total",
+    "Background writes of merged assistant analytics increments, by result",
+    ("result",),
+)
+
+
+def _add(updates: dict, stat_id: str, field: str, amount: int):
+    fields = updates.setdefault(stat_id, {})
+    fields[field] = fields.get(field, 0) + amount
+
+
+def _count(updates: dict, assistant: dict, amount: int):
+    """Add (amount=1) or remove (amount=-1) one assistant's contribution to totals"""
+    _add(updates, "totals", "total", amount)
+    _add(updates, "totals", f"voices.{voice_key(assistant['voice'])}", amount)
+    _add(updates, "totals", f"temperature.{temperature_bucket(assistant['temperature'])}", amount)
+
+
+def _merge(into: dict, updates: dict):
+    for stat_id, fields in updates.items():
+        for field, amount in fields.items():
+            _add(into, stat_id, field, amount)
+
+
+class AnalyticsBuffer:
+    """
+    Analytics increments merged in memory and written in the background
+
+    Request handlers only add to a pending map of statistics document ->
+    field increments; a writer task writes it with one increment() every
+    flush_interval_s, in the threadpool, so a burst of assistant writes
+    costs one bulk write rather than one per request. A failed write is
+    merged back and retried with the next one. Increments still pending
+    are lost if the worker dies, and a reconciliation racing a flush may
+    count them twice; the next reconciliation corrects either drift.
+    """
+
+    def __init__(self, flush_interval_s: float):
+        self.flush_interval_s = flush_interval_s
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer task and write what is still pending"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def add(self, updates: dict):
+        """Merge increments into the pending ones"""
+        if self._task is None:
+            self.start()
+        with self._lock:
+            _merge(self._pending, updates)
+
+    async def flush(self):
+        """Write the pending increments now"""
+        with self._lock:
+            updates, self._pending = self._pending, {}
+        # Increments that cancelled out need no write
+        updates = {stat_id: {field: amount for field, amount in fields.items() if amount}
+                   for stat_id, fields in updates.items()}
+        updates = {stat_id: fields for stat_id, fields in updates.items() if fields}
+        if not updates:
+            return
+        try:
+            await run_in_threadpool(get_storage().assistant_stats.increment, updates)
+            analytics_flushes_total.inc(result="written")
+        except Exception as error:
+            logger.error("Failed to update assistant analytics, retrying with the next flush: %s", error)
+            analytics_flushes_total.inc(result="failed")
+            with self._lock:
+                _merge(self._pending, updates)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            await self.flush()
+
+
+analytics_buffer = AnalyticsBuffer(settings.analytics_flush_interval_s)
+
+
+def _apply(updates: dict):
+    # Never fails or waits on the write it describes
+    analytics_buffer.add(updates)
+
+
+def record_created(assistant: dict):
+    """Count a newly inserted assistant"""
+    updates = {}
+    _count(updates, assistant, 1)
+    _add(updates, f"user:{assistant['user_id']}", "assistants", 1)
+    _add(updates, f"day:{assistant['created_at']:%Y-%m-%d}", "created", 1)
+    _apply(updates)
+
+
+def record_updated(previous: dict, set_fields: dict):
+    """Move an updated assistant between voice and temperature buckets"""
+    if "voice" not in set_fields and "temperature" not in set_fields:
+        return
+    updates = {}
+    _count(updates, previous, -1)
+    # Entries that cancel out (unchanged voice or bucket) are dropped at flush
+    _count(updates, {**previous, **set_fields}, 1)
+    _apply(updates)
+
+
+def record_deleted(assistant: dict):
+    """Uncount a deleted assistant"""
+    updates = {}
+    _count(updates, assistant, -1)
+    _add(updates, f"user:{assistant['user_id']}", "assistants", -1)
+    _add(updates, f"day:{datetime.utcnow():%Y-%m-%d}", "deleted", 1)
+    _apply(updates)
+
+
+def summary(days: int, top_users: int) -> dict:
+    """
+    Dashboard view of the statistics: a handful of reads by _id plus one
+    indexed query for the top users, whatever the number of assistants
+
+    Args:
+        days: Number of days of creation/deletion counts, ending today
+        top_users: Number of users with the most assistants to include
+    """
+    stats = get_storage().assistant_stats
+    today = datetime.utcnow().date()
+    day_keys = [f"{today - timedelta(days=offset):%Y-%m-%d}" for offset in range(days - 1, -1, -1)]
+    docs = {doc['_id']: doc for doc in stats.get(["totals"] + [f"day:{day}" for day in day_keys])}
+    totals = docs.get("totals", {})
+
+    temperature = totals.get("temperature", {})
+    histogram = []
+    for index in range(TEMPERATURE_BUCKETS):
+        low = round(index * TEMPERATURE_BUCKET_WIDTH, 2)
+        high = round(low + TEMPERATURE_BUCKET_WIDTH, 2)
+        histogram.append({"range": f"{low:.1f}-{high:.1f}", "count": temperature.get(str(index), 0)})
+
+    return {
+        "total": totals.get("total", 0),
+        "voices": {voice: count for voice, count in sorted(totals.get("voices", {}).items()) if count},
+        "temperature": histogram,
+        "daily": [
+            {
+                "day": day,
+                "created": docs.get(f"day:{day}", {}).get("created", 0),
+                "deleted": docs.get(f"day:{day}", {}).get("deleted", 0),
+            }
+            for day in day_keys
+        ],
+        "top_users": [
+            {"user_id": str(doc['user_id']), "assistants": doc['assistants']}
+            for doc in stats.top_users(top_users)
+        ],
+        "reconciled_at": totals['reconciled_at'].isoformat() + "Z" if totals.get('reconciled_at') else None,
+    }
@@ -0,0 +1,287 @@
+import asyncio
+import itertools
+import logging
+import threading
+import uuid
+from collections import deque
+from typing import Optional
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from app.config.settings import settings
+from app.storage import get_storage
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+assistant_event_subscribers = registry.gauge(
+    "assistant_event_subscribers",
+    "Open assistant change event streams",
+)
+assistant_events_total = registry.counter(
+    "assistant_events_total",
+    "Assistant change events dispatched to subscribers, by operation and source",
+    ("operation", "source"),
+)
+assistant_event_subscribers_dropped_total = registry.counter(
+    "assistant_event_subscribers_dropped_total",
+    "Subscribers disconnected because they fell too far behind",
+)
+
+# Change stream operation -> event name sent to clients
+_OPERATIONS = {"insert": "created", "update": "updated", "replace": "updated", "delete": "deleted"}
+
+
+class AssistantEvent:
+    """One change to an assistant, as sent to subscribers"""
+
+    __slots__ = ("id", "operation", "user_id", "assistant_id", "document")
+
+    def __init__(self, event_id: str, operation: str, user_id: Optional[ObjectId], assistant_id: ObjectId,
+                 document: Optional[dict] = None):
+        self.id = event_id
+        self.operation = operation
+        self.user_id = user_id
+        self.assistant_id = assistant_id
+        self.document = document
+
+
+# Sent instead of the missed events when a subscriber cannot be resumed
+RESET = "reset"
+
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+_NON_RESUMABLE_CODES = {260, 280, 286}
+
+
+def _is_non_resumable(error: Exception) -> bool:
+    """Whether a change stream error means its resume token can no longer be used"""
+    if not isinstance(error, OperationFailure):
+        return False
+    return error.code in _NON_RESUMABLE_CODES or error.has_error_label("NonResumableChangeStreamError")
+
+
+class Subscription:
+    """Events for one user's assistants, read by one stream"""
+
+    def __init__(self, user_id: ObjectId, max_size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: tell the client to resync and let the stream end
+            self.overflowed = True
+            assistant_event_subscribers_dropped_total.inc()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+
+class AssistantEventHub:
+    """
+    In-process fan-out of assistant changes to streaming subscribers
+
+    With MongoDB on a replica set, a watcher thread tails a change stream of
+    the assistants collection, so changes written by any worker reach every
+    worker's subscribers, and event ids are change stream resume tokens.
+    Without change streams (standalone mongod, memory backend) the routes
+    publish their own writes and only this worker's changes are seen. The
+    same applies while a change stream is down; if it cannot be resumed, it
+    restarts from the current time and every subscriber gets a reset event.
+
+    Recent events are kept in a ring buffer so a client reconnecting with
+    Last-Event-ID gets what it missed; if that id has already left the
+    buffer it receives a reset event and should refetch its assistants.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.queue_size = queue_size
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = {}
+        self._listeners = []
+        # assistant_id -> user_id, so deletes (which carry only the _id) can be
+        # routed; only kept for users with an open stream, and pruned with it
+        self._owners = {}
+        # user_id -> _ids of that user's assistants in _owners
+        self._owned = {}
+        self._loop = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._stream_active = False
+        # Local event ids are unique per process so a stale Last-Event-ID from
+        # another worker or a previous run is never mistaken for one of ours
+        self._local_prefix = uuid.uuid4().hex[:8]
+        self._local_seq = itertools.count(1)
+
+    def start(self):
+        """Start tailing the change stream, if the storage backend has one"""
+        self._loop = asyncio.get_running_loop()
+        if not settings.change_stream_enabled or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="assistant-change-stream", daemon=True)
+        self._watcher.start()
+
+    async def stop(self):
+        """Stop the watcher thread and end every open stream"""
+        self._stop.set()
+        if self._watcher is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._watcher.join, 5)
+            self._watcher = None
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.offer(None)
+
+    def _watch(self):
+        resume_token = None
+        watched = False
+        while not self._stop.is_set():
+            try:
+                stream = get_storage().assistants.watch(resume_after=resume_token)
+                if stream is None:
+                    logger.info("Storage backend has no change streams, publishing local writes only")
+                    return
+                with stream:
+                    self._stream_active = watched = True
+                    logger.info("Watching assistant changes through a change stream")
+                    while not self._stop.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            resume_token = change["_id"]
+                            self._loop.call_soon_threadsafe(self._on_change, change)
+            except Exception as error:
+                # Publish this worker's writes locally until the stream is back
+                self._stream_active = False
+                if not watched:
+                    logger.info("Change streams unavailable, publishing local writes only: %s", error)
+                    return
+                if _is_non_resumable(error):
+                    logger.warning("Assistant change stream cannot be resumed, restarting from now: %s", error)
+                    resume_token = None
+                    self._loop.call_soon_threadsafe(self._reset)
+                else:
+                    logger.warning("Assistant change stream failed, resuming: %s", error)
+                self._stop.wait(1)
+            finally:
+                if self._stop.is_set():
+                    self._stream_active = False
+
+    def _reset(self):
+        """Changes were lost: every subscriber, and any client resuming from the buffer, must resync"""
+        self._buffer.clear()
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.offer(RESET)
+
+    def _on_change(self, change: dict):
+        operation = _OPERATIONS.get(change.get("operationType"))
+        if operation is None:
+            return
+        assistant_id = change["documentKey"]["_id"]
+        document = change.get("fullDocument")
+        if operation != "deleted" and document is None:
+            # Deleted again before the update lookup ran; the delete event follows
+            return
+        self._dispatch(change["_id"]["_data"], operation, assistant_id, document, "change_stream")
+
+    def publish_local(self, operation: str, assistant_id: ObjectId, document: Optional[dict] = None):
+        """
+        Publish a write made by this worker
+
+        Ignored while a change stream is active, since the write will come
+        back through it.
+
+        Args:
+            operation: "created", "updated" or "deleted"
+            assistant_id: _id of the assistant
+            document: The assistant after the write (None for deletes)
+        """
+        if not self._stream_active:
+            self._dispatch(f"{self._local_prefix}-{next(self._local_seq)}", operation, assistant_id, document, "local")
+
+    @property
+    def streaming(self) -> bool:
+        """Whether changes made by every worker are seen, not just this one's"""
+        return self._stream_active
+
+    def add_listener(self, callback):
+        """
+        Call callback(operation, assistant_id, document) on the loop thread for
+        every change, whether or not anyone is subscribed to its user
+        """
+        self._listeners.append(callback)
+
+    def _dispatch(self, event_id: str, operation: str, assistant_id: ObjectId, document: Optional[dict], source: str):
+        for listener in self._listeners:
+            try:
+                listener(operation, assistant_id, document)
+            except Exception as error:
+                logger.error("Assistant change listener failed: %s", error)
+        if document is not None:
+            user_id = document["user_id"]
+            if user_id in self._subscribers:
+                self._track(user_id, assistant_id)
+        else:
+            user_id = self._owners.pop(assistant_id, None)
+            if user_id is not None:
+                self._owned[user_id].discard(assistant_id)
+        # A delete of an assistant whose owner has no open stream is buffered
+        # unrouted (user_id None): a client resuming across it is reset
+        event = AssistantEvent(event_id, operation, user_id, assistant_id, document)
+        self._buffer.append(event)
+        assistant_events_total.inc(operation=operation, source=source)
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.offer(event)
+
+    def _track(self, user_id: ObjectId, assistant_id: ObjectId):
+        self._owners[assistant_id] = user_id
+        self._owned.setdefault(user_id, set()).add(assistant_id)
+
+    def subscribe(self, user_id: ObjectId, assistant_ids, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        Register a stream for one user's assistants
+
+        Args:
+            user_id: Owner of the assistants
+            assistant_ids: _ids of the user's current assistants, so their deletes can be routed
+            last_event_id: Id of the last event the client received, to resume after it
+
+        Returns:
+            Subscription: Queue of AssistantEvent, RESET, or None when the hub stops
+        """
+        for assistant_id in assistant_ids:
+            self._track(user_id, assistant_id)
+        subscription = Subscription(user_id, self.queue_size)
+        if last_event_id:
+            # Runs on the loop thread, like _dispatch, so no event slips in between
+            missed = None
+            for index, event in enumerate(self._buffer):
+                if event.id == last_event_id:
+                    missed = list(itertools.islice(self._buffer, index + 1, None))
+                    break
+            if missed is None or any(event.user_id is None for event in missed):
+                subscription.offer(RESET)
+            else:
+                for event in missed:
+                    if event.user_id == user_id:
+                        subscription.offer(event)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        assistant_event_subscribers.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None and subscription in subscriptions:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+                for assistant_id in self._owned.pop(subscription.user_id, ()):
+                    self._owners.pop(assistant_id, None)
+            assistant_event_subscribers.dec()
+
+
+assistant_events = AssistantEventHub(settings.sse_replay_buffer_size, settings.sse_queue_size)
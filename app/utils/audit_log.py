@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.storage import get_storage
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+audit_events_queued = registry.gauge(
+    "audit_events_queued",
+    "Audit events waiting to be written",
+)
+audit_events_total = registry.counter(
+    "audit_events_total",
+    "Audit events, by what happened to them (written, dropped, failed after the last attempt)",
+    ("result",),
+)
+audit_flush_duration_seconds = registry.histogram(
+    "audit_flush_duration_seconds",
+    "Time taken to write one batch of audit events",
+)
+
+
+class AuditLog:
+    """
+    In-memory buffer of authentication events written in batches
+
+    record() only queues the event; a writer task inserts queued events with
+    one insert_many once batch_size have accumulated or flush_interval_s has
+    passed since the oldest one arrived, so auth requests never wait on the
+    database for auditing. When writes fall behind and the buffer fills,
+    record() waits up to enqueue_timeout_s for room (slowing auth traffic
+    down to what the database absorbs) and then drops the event.
+
+    A batch that fails to write is retried after retry_backoff_s, doubled
+    after each failure, up to max_attempts writes; meanwhile new events
+    wait in the buffer. Only then is the batch dropped.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval_s: float, enqueue_timeout_s: float,
+                 max_attempts: int, retry_backoff_s: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.enqueue_timeout_s = enqueue_timeout_s
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Write what is still buffered (up to timeout seconds), then stop"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %s buffered audit events at shutdown", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def record(self, event: str, outcome: str, email: Optional[str] = None,
+                     request: Optional[Request] = None, **detail):
+        """
+        Queue one audit event
+
+        Args:
+            event: What was attempted, e.g. "login" or "reset_password"
+            outcome: "success", "failure" or "error"
+            email: Account the attempt was about
+            request: Incoming request, for the client address and user agent
+            detail: Extra fields stored with the event, e.g. reason="Invalid OTP"
+        """
+        if not settings.audit_enabled:
+            return
+        if self._task is None:
+            self.start()
+        doc = {
+            "ts": datetime.utcnow(),
+            "meta": {"event": event, "outcome": outcome},
+            "email": email,
+        }
+        if request is not None:
+            doc["ip"] = request.client.host if request.client else None
+            doc["user_agent"] = request.headers.get("user-agent")
+        doc.update(detail)
+
+        try:
+            self._queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(doc), self.enqueue_timeout_s)
+            except asyncio.TimeoutError:
+                audit_events_total.inc(result="dropped")
+                logger.warning("Audit buffer full, dropped %s event for %s", event, email)
+                return
+        audit_events_queued.inc()
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(batch)
+            audit_events_queued.dec(len(batch))
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _write(self, batch: list):
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                await run_in_threadpool(get_storage().audit.insert_many, batch)
+                audit_events_total.inc(len(batch), result="written")
+                return
+            except Exception as error:
+                if attempt == self.max_attempts:
+                    logger.error("Dropping %s audit events after %s failed writes: %s", len(batch), attempt, error)
+                    audit_events_total.inc(len(batch), result="failed")
+                    return
+                logger.warning("Failed to write %s audit events (attempt %s of %s), retrying: %s",
+                               len(batch), attempt, self.max_attempts, error)
+            finally:
+                audit_flush_duration_seconds.observe(time.perf_counter() - start)
+            await asyncio.sleep(self.retry_backoff_s * 2 ** (attempt - 1))
+
+
+audit_log = AuditLog(
+    settings.audit_queue_size,
+    settings.audit_batch_size,
+    settings.audit_flush_interval_s,
+    settings.audit_enqueue_timeout_s,
+    settings.audit_max_attempts,
+    settings.audit_retry_backoff_s
+)
@@ -0,0 +1,67 @@
+from fastapi import HTTPException, Request, status
+from app.storage import get_storage
+from app.config.settings import settings
+from bson import ObjectId
+import jwt
+
+
+def get_token_payload(request: Request) -> dict:
+    """
+    Decode the JWT sent in the token cookie or an Authorization: Bearer header
+
+    Args:
+        request: Incoming request
+
+    Returns:
+        dict: Decoded token payload
+
+    Raises:
+        HTTPException: If the token is missing, expired or invalid
+    """
+    token = request.cookies.get("token")
+    authorization = request.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    try:
+        return jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+
+def require_admin(request: Request) -> dict:
+    """
+    FastAPI dependency allowing only users with the admin role
+
+    Args:
+        request: Incoming request
+
+    Returns:
+        dict: Decoded token payload of the admin user
+
+    Raises:
+        HTTPException: If the caller is not authenticated or not an admin
+    """
+    payload = get_token_payload(request)
+    try:
+        user_obj_id = ObjectId(payload.get("clientId"))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+    user = get_storage().users.find_by_id(user_obj_id, {"role": 1})
+    if not user or user.get('role') != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return payload
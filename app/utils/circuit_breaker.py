@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pymongo import errors as pymongo_errors
+from app.config.settings import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+circuit_breaker_state = registry.gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open",
+    ("name",),
+)
+circuit_breaker_rejections_total = registry.counter(
+    "circuit_breaker_rejections_total",
+    "Calls refused without being attempted because the circuit was open",
+    ("name",),
+)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """The dependency is considered down; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for a blocking dependency
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast with CircuitOpenError for reset_timeout_s. Then it turns
+    half-open: one trial call at a time goes through, and the first success
+    closes the circuit while a failure opens it again.
+
+    Only exceptions of failure_types count as failures (e.g. lost connections
+    and timeouts, not duplicate keys); any other outcome counts as a success.
+    State is per process.
+    """
+
+    def __init__(self, name: str, failure_types: tuple, failure_threshold: int, reset_timeout_s: float):
+        self.name = name
+        self.failure_types = failure_types
+        # What callers see while the dependency is down, refused or attempted
+        self.unavailable_errors = (CircuitOpenError,) + failure_types
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        circuit_breaker_state.set(0, name=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+                return HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are refused outright (not counting half-open trials)"""
+        return self.state == OPEN
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.warning("Circuit %s is now %s", self.name, state)
+            self._state = state
+            circuit_breaker_state.set(_STATE_VALUES[state], name=self.name)
+
+    def _before_call(self) -> bool:
+        """Let a call through or raise CircuitOpenError; True for a half-open trial"""
+        with self._lock:
+            if self._state == CLOSED:
+                return False
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_s:
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+        circuit_breaker_rejections_total.inc(name=self.name)
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def _after_call(self, trial: bool, failed: bool):
+        with self._lock:
+            if trial:
+                self._trial_running = False
+            if not failed:
+                self._failures = 0
+                self._set_state(CLOSED)
+                return
+            self._failures += 1
+            if trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    @contextmanager
+    def guard(self):
+        """
+        Run a block as one call to the dependency
+
+        Raises:
+            CircuitOpenError: If the circuit is open; the block does not run
+        """
+        trial = self._before_call()
+        try:
+            yield
+        except BaseException as error:
+            self._after_call(trial, failed=isinstance(error, self.failure_types))
+            raise
+        self._after_call(trial, failed=False)
+
+
+mongo_breaker = CircuitBreaker(
+    "mongo",
+    # Lost connections, server selection and network timeouts, failovers
+    # (ConnectionFailure) and operations exceeding their time limit
+    (pymongo_errors.ConnectionFailure, pymongo_errors.ExecutionTimeout),
+    settings.circuit_failure_threshold,
+    settings.circuit_reset_timeout_s
+)
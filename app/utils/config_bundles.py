@@ -0,0 +1,169 @@
+import gzip
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+from bson import ObjectId
+from app.config.settings import settings
+from app.models.ai_assistant import AIAssistantResponse
+from app.storage import get_storage
+from app.utils.assistant_events import assistant_events
+from app.utils.http_cache import collection_etag
+from app.utils.metrics import registry
+from app.utils.singleflight import assistant_reads
+
+logger = logging.getLogger(__name__)
+
+config_bundle_requests_total = registry.counter(
+    "config_bundle_requests_total",
+    "Runtime config bundle lookups, by whether the bundle was cached",
+    ("result",),
+)
+config_bundle_rebuilds_total = registry.counter(
+    "config_bundle_rebuilds_total",
+    "Runtime config bundles reserialized after an assistant change, by operation",
+    ("operation",),
+)
+config_bundles_cached = registry.gauge(
+    "config_bundles_cached",
+    "Users with a runtime config bundle in this worker's cache",
+)
+
+
+def _fragment(doc: dict) -> bytes:
+    """One assistant serialized the way the assistant routes return it"""
+    return AIAssistantResponse(
+        id=str(doc['_id']),
+        user_id=str(doc['user_id']),
+        name=doc['name'],
+        system_message=doc['system_message'],
+        voice=doc['voice'],
+        temperature=doc['temperature'],
+        created_at=doc['created_at'].isoformat() + "Z",
+        updated_at=doc['updated_at'].isoformat() + "Z"
+    ).model_dump_json().encode("utf-8")
+
+
+class ConfigBundle:
+    """
+    Serialized snapshot of all of one user's assistants
+
+    Keeps each assistant's JSON separately, so a change reserializes one
+    assistant and re-joins the rest. The ETag is the collection ETag of the
+    assistants (from _id and updated_at), so every worker computes the same
+    version for the same data.
+    """
+
+    __slots__ = ("user_id", "etag", "body", "gzip_body", "built_at", "_fragments", "_versions")
+
+    def __init__(self, user_id: ObjectId, docs: list):
+        self.user_id = user_id
+        self._fragments = {doc['_id']: _fragment(doc) for doc in docs}
+        self._versions = {doc['_id']: {"_id": doc['_id'], "updated_at": doc['updated_at']} for doc in docs}
+        self.built_at = time.monotonic()
+        self._serialize()
+
+    @property
+    def assistant_ids(self):
+        return self._fragments.keys()
+
+    def apply(self, assistant_id: ObjectId, doc: Optional[dict]):
+        """Replace (or with doc None, remove) one assistant and reserialize"""
+        if doc is None:
+            self._fragments.pop(assistant_id, None)
+            self._versions.pop(assistant_id, None)
+        else:
+            self._fragments[assistant_id] = _fragment(doc)
+            self._versions[assistant_id] = {"_id": assistant_id, "updated_at": doc['updated_at']}
+        self._serialize()
+
+    def _serialize(self):
+        self.etag = collection_etag(list(self._versions.values()))
+        assistants = b",".join(self._fragments[key] for key in sorted(self._fragments, key=str))
+        self.body = (
+            b'{"user_id":"' + str(self.user_id).encode("ascii")
+            + b'","version":' + self.etag.encode("ascii")
+            + b',"assistants":[' + assistants
+            + b'],"total":' + str(len(self._fragments)).encode("ascii") + b"}"
+        )
+        self.gzip_body = gzip.compress(self.body, compresslevel=settings.config_bundle_gzip_level, mtime=0)
+
+
+class ConfigBundleCache:
+    """
+    Per-worker LRU of users' runtime config bundles
+
+    Bundles are built on first request and then kept current from the
+    assistant event hub: creates, updates and deletes rewrite the affected
+    user's bundle in place. With a change stream that covers writes made by
+    any worker; without one only this worker's writes are seen, so bundles
+    are also rebuilt once they are older than config_bundle_ttl_s.
+    """
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._bundles = OrderedDict()
+        # assistant_id -> user_id of cached bundles, to route deletes
+        self._owners = {}
+        # Bumped on every change, so a build that raced a change isn't cached
+        self._generation = 0
+        assistant_events.add_listener(self._on_change)
+
+    async def get(self, user_id: ObjectId) -> ConfigBundle:
+        """
+        The user's bundle, built from storage if it is not cached
+
+        Raises:
+            asyncio.TimeoutError: If the assistants could not be read in time
+        """
+        bundle = self._bundles.get(user_id)
+        if bundle is not None and (
+            assistant_events.streaming or time.monotonic() - bundle.built_at < settings.config_bundle_ttl_s
+        ):
+            self._bundles.move_to_end(user_id)
+            config_bundle_requests_total.inc(result="hit")
+            return bundle
+
+        config_bundle_requests_total.inc(result="miss")
+        generation = self._generation
+        docs = await assistant_reads.do(
+            ("user_assistants", user_id),
+            get_storage().assistants.find_by_user,
+            user_id,
+            timeout=settings.singleflight_wait_timeout_s
+        )
+        bundle = ConfigBundle(user_id, docs)
+        if generation == self._generation:
+            self._store(bundle)
+        return bundle
+
+    def _store(self, bundle: ConfigBundle):
+        self._evict(bundle.user_id)
+        self._bundles[bundle.user_id] = bundle
+        for assistant_id in bundle.assistant_ids:
+            self._owners[assistant_id] = bundle.user_id
+        while len(self._bundles) > self.max_users:
+            self._evict(next(iter(self._bundles)))
+        config_bundles_cached.set(len(self._bundles))
+
+    def _evict(self, user_id: ObjectId):
+        bundle = self._bundles.pop(user_id, None)
+        if bundle is not None:
+            for assistant_id in bundle.assistant_ids:
+                self._owners.pop(assistant_id, None)
+
+    def _on_change(self, operation: str, assistant_id: ObjectId, document: Optional[dict]):
+        self._generation += 1
+        user_id = document['user_id'] if document is not None else self._owners.get(assistant_id)
+        bundle = self._bundles.get(user_id)
+        if bundle is None:
+            return
+        bundle.apply(assistant_id, document)
+        if document is None:
+            self._owners.pop(assistant_id, None)
+        else:
+            self._owners[assistant_id] = user_id
+        config_bundle_rebuilds_total.inc(operation=operation)
+
+
+config_bundles = ConfigBundleCache(settings.config_bundle_cache_size)
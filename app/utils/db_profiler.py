@@ -0,0 +1,178 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from pymongo import monitoring
+from app.config.settings import settings
+from app.utils.metrics import registry
+from app.utils.tracing import current_span, record_span
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_query")
+
+mongo_command_duration_seconds = registry.histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency in seconds",
+    ("command", "collection"),
+)
+mongo_slow_commands_total = registry.counter(
+    "mongo_slow_commands_total",
+    "MongoDB commands slower than the slow query threshold",
+    ("command", "collection"),
+)
+mongo_command_failures_total = registry.counter(
+    "mongo_command_failures_total",
+    "MongoDB commands that failed",
+    ("command", "collection"),
+)
+
+# Commands that are part of the driver's own housekeeping, not the app's queries
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+
+class RequestDBStats:
+    """DB time, round trips and storage operations accumulated for one HTTP request"""
+
+    __slots__ = ("route", "round_trips", "operations", "duration_ms", "commands")
+
+    def __init__(self, route: str = "unmatched"):
+        self.route = route
+        self.round_trips = 0
+        # Storage calls made by the request (one per store method, counted
+        # even where no command reaches the wire, e.g. with mongomock)
+        self.operations = 0
+        self.duration_ms = 0.0
+        self.commands = []
+
+    def record(self, command_name: str, collection: str, duration_ms: float):
+        self.round_trips += 1
+        self.duration_ms += duration_ms
+        self.commands.append((command_name, collection, duration_ms))
+
+    def server_timing(self) -> str:
+        """Render the Server-Timing header value"""
+        return (
+            f'db;dur={self.duration_ms:.2f};desc="{self.round_trips} round trips", '
+            f'storage;desc="{self.operations} operations"'
+        )
+
+
+# Stats object of the request currently being handled, set by ServerTimingMiddleware
+current_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("current_db_stats", default=None)
+
+
+def _shape(value):
+    """Replace literal values in a filter with placeholders, keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        # Operator lists like $and/$or keep their structure, value lists collapse
+        if value and all(isinstance(item, dict) for item in value):
+            return [_shape(item) for item in value]
+        return ["?"]
+    return "?"
+
+
+def filter_shape(command_name: str, command) -> str:
+    """
+    Extract the normalized filter shape of a command, e.g. {"email": "?"}
+
+    Args:
+        command_name: Command name such as "find" or "update"
+        command: The raw command document
+
+    Returns:
+        str: Compact JSON rendering of the filter shape, or "" when the command has none
+    """
+    query = None
+    if command_name in ("find", "count", "distinct"):
+        query = command.get("filter", command.get("query"))
+    elif command_name == "findAndModify":
+        query = command.get("query")
+    elif command_name == "update":
+        updates = command.get("updates") or [{}]
+        query = updates[0].get("q")
+    elif command_name == "delete":
+        deletes = command.get("deletes") or [{}]
+        query = deletes[0].get("q")
+    elif command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        query = pipeline[0].get("$match")
+    if query is None:
+        return ""
+    return json.dumps(_shape(query), separators=(",", ":"), default=str)
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """
+    pymongo command listener recording the duration, command name, collection
+    and filter shape of every command, attributed to the current request
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        # Listener callbacks run on the thread issuing the command, so the
+        # request's contextvar is visible here
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = (
+                collection,
+                filter_shape(event.command_name, event.command),
+                current_db_stats.get(),
+                current_span.get(),
+            )
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        collection, shape, stats, parent_span = pending
+        duration_ms = event.duration_micros / 1000
+        command_name = event.command_name
+
+        end_ns = time.time_ns()
+        record_span(
+            parent_span,
+            f"mongo.{command_name}",
+            end_ns - event.duration_micros * 1000,
+            end_ns,
+            kind="client",
+            error=str(getattr(event, "failure", "")) if failed else None,
+            **{"db.system": "mongodb", "db.operation": command_name, "db.collection": collection, "db.statement": shape}
+        )
+
+        mongo_command_duration_seconds.observe(duration_ms / 1000, command=command_name, collection=collection)
+        if failed:
+            mongo_command_failures_total.inc(command=command_name, collection=collection)
+        if stats is not None:
+            stats.record(command_name, collection, duration_ms)
+
+        if duration_ms >= settings.slow_query_threshold_ms:
+            mongo_slow_commands_total.inc(command=command_name, collection=collection)
+            slow_query_logger.warning(
+                "Slow MongoDB command: %s on %s filter=%s took %.1f ms (route %s)",
+                command_name,
+                collection,
+                shape,
+                duration_ms,
+                stats.route if stats is not None else "-",
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+command_profiler = CommandProfiler()
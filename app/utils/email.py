@@ -1,12 +1,53 @@
 import smtplib
 import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.config.settings import settings
+from app.utils.metrics import timed_section
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _verification_message(email: str, otp: str) -> MIMEMultipart:
+    """Build the registration email carrying the verification OTP"""
+    message = MIMEMultipart('alternative')
+    message['Subject'] = 'Welcome to Convis Labs ! Verify Your Email'
+    message['From'] = settings.email_user
+    message['To'] = email
+
+    # HTML body
+    html_body = f"""
+    <div style="font-family: Arial, sans-serif; color: #333;">
+        <p>Dear User,</p>
+        <p>Thank you for registering with Convis Labs. We are excited to have you on board and look forward to providing you with the best AI-driven solutions to enhance your experience.</p>
+        <p>To complete your registration, please verify your email by entering the OTP provided below</p>
+        <h3>Your OTP: <strong>{otp}</strong></h3>
+        <p>If you didn't register, please ignore this email.</p>
+        <p>Best regards,<br>Convis Labs Team</p>
+    </div>
+    """
+
+    html_part = MIMEText(html_body, 'html')
+    message.attach(html_part)
+    return message
+
+@contextmanager
+def smtp_session():
+    """Open an authenticated SMTP session (SSL on port 465, else STARTTLS unless disabled)"""
+    if settings.smtp_use_ssl and settings.smtp_port == 465:
+        # Use SMTP_SSL for port 465
+        with smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port) as server:
+            server.login(settings.email_user, settings.email_pass)
+            yield server
+    else:
+        # Use SMTP with STARTTLS for port 587 (plain SMTP if disabled)
+        with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
+            if settings.smtp_starttls:
+                server.starttls()
+            server.login(settings.email_user, settings.email_pass)
+            yield server
+
 async def send_otp_email_with_retry(email: str, otp: str, retries: int = 3, delay: int = 3000):
     """
     Send OTP email with retry logic
@@ -21,45 +62,17 @@ async def send_otp_email_with_retry(email: str, otp: str, retries: int = 3, dela
 
     for attempt in range(1, retries + 1):
         try:
-            # Create message
-            message = MIMEMultipart('alternative')
-            message['Subject'] = 'Welcome to Convis Labs ! Verify Your Email'
-            message['From'] = settings.email_user
-            message['To'] = email
-
-            # HTML body
-            html_body = f"""
-            <div style="font-family: Arial, sans-serif; color: #333;">
-                <p>Dear User,</p>
-                <p>Thank you for registering with Convis Labs. We are excited to have you on board and look forward to providing you with the best AI-driven solutions to enhance your experience.</p>
-                <p>To complete your registration, please verify your email by entering the OTP provided below</p>
-                <h3>Your OTP: <strong>{otp}</strong></h3>
-                <p>If you didn't register, please ignore this email.</p>
-                <p>Best regards,<br>Convis Labs Team</p>
-            </div>
-            """
-
-            html_part = MIMEText(html_body, 'html')
-            message.attach(html_part)
-
-            # Connect to SMTP server with SSL
-            if settings.smtp_use_ssl and settings.smtp_port == 465:
-                # Use SMTP_SSL for port 465
-                with smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port) as server:
-                    server.login(settings.email_user, settings.email_pass)
-                    server.send_message(message)
-            else:
-                # Use SMTP with STARTTLS for port 587
-                with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
-                    server.starttls()
-                    server.login(settings.email_user, settings.email_pass)
+            message = _verification_message(email, otp)
+
+            with timed_section("smtp"):
+                with smtp_session() as server:
                     server.send_message(message)
 
-            logger.info(f"OTP email sent successfully to {email} on attempt {attempt}")
+            logger.info("OTP email sent successfully to %s on attempt %s", email, attempt)
             return  # Success, exit the function
 
         except Exception as error:
-            logger.error(f"Attempt {attempt} failed to send email to {email}: {str(error)}")
+            logger.error("Attempt %s failed to send email to %s: %s", attempt, email, error)
 
             # If we've exhausted all retries, raise the error
             if attempt == retries:
@@ -67,3 +80,24 @@ async def send_otp_email_with_retry(email: str, otp: str, retries: int = 3, dela
 
             # Wait for the specified delay before retrying
             time.sleep(delay_seconds)
+
+def send_otp_emails(recipients: list) -> list:
+    """
+    Send verification emails to many recipients over one SMTP session
+
+    Args:
+        recipients: (email, otp) pairs
+
+    Returns:
+        list: Emails that could not be sent
+    """
+    failed = []
+    with timed_section("smtp"):
+        with smtp_session() as server:
+            for email, otp in recipients:
+                try:
+                    server.send_message(_verification_message(email, otp))
+                except smtplib.SMTPException as error:
+                    logger.error("Failed to send verification email to %s: %s", email, error)
+                    failed.append(email)
+    return failed
@@ -0,0 +1,128 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from starlette.concurrency import run_in_threadpool
+from app.config.settings import settings
+from app.utils.email import send_otp_emails
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+email_outbox_queued = registry.gauge(
+    "email_outbox_queued",
+    "Verification emails waiting in the outbox",
+)
+email_outbox_sent_total = registry.counter(
+    "email_outbox_sent_total",
+    "Verification email attempts of the outbox, by result (sent, retried, failed after the last attempt)",
+    ("result",),
+)
+
+
+class EmailOutbox:
+    """
+    Bounded queue of verification emails sent in the background
+
+    A sender task takes up to batch_size queued emails at a time and sends
+    them over a single SMTP session. enqueue() waits while the queue is
+    full, so a large import is slowed to the SMTP server's pace instead of
+    buffering every pending email in memory.
+
+    An email that fails is retried after retry_backoff_s, doubled after each
+    failure, up to max_attempts attempts; then it is logged as failed. While
+    waiting it still counts as queued.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, max_attempts: int, retry_backoff_s: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self._queue = None
+        self._task = None
+        # (due at, sequence, (email, otp, attempts made)), earliest first
+        self._retries = []
+        self._sequence = itertools.count()
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Send what is still queued (up to timeout seconds), then stop"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %s queued verification emails at shutdown",
+                           self._queue.qsize() + len(self._retries))
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._retries.clear()
+
+    async def enqueue(self, email: str, otp: str):
+        """Queue one verification email, waiting for room if the outbox is full"""
+        if self._task is None:
+            self.start()
+        await self._queue.put((email, otp, 0))
+        email_outbox_queued.inc()
+
+    async def _next_batch(self) -> list:
+        """Due retries first, then queued emails, waiting until one is available"""
+        while True:
+            batch = []
+            now = time.monotonic()
+            while self._retries and self._retries[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self._retries)[2])
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if batch:
+                return batch
+            timeout = self._retries[0][0] - now if self._retries else None
+            try:
+                return [await asyncio.wait_for(self._queue.get(), timeout)]
+            except asyncio.TimeoutError:
+                continue
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                failed = set(await run_in_threadpool(send_otp_emails, [(email, otp) for email, otp, _ in batch]))
+            except Exception as error:
+                logger.error("Failed to send %s verification emails: %s", len(batch), error)
+                failed = {email for email, _, _ in batch}
+            done = len(batch) - len(failed)
+            email_outbox_sent_total.inc(done, result="sent")
+            for email, otp, attempts in batch:
+                if email not in failed:
+                    continue
+                attempts += 1
+                if attempts < self.max_attempts:
+                    due_at = time.monotonic() + self.retry_backoff_s * 2 ** (attempts - 1)
+                    heapq.heappush(self._retries, (due_at, next(self._sequence), (email, otp, attempts)))
+                    email_outbox_sent_total.inc(result="retried")
+                else:
+                    logger.error("Giving up on the verification email to %s after %s attempts", email, attempts)
+                    email_outbox_sent_total.inc(result="failed")
+                    done += 1
+            # Emails waiting for a retry stay unfinished, so stop() waits for them
+            email_outbox_queued.dec(done)
+            for _ in range(done):
+                self._queue.task_done()
+
+
+email_outbox = EmailOutbox(
+    settings.email_outbox_size,
+    settings.email_batch_size,
+    settings.email_max_attempts,
+    settings.email_retry_backoff_s
+)
@@ -0,0 +1,83 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response, status
+
+
+def _as_utc(value: datetime) -> datetime:
+    # pymongo returns naive datetimes that are in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    """Format a datetime as an HTTP date (Last-Modified)"""
+    return format_datetime(_as_utc(value), usegmt=True)
+
+
+def document_etag(doc: dict) -> str:
+    """Strong ETag of a document, derived from its _id and updated_at"""
+    version = int(_as_utc(doc['updated_at']).timestamp() * 1_000_000)
+    return f'"{doc["_id"]}-{version:x}"'
+
+
+def collection_etag(docs: list) -> str:
+    """Strong ETag of a set of documents, changing when any is added, removed or updated"""
+    digest = hashlib.blake2b(digest_size=16)
+    for doc in sorted(docs, key=lambda item: str(item['_id'])):
+        digest.update(document_etag(doc).encode("ascii"))
+    return f'"{digest.hexdigest()}-{len(docs)}"'
+
+
+def has_conditional_headers(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since (RFC 9110 section 13.2.2)
+
+    If-None-Match takes precedence; If-Modified-Since is only considered when
+    it is absent and a last_modified date is given.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have second precision
+        return _as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def set_cache_headers(response: Response, etag: str, last_modified: Optional[datetime] = None):
+    """Attach validators and ask clients to revalidate before reuse"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    """Build an empty 304 response carrying the validators"""
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag, last_modified)
+    return response
+
+
+def set_stale_headers(response: Response, age: float):
+    """Mark a response served from a last-known-good copy instead of the database"""
+    response.headers["Age"] = str(int(age))
+    response.headers["Warning"] = '110 - "Response is Stale"'
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used for a request with a different fingerprint"""
+
+
+class IdempotencyStoreFull(Exception):
+    """Every entry belongs to a request still in progress, so no new key can be claimed"""
+
+
+class StoredResponse:
+    """Response captured from the first request carrying an idempotency key"""
+
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: list, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "response")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = asyncio.Event()
+        self.response = None
+
+
+class IdempotencyStore:
+    """
+    TTL store of request fingerprints and their responses, shared by the
+    workers through storage (the idempotency_keys collection with MongoDB)
+
+    A new key is claimed in storage, so a retry reaching another worker
+    waits for the first request, polling every poll_interval_s, or replays
+    its response. A claim whose request never finishes (its worker died)
+    expires after claim_ttl_s.
+
+    Each worker also keeps the keys it has seen in process, so concurrent
+    duplicates within the worker wait on an event instead of polling, and
+    repeated replays cost no round trip. Entries are kept in the order they
+    were claimed or completed; with a fixed TTL that is also expiry order
+    for completed entries, so expired ones are purged from the front in
+    O(1) per entry. Beyond max_entries the oldest completed entries are
+    evicted; entries of requests still in progress never are, so their
+    duplicates keep waiting instead of running the handler a second time.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, claim_ttl_s: float, poll_interval_s: float):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.claim_ttl_s = claim_ttl_s
+        self.poll_interval_s = poll_interval_s
+        self._entries = OrderedDict()
+
+    def _purge(self, now: float):
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if not entry.done.is_set() or entry.expires_at > now:
+                break
+            self._entries.popitem(last=False)
+        excess = len(self._entries) - self.max_entries + 1
+        if excess <= 0:
+            return
+        # In-flight entries are bounded by concurrency, so this stops early
+        evicted = []
+        for key, entry in self._entries.items():
+            if entry.done.is_set():
+                evicted.append(key)
+                if len(evicted) == excess:
+                    break
+        for key in evicted:
+            del self._entries[key]
+
+    async def begin(self, key: str, fingerprint: str, wait_timeout: float) -> Optional[StoredResponse]:
+        """
+        Claim a key, or wait for and return the response of the request holding it
+
+        Args:
+            key: Idempotency key, namespaced by route
+            fingerprint: Hash of the request method, path and body
+            wait_timeout: Seconds to wait for a concurrent request with the same key
+
+        Returns:
+            StoredResponse to replay, or None when the caller now owns the key
+            and must call complete() or abandon()
+
+        Raises:
+            IdempotencyKeyMismatch: If the key was used with a different request
+            IdempotencyStoreFull: If max_entries requests with a key are all still in progress
+            asyncio.TimeoutError: If the concurrent request did not finish in time
+        """
+        while True:
+            now = time.monotonic()
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is None or (entry.done.is_set() and entry.expires_at <= now):
+                if entry is None and len(self._entries) >= self.max_entries:
+                    raise IdempotencyStoreFull(key)
+                entry = self._entries[key] = _Entry(fingerprint, now + self.ttl)
+                self._entries.move_to_end(key)
+                try:
+                    response = await self._claim_shared(key, fingerprint, wait_timeout)
+                except BaseException:
+                    self._drop(key, entry)
+                    raise
+                if response is not None:
+                    # Another worker answered it: keep its response here too
+                    entry.response = response
+                    entry.done.set()
+                return response
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyMismatch(key)
+            if entry.done.is_set() and entry.response is not None:
+                return entry.response
+            await asyncio.wait_for(entry.done.wait(), wait_timeout)
+            if entry.response is not None:
+                return entry.response
+            # The first request failed without a cacheable response: try to claim the key
+
+    async def _claim_shared(self, key: str, fingerprint: str, wait_timeout: float) -> Optional[StoredResponse]:
+        store = get_storage().idempotency_keys
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            record = await run_in_threadpool(store.claim, key, fingerprint, self.claim_ttl_s)
+            if record is None:
+                return None
+            if record["fingerprint"] != fingerprint:
+                raise IdempotencyKeyMismatch(key)
+            if record["response"] is not None:
+                response = record["response"]
+                return StoredResponse(
+                    response["status"],
+                    [tuple(header) for header in response["headers"]],
+                    response["body"]
+                )
+            # In progress on another worker
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(min(self.poll_interval_s, remaining))
+
+    def _drop(self, key: str, entry: _Entry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.done.set()
+
+    async def complete(self, key: str, response: StoredResponse):
+        """Store the response for a claimed key and release waiting duplicates"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.response = response
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+        self._entries.move_to_end(key)
+        shared = {"status": response.status, "headers": [list(header) for header in response.headers],
+                  "body": response.body}
+        try:
+            await run_in_threadpool(get_storage().idempotency_keys.complete, key, entry.fingerprint, shared, self.ttl)
+        except Exception as error:
+            # Retries reaching this worker still replay it; others wait for the claim to expire
+            logger.warning("Failed to share the response for idempotency key %s: %s", key, error)
+
+    async def abandon(self, key: str):
+        """Release a claimed key without storing a response, e.g. after a server error"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        self._drop(key, entry)
+        try:
+            await run_in_threadpool(get_storage().idempotency_keys.release, key, entry.fingerprint)
+        except Exception as error:
+            logger.warning("Failed to release idempotency key %s: %s", key, error)
@@ -0,0 +1,138 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Optional
+from app.utils.metrics import registry
+
+load_class_in_flight = registry.gauge(
+    "load_class_in_flight",
+    "Requests running, by cost class",
+    ("cost_class",),
+)
+load_class_queued = registry.gauge(
+    "load_class_queued",
+    "Requests waiting for a slot, by cost class",
+    ("cost_class",),
+)
+load_class_queue_wait_seconds = registry.histogram(
+    "load_class_queue_wait_seconds",
+    "Time admitted requests waited for a slot, by cost class",
+    ("cost_class",),
+)
+load_shed_total = registry.counter(
+    "load_shed_total",
+    "Requests rejected with 503, by cost class and reason",
+    ("cost_class", "reason"),
+)
+
+
+class Overloaded(Exception):
+    """The request was shed; retry_after is a hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Concurrency limit with a bounded FIFO queue and CoDel-style shedding
+
+    Up to `limit` requests run at once and up to `max_queue` wait. Arrivals
+    are rejected when the queue is full, or while the limiter is dropping:
+    once admitted requests have waited longer than `target_delay_s` for a
+    whole `interval_s`, the queue is standing rather than absorbing a burst,
+    and new work can only add latency. Dropping stops as soon as a request
+    gets through in under the target. Nobody waits longer than
+    `max_wait_s` (default 4x the target).
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, target_delay_s: float,
+                 interval_s: float = 0.1, max_wait_s: Optional[float] = None):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.target_delay_s = target_delay_s
+        self.interval_s = interval_s
+        self.max_wait_s = max_wait_s if max_wait_s is not None else 4 * target_delay_s
+        self.in_flight = 0
+        self._waiters = deque()
+        self._above_target_until = None
+        self.dropping = False
+        # Exponentially weighted service time, for Retry-After
+        self._service_time = target_delay_s
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + self.in_flight
+        return max(1, math.ceil(backlog * self._service_time / self.limit))
+
+    def _shed(self, reason: str):
+        load_shed_total.inc(cost_class=self.name, reason=reason)
+        raise Overloaded(reason, self._retry_after())
+
+    def _record_wait(self, wait: float):
+        load_class_queue_wait_seconds.observe(wait, cost_class=self.name)
+        now = time.monotonic()
+        if wait < self.target_delay_s:
+            self._above_target_until = None
+            self.dropping = False
+        elif self._above_target_until is None:
+            self._above_target_until = now + self.interval_s
+        elif now >= self._above_target_until:
+            self.dropping = True
+
+    async def acquire(self):
+        """
+        Wait for a slot
+
+        Raises:
+            Overloaded: If the request is shed instead
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            load_class_in_flight.inc(cost_class=self.name)
+            self._record_wait(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._shed("queue_full")
+        if self.dropping:
+            self._shed("latency")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        load_class_queued.inc(cost_class=self.name)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait_s)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._shed("timeout")
+            # The slot was handed over just as the wait timed out; keep it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot already handed to us, pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            load_class_queued.dec(cost_class=self.name)
+        self._record_wait(time.monotonic() - start)
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot, handing it straight to the oldest waiter"""
+        if service_time is not None:
+            self._service_time += 0.2 * (service_time - self._service_time)
+        if self._waiters:
+            # in_flight is unchanged: the slot moves to the waiter
+            self._waiters.popleft().set_result(None)
+            return
+        self.in_flight -= 1
+        load_class_in_flight.dec(cost_class=self.name)
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from app.config.settings import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+event_loop_lag_seconds = registry.gauge(
+    "event_loop_lag_seconds",
+    "Most recent event loop scheduling lag in seconds",
+)
+event_loop_lag_histogram = registry.histogram(
+    "event_loop_lag_distribution_seconds",
+    "Distribution of event loop scheduling lag in seconds",
+)
+event_loop_blocked_seconds_total = registry.counter(
+    "event_loop_blocked_seconds_total",
+    "Time the event loop was blocked past the threshold, by handler",
+    ("handler",),
+)
+event_loop_stalls_total = registry.counter(
+    "event_loop_stalls_total",
+    "Number of times the event loop was blocked past the threshold, by handler",
+    ("handler",),
+)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_ROUTES_DIR = os.path.join(_APP_DIR, "routes") + os.sep
+
+
+class _HandlerStats:
+    __slots__ = ("count", "total_ms", "max_ms", "last_stack")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_stack = []
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag and detects callbacks blocking the loop.
+
+    A heartbeat coroutine sleeps for a fixed interval and records how late it
+    wakes up. A watchdog thread checks the heartbeat; when it stops for longer
+    than the threshold, the watchdog captures the loop thread's stack and
+    attributes the stall to the route handler on that stack.
+    """
+
+    def __init__(self, interval_ms: float, threshold_ms: float):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+        self._task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending_stall = None
+        self._stats = {}
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the heartbeat and the watchdog thread"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self._last_beat = now
+            event_loop_lag_seconds.set(lag)
+            event_loop_lag_histogram.observe(lag)
+
+            with self._lock:
+                stall, self._pending_stall = self._pending_stall, None
+            if stall is not None:
+                self._record_stall(stall, lag)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue < self.threshold:
+                continue
+            with self._lock:
+                if self._pending_stall is not None:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stall = (self._attribute(frame), traceback.format_stack(frame))
+            with self._lock:
+                self._pending_stall = stall
+
+    @staticmethod
+    def _attribute(frame) -> str:
+        """Name the route handler (or failing that, the app function) on the stack"""
+        fallback = None
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(_ROUTES_DIR):
+                return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+            if fallback is None and filename.startswith(_APP_DIR):
+                fallback = f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+            frame = frame.f_back
+        return fallback or "unknown"
+
+    def _record_stall(self, stall, lag: float):
+        handler, stack = stall
+        lag_ms = lag * 1000
+        event_loop_stalls_total.inc(handler=handler)
+        event_loop_blocked_seconds_total.inc(lag, handler=handler)
+        with self._lock:
+            stats = self._stats.get(handler)
+            if stats is None:
+                stats = self._stats[handler] = _HandlerStats()
+            stats.count += 1
+            stats.total_ms += lag_ms
+            stats.max_ms = max(stats.max_ms, lag_ms)
+            stats.last_stack = stack
+        logger.warning("Event loop blocked for %.1f ms by %s", lag_ms, handler)
+
+    def report(self, limit: Optional[int] = None) -> list:
+        """
+        Handlers ranked by total time spent blocking the loop
+
+        Args:
+            limit: Maximum number of handlers to return
+
+        Returns:
+            list: One dict per handler with count, total_ms, max_ms and the last stack
+        """
+        with self._lock:
+            items = list(self._stats.items())
+        ranked = sorted(items, key=lambda item: item[1].total_ms, reverse=True)[:limit]
+        return [
+            {
+                "handler": handler,
+                "stalls": stats.count,
+                "total_ms": round(stats.total_ms, 2),
+                "max_ms": round(stats.max_ms, 2),
+                "avg_ms": round(stats.total_ms / stats.count, 2),
+                "last_stack": stats.last_stack,
+            }
+            for handler, stats in ranked
+        ]
+
+
+loop_monitor = LoopMonitor(settings.loop_monitor_interval_ms, settings.loop_block_threshold_ms)
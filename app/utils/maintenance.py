@@ -0,0 +1,71 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from app.config.settings import settings
+from app.storage import get_storage
+from app.utils.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def _in_batches(step, should_continue) -> int:
+    """
+    Call step(batch_size) until it processes less than a full batch
+
+    Pauses between batches so cleanup never competes with request traffic
+    for the database, and stops after maintenance_max_batches per run.
+
+    Returns:
+        int: Total documents processed
+    """
+    total = 0
+    for _ in range(settings.maintenance_max_batches):
+        if not should_continue():
+            break
+        processed = step(settings.maintenance_batch_size)
+        total += processed
+        if processed < settings.maintenance_batch_size:
+            break
+        time.sleep(settings.maintenance_batch_pause_s)
+    return total
+
+
+def clear_expired_otps(should_continue) -> int:
+    """Remove OTPs older than otp_ttl_s (OTPs stored before they had a timestamp expire otp_ttl_s after the first run)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.otp_ttl_s)
+    users = get_storage().users
+    return _in_batches(lambda limit: users.clear_expired_otps(cutoff, limit), should_continue)
+
+
+def delete_unverified_accounts(should_continue) -> int:
+    """Delete accounts never verified within unverified_account_ttl_s, with their assistants"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.unverified_account_ttl_s)
+    storage = get_storage()
+
+    def step(limit: int) -> int:
+        user_ids = storage.users.delete_unverified(cutoff, limit)
+        storage.assistants.delete_by_users(user_ids)
+        return len(user_ids)
+
+    return _in_batches(step, should_continue)
+
+
+def reconcile_assistant_stats(should_continue) -> int:
+    """Rebuild the assistant analytics from the assistants collection, correcting drift"""
+    since = datetime.utcnow() - timedelta(days=settings.analytics_reconcile_days)
+    get_storage().assistant_stats.reconcile(since.replace(hour=0, minute=0, second=0, microsecond=0))
+    return 0
+
+
+def ensure_indexes(should_continue) -> int:
+    """Create the indexes the cleanup and analytics queries and the auth routes use"""
+    get_storage().ensure_indexes()
+    return 0
+
+
+maintenance_scheduler = Scheduler("maintenance", settings.maintenance_lease_ttl_s)
+# Effectively once per leadership term: the indexes only need creating once
+maintenance_scheduler.add_job("ensure_indexes", 86400.0, ensure_indexes)
+maintenance_scheduler.add_job("clear_expired_otps", settings.maintenance_interval_s, clear_expired_otps)
+maintenance_scheduler.add_job("delete_unverified_accounts", settings.maintenance_interval_s, delete_unverified_accounts)
+maintenance_scheduler.add_job("reconcile_assistant_stats", settings.analytics_reconcile_interval_s, reconcile_assistant_stats)
@@ -0,0 +1,48 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+_executor = None
+
+
+def hash_password(password: str) -> str:
+    """bcrypt-hash a password with a fresh salt (same cost as registration)"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the worker process has MongoDB and logging threads
+        # that must not be duplicated into the children
+        _executor = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+async def hash_passwords(passwords: list, workers: int = 0) -> list:
+    """
+    Hash many passwords in parallel on a process pool
+
+    Args:
+        passwords: Plaintext passwords
+        workers: Pool size, 0 for one process per CPU (fixed on first use)
+
+    Returns:
+        list: Hashes in the same order as passwords
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor(workers)
+    return await asyncio.gather(*(loop.run_in_executor(executor, hash_password, password) for password in passwords))
+
+
+def shutdown_hash_pool():
+    """Stop the hashing processes, if they were started"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
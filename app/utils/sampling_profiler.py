@@ -0,0 +1,221 @@
+import linecache
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Leaf frames of a thread that is parked rather than doing work: executor
+# threads waiting for a job, the event loop waiting in select, sleepers.
+# Where the same function also runs jobs, only the waiting line counts.
+_IDLE_LEAVES = {
+    ("threading", "wait"): None,
+    ("threading", "_wait_for_tstate_lock"): None,
+    ("queue", "get"): None,
+    ("selectors", "select"): None,
+    ("concurrent.futures.thread", "_worker"): ".get(",
+    ("anyio._backends._asyncio", "run"): ".get(",
+}
+
+
+class ProfilerBusy(Exception):
+    """A profile is already running on this worker"""
+
+
+def _is_idle(frame) -> bool:
+    marker = _IDLE_LEAVES.get((frame.f_globals.get("__name__"), frame.f_code.co_name), False)
+    if marker is False:
+        return False
+    return marker is None or marker in linecache.getline(frame.f_code.co_filename, frame.f_lineno)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler over every thread of the worker
+
+    Samples sys._current_frames() at a fixed interval from the calling
+    thread and counts identical stacks, which is cheap enough to run on a
+    serving worker (one stack walk per thread per sample, no tracing hooks).
+    Output is the collapsed-stack format read by flamegraph.pl and
+    speedscope: one "thread;outer;...;inner count" line per distinct stack.
+    Time spent inside C functions (bcrypt, socket reads) is attributed to
+    the Python frame that called them. Only one profile runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval_s: float, loop_thread_id: Optional[int] = None,
+                include_idle: bool = False) -> str:
+        """
+        Sample all threads for a fixed duration, blocking the calling thread
+
+        Args:
+            seconds: How long to sample
+            interval_s: Time between samples
+            loop_thread_id: Thread running the event loop, labelled "event-loop"
+            include_idle: Keep stacks of threads parked waiting for work
+
+        Returns:
+            str: Collapsed stacks, most frequent first
+
+        Raises:
+            ProfilerBusy: If another profile is running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            return self._sample(seconds, interval_s, loop_thread_id, include_idle)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval_s: float, loop_thread_id: Optional[int], include_idle: bool) -> str:
+        own_id = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        # Labels are cached per code object and thread names per id, so a
+        # sample costs little more than walking the frames
+        labels = {}
+        names = {}
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now < next_sample:
+                time.sleep(next_sample - now)
+            next_sample += interval_s
+
+            samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not include_idle and _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(frame)
+                    stack.append(label)
+                    frame = frame.f_back
+                thread_name = names.get(thread_id)
+                if thread_name is None:
+                    thread_name = names[thread_id] = self._thread_name(thread_id, loop_thread_id)
+                stack.append(thread_name)
+                stacks[";".join(reversed(stack))] += 1
+
+        logger.info("Sampling profile finished: %d samples, %d distinct stacks", samples, len(stacks))
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def _thread_name(thread_id: int, loop_thread_id: Optional[int]) -> str:
+        if thread_id == loop_thread_id:
+            return "event-loop"
+        for thread in threading.enumerate():
+            if thread.ident == thread_id:
+                return thread.name.replace(";", "_").replace(" ", "_")
+        return f"thread-{thread_id}"
+
+
+class AllocationTracker:
+    """
+    tracemalloc on demand, with top allocation sites and diffs between snapshots
+
+    Tracing slows allocations down noticeably, so it only runs between
+    start() and stop().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        """Start tracing allocations, keeping `frames` frames per allocation site"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._previous = None
+                logger.info("tracemalloc started (%d frames)", frames)
+
+    def stop(self):
+        """Stop tracing and free the traces"""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("tracemalloc stopped")
+            self._previous = None
+
+    def snapshot(self, limit: int = 20, group_by: str = "lineno", compare: bool = False) -> dict:
+        """
+        Largest allocation sites right now, or their growth since the last snapshot
+
+        Args:
+            limit: Number of sites to return
+            group_by: "lineno", "filename" or "traceback"
+            compare: Rank by growth since the previous snapshot instead of size
+
+        Returns:
+            dict: Traced totals and the top sites
+
+        Raises:
+            RuntimeError: If tracemalloc is not running
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc is not running")
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            previous, self._previous = self._previous, snapshot
+            current, peak = tracemalloc.get_traced_memory()
+
+        if compare and previous is not None:
+            stats = snapshot.compare_to(previous, group_by)[:limit]
+            top = [
+                {
+                    "site": [str(frame) for frame in stat.traceback],
+                    "size_kb": round(stat.size / 1024, 1),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats
+            ]
+        else:
+            stats = snapshot.statistics(group_by)[:limit]
+            top = [
+                {
+                    "site": [str(frame) for frame in stat.traceback],
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in stats
+            ]
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "compared": compare and previous is not None,
+            "top": top,
+        }
+
+
+sampling_profiler = SamplingProfiler()
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from starlette.concurrency import run_in_threadpool
+from app.storage import get_storage
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+scheduler_leader = registry.gauge(
+    "scheduler_leader",
+    "1 while this worker holds the scheduler lease",
+    ("scheduler",),
+)
+scheduler_job_runs_total = registry.counter(
+    "scheduler_job_runs_total",
+    "Scheduled job runs, by result",
+    ("job", "result"),
+)
+scheduler_job_duration_seconds = registry.histogram(
+    "scheduler_job_duration_seconds",
+    "Duration of scheduled job runs in seconds",
+    ("job",),
+)
+scheduler_job_documents_total = registry.counter(
+    "scheduler_job_documents_total",
+    "Documents processed by scheduled jobs",
+    ("job",),
+)
+scheduler_job_last_success_seconds = registry.gauge(
+    "scheduler_job_last_success_seconds",
+    "Unix time of the last successful run of each job",
+    ("job",),
+)
+
+
+class Job:
+    """
+    A periodic job
+
+    Args:
+        name: Job name used in logs and metrics
+        interval_s: Seconds between the end of one run and the start of the next
+        func: Blocking callable (should_continue) -> documents processed;
+            long jobs should stop early when should_continue() returns False
+    """
+
+    def __init__(self, name: str, interval_s: float, func):
+        self.name = name
+        self.interval_s = interval_s
+        self.func = func
+        self.next_run = 0.0
+
+
+class Scheduler:
+    """
+    Runs periodic jobs in exactly one worker
+
+    Every worker starts a scheduler; they compete for a lease in the storage
+    backend and only the holder runs jobs. The holder renews the lease every
+    third of its TTL, so if it dies another worker takes over within one TTL.
+    Jobs run in the threadpool, one at a time.
+    """
+
+    def __init__(self, name: str, lease_ttl_s: float):
+        self.name = name
+        self.lease_ttl_s = lease_ttl_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs = []
+        self.is_leader = False
+        self._stopping = threading.Event()
+        self._tasks = []
+
+    def add_job(self, name: str, interval_s: float, func):
+        self.jobs.append(Job(name, interval_s, func))
+
+    def should_continue(self) -> bool:
+        """Whether a running job may go on with its next batch"""
+        return self.is_leader and not self._stopping.is_set()
+
+    def start(self):
+        """Start competing for the lease and running jobs"""
+        if self._tasks:
+            return
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._hold_lease()),
+            asyncio.create_task(self._run_jobs()),
+        ]
+
+    async def stop(self):
+        """Stop running jobs and hand the lease over"""
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.is_leader:
+            self._set_leader(False)
+            try:
+                await run_in_threadpool(get_storage().leases.release, self.name, self.owner)
+            except Exception as error:
+                logger.warning("Could not release the %s lease: %s", self.name, error)
+
+    def _set_leader(self, leader: bool):
+        if leader != self.is_leader:
+            logger.info("%s %s the %s lease", self.owner, "acquired" if leader else "lost", self.name)
+        self.is_leader = leader
+        scheduler_leader.set(1 if leader else 0, scheduler=self.name)
+
+    async def _hold_lease(self):
+        while True:
+            try:
+                acquired = await run_in_threadpool(
+                    get_storage().leases.acquire, self.name, self.owner, self.lease_ttl_s
+                )
+            except Exception as error:
+                # Can't prove we still hold it, so stop acting as leader
+                logger.warning("Could not renew the %s lease: %s", self.name, error)
+                acquired = False
+            self._set_leader(acquired)
+            await asyncio.sleep(self.lease_ttl_s / 3)
+
+    async def _run_jobs(self):
+        while True:
+            await asyncio.sleep(1)
+            if not self.is_leader:
+                continue
+            now = time.monotonic()
+            for job in self.jobs:
+                if job.next_run <= now and self.should_continue():
+                    await self._run(job)
+
+    async def _run(self, job: Job):
+        start = time.perf_counter()
+        try:
+            processed = await run_in_threadpool(job.func, self.should_continue)
+        except Exception as error:
+            logger.error("Scheduled job %s failed: %s", job.name, error)
+            scheduler_job_runs_total.inc(job=job.name, result="failure")
+        else:
+            scheduler_job_runs_total.inc(job=job.name, result="success")
+            scheduler_job_documents_total.inc(processed, job=job.name)
+            scheduler_job_last_success_seconds.set(time.time(), job=job.name)
+            if processed:
+                logger.info("Scheduled job %s processed %s documents", job.name, processed)
+        finally:
+            duration = time.perf_counter() - start
+            scheduler_job_duration_seconds.observe(duration, job=job.name)
+            job.next_run = time.monotonic() + job.interval_s
@@ -0,0 +1,372 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from app.config.settings import settings
+from app.utils.metrics import registry
+
+try:
+    import fcntl
+except ImportError:
+    # No record locks (Windows): the table falls back to process-local memory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+shared_table_evictions_total = registry.counter(
+    "shared_table_evictions_total",
+    "Live shared memory entries evicted because their stripe was full",
+)
+
+MAGIC = b"CVSHM001"
+# magic, slot count, key size, value size
+HEADER = struct.Struct("<8sIII")
+HEADER_SIZE = 64
+# state, key length, value length, key hash, expires at (monotonic, 0 = never), counter
+SLOT = struct.Struct("<BBHQdq")
+# Keys are probed within one stripe, which is also the unit of locking
+STRIPE_SLOTS = 64
+
+EMPTY, USED, DELETED = 0, 1, 2
+
+
+def _hash(key: bytes) -> int:
+    # hash() is salted per process, so it cannot place keys in shared memory
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class SharedTable:
+    """
+    Hash table of fixed-size slots in a memory-mapped file, shared by every
+    worker process on the host that maps the same path
+
+    Each slot holds a key, an optional byte value, a 64-bit counter and an
+    expiry time. A key hashes to one stripe of STRIPE_SLOTS slots and is
+    linearly probed within it; every operation holds that stripe's lock, an
+    fcntl record lock (released by the kernel if a worker dies) plus a
+    threading lock, since record locks do not exclude threads of the same
+    process. Operations are therefore atomic across workers and threads, and
+    cost a couple of system calls instead of a database round trip.
+
+    Expired entries are reclaimed lazily when their slot is probed. When a
+    stripe has no free slot, the entry closest to expiring is evicted, so the
+    table behaves like a cache: size it for the working set.
+
+    Expiry uses time.monotonic(), which is the same system-wide clock in
+    every process on Linux and macOS.
+
+    With path None the table is an anonymous mapping guarded by the thread
+    locks only, private to this process; that is all there is where fcntl
+    is unavailable.
+    """
+
+    def __init__(self, path: Optional[str], slots: int, key_size: int, value_size: int, reset: bool = False):
+        if not 0 < key_size <= 255:
+            raise ValueError("key_size must be between 1 and 255 bytes")
+        if not 0 <= value_size <= 65535:
+            raise ValueError("value_size must be between 0 and 65535 bytes")
+        self.path = path
+        self.stripes = max(1, -(-slots // STRIPE_SLOTS))
+        self.slots = self.stripes * STRIPE_SLOTS
+        self.key_size = key_size
+        self.value_size = value_size
+        self.slot_size = SLOT.size + key_size + value_size
+        self._thread_locks = [threading.Lock() for _ in range(self.stripes)]
+
+        size = HEADER_SIZE + self.slots * self.slot_size
+        if path is None:
+            self._fd = None
+            self._map = mmap.mmap(-1, size)
+            self._map[:HEADER.size] = HEADER.pack(MAGIC, self.slots, key_size, value_size)
+            return
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Byte 0 of the lock space serialises initialisation between workers
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                header = os.pread(self._fd, HEADER.size, 0)
+                if reset or len(header) < HEADER.size:
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, HEADER.pack(MAGIC, self.slots, key_size, value_size), 0)
+                elif HEADER.unpack(header) != (MAGIC, self.slots, key_size, value_size):
+                    raise ValueError(
+                        f"{path} holds a shared table with different dimensions; "
+                        f"remove it or restart through python -m app.server"
+                    )
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+            self._map = mmap.mmap(self._fd, size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def close(self):
+        self._map.close()
+        if self._fd is not None:
+            os.close(self._fd)
+
+    @contextmanager
+    def _lock(self, stripe: int):
+        # Lock bytes 1..stripes stand for the stripes; the file content is not involved
+        with self._thread_locks[stripe]:
+            if self._fd is None:
+                yield
+                return
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 1 + stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 1 + stripe)
+
+    def _offset(self, index: int) -> int:
+        return HEADER_SIZE + index * self.slot_size
+
+    def _encode(self, key: str) -> bytes:
+        encoded = key.encode("utf-8")
+        if len(encoded) > self.key_size:
+            raise ValueError(f"Key longer than {self.key_size} bytes: {key!r}")
+        return encoded
+
+    def _probe(self, encoded: bytes, key_hash: int, now: float):
+        """
+        Find a key's slot in its stripe (caller holds the stripe lock)
+
+        Returns:
+            tuple: (index of the live entry or None, index to insert at)
+        """
+        stripe, start = divmod(key_hash % self.slots, STRIPE_SLOTS)
+        base = stripe * STRIPE_SLOTS
+        free = None
+        victim, victim_expiry = None, None
+        for step in range(STRIPE_SLOTS):
+            index = base + (start + step) % STRIPE_SLOTS
+            offset = self._offset(index)
+            state, key_length, _, slot_hash, expires_at, _ = SLOT.unpack_from(self._map, offset)
+            if state == EMPTY:
+                # Nothing was ever stored past here
+                return None, free if free is not None else index
+            if state == USED and expires_at and expires_at <= now:
+                self._map[offset] = DELETED
+                state = DELETED
+            if state == DELETED:
+                if free is None:
+                    free = index
+                continue
+            if slot_hash == key_hash and self._map[offset + SLOT.size:offset + SLOT.size + key_length] == encoded:
+                return index, index
+            expiry = expires_at or float("inf")
+            if victim is None or expiry < victim_expiry:
+                victim, victim_expiry = index, expiry
+        return None, free if free is not None else victim
+
+    def _stripe(self, key_hash: int) -> int:
+        return (key_hash % self.slots) // STRIPE_SLOTS
+
+    def _write(self, index: int, encoded: bytes, key_hash: int, value: bytes, expires_at: float, counter: int):
+        offset = self._offset(index)
+        key_start = offset + SLOT.size
+        value_start = key_start + self.key_size
+        self._map[key_start:key_start + len(encoded)] = encoded
+        self._map[value_start:value_start + len(value)] = value
+        SLOT.pack_into(self._map, offset, USED, len(encoded), len(value), key_hash, expires_at, counter)
+
+    def _count_eviction(self, index: Optional[int], target: int):
+        # _probe only hands out a live slot for a new key when the stripe is full
+        if index is None and self._map[self._offset(target)] == USED:
+            shared_table_evictions_total.inc()
+
+    def _expiry(self, ttl: Optional[float], now: float) -> float:
+        return now + ttl if ttl else 0.0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Value stored under a key
+
+        Args:
+            key: Key, at most key_size bytes of UTF-8
+
+        Returns:
+            bytes: The value, or None if the key is absent or expired
+        """
+        encoded = self._encode(key)
+        key_hash = _hash(encoded)
+        with self._lock(self._stripe(key_hash)):
+            index, _ = self._probe(encoded, key_hash, time.monotonic())
+            if index is None:
+                return None
+            offset = self._offset(index)
+            value_length = SLOT.unpack_from(self._map, offset)[2]
+            value_start = offset + SLOT.size + self.key_size
+            return self._map[value_start:value_start + value_length]
+
+    def set(self, key: str, value: bytes = b"", ttl: Optional[float] = None):
+        """
+        Store a value under a key, replacing any previous value and resetting its counter
+
+        Args:
+            key: Key, at most key_size bytes of UTF-8
+            value: At most value_size bytes
+            ttl: Seconds until the entry expires; None keeps it until evicted
+
+        Raises:
+            ValueError: If the key or value is too long
+        """
+        self._store(key, value, ttl, only_if_absent=False)
+
+    def add(self, key: str, value: bytes = b"", ttl: Optional[float] = None) -> bool:
+        """
+        Store a value only if the key is absent or expired, e.g. to claim a key once across workers
+
+        Returns:
+            bool: True if the value was stored
+        """
+        return self._store(key, value, ttl, only_if_absent=True)
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float], only_if_absent: bool) -> bool:
+        if len(value) > self.value_size:
+            raise ValueError(f"Value longer than {self.value_size} bytes")
+        encoded = self._encode(key)
+        key_hash = _hash(encoded)
+        with self._lock(self._stripe(key_hash)):
+            now = time.monotonic()
+            index, target = self._probe(encoded, key_hash, now)
+            if index is not None and only_if_absent:
+                return False
+            self._count_eviction(index, target)
+            self._write(target, encoded, key_hash, value, self._expiry(ttl, now), 0)
+            return True
+
+    def delete(self, key: str) -> bool:
+        """
+        Remove a key
+
+        Returns:
+            bool: True if a live entry was removed
+        """
+        encoded = self._encode(key)
+        key_hash = _hash(encoded)
+        with self._lock(self._stripe(key_hash)):
+            index, _ = self._probe(encoded, key_hash, time.monotonic())
+            if index is None:
+                return False
+            self._map[self._offset(index)] = DELETED
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Atomically add to a key's counter, creating it at zero if absent or expired
+
+        The TTL only applies when the counter is created, so incr(key, ttl=60)
+        counts events in a fixed 60 second window.
+
+        Args:
+            key: Key, at most key_size bytes of UTF-8
+            amount: Value to add (may be negative)
+            ttl: Seconds until a newly created counter expires
+
+        Returns:
+            int: The counter after the addition
+        """
+        encoded = self._encode(key)
+        key_hash = _hash(encoded)
+        with self._lock(self._stripe(key_hash)):
+            now = time.monotonic()
+            index, target = self._probe(encoded, key_hash, now)
+            if index is None:
+                self._count_eviction(index, target)
+                self._write(target, encoded, key_hash, b"", self._expiry(ttl, now), amount)
+                return amount
+            offset = self._offset(index)
+            state, key_length, value_length, slot_hash, expires_at, counter = SLOT.unpack_from(self._map, offset)
+            counter += amount
+            SLOT.pack_into(self._map, offset, state, key_length, value_length, slot_hash, expires_at, counter)
+            return counter
+
+    def count(self, key: str) -> int:
+        """Current counter of a key (0 if absent or expired)"""
+        encoded = self._encode(key)
+        key_hash = _hash(encoded)
+        with self._lock(self._stripe(key_hash)):
+            index, _ = self._probe(encoded, key_hash, time.monotonic())
+            if index is None:
+                return 0
+            return SLOT.unpack_from(self._map, self._offset(index))[5]
+
+    def usage(self) -> dict:
+        """
+        Slot occupancy, read without locking (approximate under writes)
+
+        Returns:
+            dict: Capacity and the number of live, expired and deleted slots
+        """
+        now = time.monotonic()
+        live = expired = deleted = 0
+        for index in range(self.slots):
+            state, _, _, _, expires_at, _ = SLOT.unpack_from(self._map, self._offset(index))
+            if state == DELETED:
+                deleted += 1
+            elif state == USED:
+                if expires_at and expires_at <= now:
+                    expired += 1
+                else:
+                    live += 1
+        return {"slots": self.slots, "live": live, "expired": expired, "deleted": deleted}
+
+
+def shared_memory_path() -> str:
+    """Path of the shared table file, by default under /dev/shm and named after the server port"""
+    if settings.shared_memory_path:
+        return settings.shared_memory_path
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"convis-{settings.server_port}.shm")
+
+
+# False where fcntl is missing: every process then has its own table
+shared_memory_available = fcntl is not None
+
+
+def _open(reset: bool = False) -> SharedTable:
+    return SharedTable(
+        shared_memory_path() if shared_memory_available else None,
+        settings.shared_memory_slots,
+        settings.shared_memory_key_size,
+        settings.shared_memory_value_size,
+        reset=reset
+    )
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_shared_table() -> SharedTable:
+    """
+    Return this process's mapping of the host-wide shared table, opening it on first use
+
+    Returns:
+        SharedTable: Table shared with every worker started by the same server
+    """
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                if not shared_memory_available:
+                    logger.warning("fcntl is unavailable, the shared memory table is local to this process")
+                _table = _open()
+    return _table
+
+
+def reset_shared_table():
+    """
+    Recreate the shared table empty; run by the server before it starts
+    workers, and only where shared_memory_available
+    """
+    _open(reset=True).close()
+    logger.info("Shared memory table ready at %s", shared_memory_path())
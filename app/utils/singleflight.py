@@ -0,0 +1,64 @@
+import asyncio
+from typing import Hashable, Optional
+from starlette.concurrency import run_in_threadpool
+from app.utils.metrics import registry
+
+singleflight_calls_total = registry.counter(
+    "singleflight_calls_total",
+    "Reads issued through single-flight, by whether they ran the query or shared one in flight",
+    ("name", "result"),
+)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical reads into one in-flight call
+
+    The first caller for a key runs the (blocking) function in the threadpool;
+    callers arriving while it is in flight await the same future and get the
+    same result or exception. Nothing is cached once the call completes.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+
+    async def _run(self, key: Hashable, func, args):
+        try:
+            return await run_in_threadpool(func, *args)
+        finally:
+            self._calls.pop(key, None)
+
+    async def do(self, key: Hashable, func, *args, timeout: Optional[float] = None):
+        """
+        Run func(*args) unless an identical call is already in flight
+
+        Args:
+            key: Identity of the query, e.g. ("assistant", assistant_id)
+            func: Blocking function performing the read
+            args: Arguments for func
+            timeout: Maximum seconds to wait for the result
+
+        Returns:
+            The result of func(*args)
+
+        Raises:
+            asyncio.TimeoutError: If the result is not available within timeout
+            Exception: Whatever func raised, propagated to every waiter
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(key, func, args))
+            # Retrieve the exception even if every waiter timed out
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._calls[key] = future
+            singleflight_calls_total.inc(name=self.name, result="leader")
+        else:
+            singleflight_calls_total.inc(name=self.name, result="shared")
+        # Shield so a waiter timing out or disconnecting doesn't cancel the shared call
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+
+assistant_reads = SingleFlight("assistant_reads")
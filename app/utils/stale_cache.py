@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+from bson import ObjectId
+from app.config.settings import settings
+from app.utils.assistant_events import assistant_events
+from app.utils.circuit_breaker import mongo_breaker
+from app.utils.metrics import registry
+from app.utils.singleflight import assistant_reads
+
+logger = logging.getLogger(__name__)
+
+stale_reads_total = registry.counter(
+    "stale_reads_total",
+    "Assistant reads answered from the last-known-good cache, by reason (circuit_open, slow, unavailable)",
+    ("reason",),
+)
+
+
+class StaleCache:
+    """
+    Per-worker LRU of the last successful assistant reads (stale-while-revalidate)
+
+    Every read still goes to storage through single-flight and refreshes the
+    cached copy. The copy is only served when storage cannot answer: while
+    the MongoDB circuit is open (without attempting the read), when the read
+    fails because MongoDB is unavailable, or when it takes longer than
+    stale_revalidate_budget_ms; a slow read keeps running and refreshes the
+    copy when it completes. Keys without a cached copy wait for storage as
+    before.
+
+    Cached copies are kept current from the assistant event hub, so changes
+    made before an outage are not lost from it. Cached values are shared
+    between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (value, stored_at)
+        self._entries = OrderedDict()
+        # Bumped on every change, so a read that raced a change isn't cached
+        self._generation = 0
+        assistant_events.add_listener(self._on_change)
+
+    async def read(self, key: Hashable, func, *args) -> tuple:
+        """
+        Read through single-flight, falling back to the last-known-good copy
+
+        Args:
+            key: Identity of the query, ("assistant", id) or ("user_assistants", user_id)
+            func: Blocking function performing the read
+            args: Arguments for func
+
+        Returns:
+            tuple: (value, age in seconds of the cached copy served, or None when fresh)
+
+        Raises:
+            asyncio.TimeoutError: If there is no cached copy and storage did not answer in time
+            CircuitOpenError: If there is no cached copy and the circuit is open
+        """
+        entry = self._entries.get(key)
+        generation = self._generation
+        if entry is None:
+            value = await assistant_reads.do(key, func, *args, timeout=settings.singleflight_wait_timeout_s)
+            self._store(key, value, generation)
+            return value, None
+        if mongo_breaker.is_open:
+            return self._serve_stale(key, entry, "circuit_open")
+
+        read = asyncio.ensure_future(assistant_reads.do(key, func, *args))
+        try:
+            value = await asyncio.wait_for(asyncio.shield(read), settings.stale_revalidate_budget_ms / 1000)
+        except asyncio.TimeoutError:
+            read.add_done_callback(lambda done: self._refresh(key, done, generation))
+            return self._serve_stale(key, entry, "slow")
+        except mongo_breaker.unavailable_errors as error:
+            logger.warning("Serving cached %s, storage unavailable: %s", key[0], error)
+            return self._serve_stale(key, entry, "unavailable")
+        self._store(key, value, generation)
+        return value, None
+
+    def _serve_stale(self, key: Hashable, entry: tuple, reason: str) -> tuple:
+        value, stored_at = entry
+        self._entries.move_to_end(key)
+        stale_reads_total.inc(reason=reason)
+        return value, time.monotonic() - stored_at
+
+    def _refresh(self, key: Hashable, done: asyncio.Future, generation: int):
+        # The exception (already counted by the breaker) must still be retrieved
+        if not done.cancelled() and done.exception() is None:
+            self._store(key, done.result(), generation)
+
+    def _store(self, key: Hashable, value, generation: int):
+        if generation != self._generation:
+            return
+        if value is None:
+            # Not found is not worth keeping: it's cheap to ask again
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _on_change(self, operation: str, assistant_id: ObjectId, document: Optional[dict]):
+        self._generation += 1
+        previous = self._entries.pop(("assistant", assistant_id), None)
+        if document is not None:
+            if previous is not None:
+                self._entries[("assistant", assistant_id)] = (document, time.monotonic())
+            user_id = document['user_id']
+        elif previous is not None:
+            user_id = previous[0]['user_id']
+        else:
+            # A delete (no document) of an assistant only cached within its user's list
+            user_id = next((key[1] for key, (value, _) in self._entries.items()
+                            if key[0] == "user_assistants" and any(doc['_id'] == assistant_id for doc in value)), None)
+        cached = self._entries.get(("user_assistants", user_id))
+        if cached is None:
+            return
+        # A new list, since the old one may still be in use by a request
+        docs = [doc for doc in cached[0] if doc['_id'] != assistant_id]
+        if document is not None:
+            position = next((index for index, doc in enumerate(cached[0]) if doc['_id'] == assistant_id), len(docs))
+            docs.insert(position, document)
+        self._entries[("user_assistants", user_id)] = (docs, cached[1])
+
+
+assistant_cache = StaleCache(settings.stale_cache_size)
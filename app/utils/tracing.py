@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# version-traceid-parentid-flags, see https://www.w3.org/TR/trace-context/
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds
+_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: str = "internal",
+                 attributes: Optional[dict] = None, start_ns: Optional[int] = None):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        self.trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def as_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def as_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+    """All spans of one request; spans are appended as they end"""
+
+    __slots__ = ("trace_id", "sampled", "spans", "root")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+        self.root = None
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name if self.root else None,
+            "duration_ms": round(self.root.duration_ms, 3) if self.root else None,
+            "spans": [span.as_dict() for span in sorted(self.spans, key=lambda span: span.start_ns)],
+        }
+
+    def as_otlp(self) -> dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", settings.trace_service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.as_otlp() for span in self.spans],
+                }],
+            }],
+        }
+
+
+# Innermost open span of the current request (None outside traced requests)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]):
+    """
+    Parse a W3C traceparent header
+
+    Returns:
+        tuple: (trace_id, parent_span_id, sampled), or None if absent or malformed
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace.trace_id}-{span.span_id}-{'01' if span.trace.sampled else '00'}"
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Span:
+    """
+    Open the root span of a request, continuing the caller's trace if any
+
+    A trace is head-sampled when the caller's traceparent says so or with
+    probability trace_sample_rate. Spans are recorded either way, so slow
+    or failed requests can still be kept when they finish.
+    """
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = _new_id(16), None
+        sampled = random.random() < settings.trace_sample_rate
+    trace = Trace(trace_id, sampled)
+    root = Span(trace, name, parent_id, kind="server", attributes=attributes)
+    trace.root = root
+    return root
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    Record a child span of the current span around a block
+
+    Does nothing outside a traced request. Exceptions are recorded on the
+    span and re-raised.
+    """
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as error:
+        child.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+def record_span(parent: Optional[Span], name: str, start_ns: int, end_ns: int, kind: str = "internal",
+                error: Optional[str] = None, **attributes):
+    """Add an already finished span under parent (used by callback-style hooks)"""
+    if parent is None:
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, attributes, start_ns=start_ns)
+    child.error = error
+    child.end(end_ns)
+
+
+class TraceBuffer:
+    """Ring buffer of recently kept traces, plus the configured exporter"""
+
+    def __init__(self, max_traces: int):
+        self._traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+        self.exporter = None
+        self.kept = 0
+        self.discarded = 0
+
+    def finish(self, root: Span, failed: bool):
+        """Keep the trace if it was sampled, failed, or was slower than trace_slow_ms"""
+        trace = root.trace
+        if not (trace.sampled or failed or root.duration_ms >= settings.trace_slow_ms):
+            self.discarded += 1
+            return
+        self.kept += 1
+        with self._lock:
+            self._traces.append(trace)
+        if self.exporter is not None:
+            self.exporter.export(trace)
+
+    def recent(self, limit: Optional[int] = None) -> list:
+        with self._lock:
+            traces = list(self._traces)
+        traces.reverse()
+        return traces[:limit]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+
+class TraceExporter:
+    """
+    Writes kept traces from a background thread, one JSON document per trace
+
+    target "file" appends NDJSON to trace_export_path; target "otlp_http"
+    POSTs OTLP/JSON to trace_export_endpoint (an OpenTelemetry collector or
+    any stand-in accepting /v1/traces). Traces are dropped, never waited
+    for, when the export queue is full.
+    """
+
+    def __init__(self, target: str, export_format: str, path: str, endpoint: str, queue_size: int = 1000):
+        self.target = target
+        self.format = "otlp" if target == "otlp_http" else export_format
+        self.path = path
+        self.endpoint = endpoint
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            document = trace.as_otlp() if self.format == "otlp" else trace.as_dict()
+            try:
+                if self.target == "file":
+                    with open(self.path, "a", encoding="utf-8") as output:
+                        output.write(json.dumps(document, default=str) + "\n")
+                else:
+                    request = urllib.request.Request(
+                        self.endpoint,
+                        data=json.dumps(document, default=str).encode("utf-8"),
+                        headers={"Content-Type": "application/json"},
+                        method="POST",
+                    )
+                    urllib.request.urlopen(request, timeout=5).close()
+            except Exception as error:
+                self.dropped += 1
+                logger.warning("Trace export to %s failed: %s", self.path if self.target == "file" else self.endpoint, error)
+
+    def close(self, timeout: float = 5.0):
+        """Export what is queued, then stop the thread"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+trace_buffer = TraceBuffer(settings.trace_buffer_size)
+
+
+def start_exporter():
+    """Start the exporter selected by trace_export ("" disables export)"""
+    if settings.trace_export and trace_buffer.exporter is None:
+        trace_buffer.exporter = TraceExporter(
+            settings.trace_export,
+            settings.trace_export_format,
+            settings.trace_export_path,
+            settings.trace_export_endpoint,
+        )
+
+
+def stop_exporter():
+    if trace_buffer.exporter is not None:
+        trace_buffer.exporter.close()
+        trace_buffer.exporter = None
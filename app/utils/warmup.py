@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import inspect
+import logging
+import pkgutil
+import smtplib
+import time
+import bcrypt
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from app import models as app_models
+from app.storage import get_storage
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUpState:
+    """Readiness of this worker, reported by /health"""
+
+    def __init__(self):
+        self.ready = False
+        self.steps = {}
+        # Emails registered more than once, which keep the unique email index from being created
+        self.duplicate_emails = 0
+
+    def as_dict(self) -> dict:
+        return {"ready": self.ready, "steps": dict(self.steps), "duplicate_emails": self.duplicate_emails}
+
+
+warmup_state = WarmUpState()
+
+
+def _open_storage():
+    """Ping the storage backend, opening min_pool_size connections at once"""
+    get_storage().ping(max(settings.mongo_min_pool_size, 1))
+
+
+def _ensure_indexes():
+    """
+    Create the storage indexes, the unique email index first
+
+    Duplicated emails do not fail the step (they are logged and counted, and
+    registration keeps checking emails before inserting); errors reaching
+    the database do, so the step is retried.
+    """
+    warmup_state.duplicate_emails = len(get_storage().ensure_indexes())
+
+
+def _build_model_schemas():
+    """Build the JSON schemas of every Pydantic model in app.models"""
+    for module_info in pkgutil.iter_modules(app_models.__path__):
+        module = importlib.import_module(f"{app_models.__name__}.{module_info.name}")
+        for _, model in inspect.getmembers(module, inspect.isclass):
+            if issubclass(model, BaseModel) and model.__module__ == module.__name__:
+                model.model_rebuild()
+                model.model_json_schema()
+
+
+def _first_bcrypt_hash():
+    bcrypt.checkpw(b"warm-up", bcrypt.hashpw(b"warm-up", bcrypt.gensalt(rounds=4)))
+
+
+def _connect_smtp():
+    """Open and close one authenticated SMTP session (DNS, TCP and TLS)"""
+    if settings.smtp_use_ssl and settings.smtp_port == 465:
+        with smtplib.SMTP_SSL(settings.smtp_host, settings.smtp_port, timeout=10) as server:
+            server.login(settings.email_user, settings.email_pass)
+    else:
+        with smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=10) as server:
+            if settings.smtp_starttls:
+                server.starttls()
+            server.login(settings.email_user, settings.email_pass)
+
+
+async def _step(name: str, func, required: bool):
+    """Run one warm-up step in the threadpool, retrying required steps until they pass"""
+    while True:
+        start = time.perf_counter()
+        try:
+            await run_in_threadpool(func)
+            warmup_state.steps[name] = round((time.perf_counter() - start) * 1000, 2)
+            return
+        except Exception as error:
+            if not required:
+                logger.warning("Warm-up step %s failed: %s", name, error)
+                warmup_state.steps[name] = "failed"
+                return
+            logger.error("Warm-up step %s failed, retrying: %s", name, error)
+            await asyncio.sleep(settings.warmup_retry_interval_s)
+
+
+async def warm_up(app):
+    """
+    Pay the first-request costs before the worker reports ready
+
+    Opens the storage connection pool, creates the storage indexes, builds the model schemas and the OpenAPI document,
+    runs a first bcrypt hash and optionally opens an SMTP session.
+
+    Args:
+        app: The FastAPI application
+    """
+    start = time.perf_counter()
+    await _step("storage", _open_storage, required=True)
+    await _step("indexes", _ensure_indexes, required=True)
+    await _step("models", _build_model_schemas, required=True)
+    await _step("openapi", app.openapi, required=True)
+    await _step("bcrypt", _first_bcrypt_hash, required=True)
+    if settings.warmup_smtp:
+        await _step("smtp", _connect_smtp, required=False)
+
+    warmup_state.ready = True
+    logger.info("Warm-up finished in %.1f ms: %s", (time.perf_counter() - start) * 1000, warmup_state.steps)
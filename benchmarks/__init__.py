@@ -0,0 +1 @@
+# In-process load and benchmark suite, run with `python -m benchmarks`
@@ -0,0 +1,114 @@
+"""
+Benchmark every router of the API in-process.
+
+Drives the real FastAPI app through an ASGI client against mongomock (or a
+local mongod with --mongodb-uri, or the in-memory backend with --storage
+memory) and a local SMTP sink, then reports
+throughput, p50/p95/p99 latency and the MongoDB round trips and storage
+operations made on the request path, per request, for each endpoint.
+
+    python -m benchmarks --requests 200 --concurrency 20
+    python -m benchmarks --storage memory          # app overhead without a database
+    python -m benchmarks --save-baseline           # store benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import platform
+import sys
+from datetime import datetime, timezone
+
+from .harness import configure_environment, load_app, reset_storage
+from .runner import compare, format_table, load_baseline, run_scenario, save_results
+from .smtp_sink import SMTPSink
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per scenario before measuring")
+    parser.add_argument("--scenarios", nargs="*", help="only run these scenarios")
+    parser.add_argument("--mongodb-uri", help="use a real MongoDB (its 'benchmark' database is dropped) instead of mongomock")
+    parser.add_argument("--storage", choices=("mongo", "memory"), default="mongo", help="storage backend (default mongo)")
+    parser.add_argument("--load-shedding", action="store_true", help="keep load shedding enabled during the run")
+    parser.add_argument("--baseline", help="compare against this baseline file and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed regression as a fraction (default 0.15)")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="write results as the new baseline")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--log-level", default="WARNING", help="app log level during the run")
+    return parser.parse_args(argv)
+
+
+async def run_all(app, storage, scenarios, args) -> dict:
+    import httpx
+    from app.utils.warmup import warm_up
+
+    # Same warm-up a worker does at startup, so the first scenario isn't cold
+    await warm_up(app)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for scenario in scenarios:
+            if args.warmup:
+                await run_scenario(client, scenario, storage, args.warmup, min(args.concurrency, args.warmup))
+            results[scenario.name] = await run_scenario(client, scenario, storage, args.requests, args.concurrency)
+            print(f"  {scenario.name}: {results[scenario.name]['throughput']:.1f} req/s", file=sys.stderr)
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    with SMTPSink() as sink:
+        configure_environment(sink.host, sink.port, args.mongodb_uri, log_level=args.log_level,
+                              storage_backend=args.storage, load_shedding=args.load_shedding)
+        app, storage = load_app(use_mongomock=args.mongodb_uri is None)
+
+        from .scenarios import SCENARIOS
+        scenarios = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+        if not scenarios:
+            print(f"No scenarios selected, choose from: {', '.join(s.name for s in SCENARIOS)}", file=sys.stderr)
+            return 2
+
+        reset_storage(storage)
+        try:
+            results = asyncio.run(run_all(app, storage, scenarios, args))
+        finally:
+            reset_storage(storage)
+
+    print(format_table(results))
+    if results and not any(result.get("db_round_trips") for result in results.values()):
+        print("No MongoDB wire commands were observed (mongomock or memory storage): round trips are "
+              "unmeasured, and db ops counts storage calls, not round trips")
+
+    metadata = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "database": "memory" if args.storage == "memory" else "mongod" if args.mongodb_uri else "mongomock",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+    if args.output:
+        save_results(args.output, results, metadata)
+    if args.save_baseline:
+        save_results(args.save_baseline, results, metadata)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
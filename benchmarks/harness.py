@@ -0,0 +1,62 @@
+import os
+from typing import Optional
+
+
+def configure_environment(smtp_host: str, smtp_port: int, mongodb_uri: Optional[str] = None,
+                          database_name: str = "benchmark", log_level: str = "WARNING",
+                          storage_backend: str = "mongo", load_shedding: bool = False):
+    """
+    Point the app's Settings at the local stand-ins.
+
+    Must run before anything under app/ is imported, since settings are read
+    from the environment at import time.
+    """
+    os.environ.update({
+        "MONGODB_URI": mongodb_uri or "mongodb://localhost:27017/",
+        "DATABASE_NAME": database_name,
+        "EMAIL_USER": "benchmark@example.com",
+        "EMAIL_PASS": "benchmark",
+        "SMTP_HOST": smtp_host,
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USE_SSL": "false",
+        "SMTP_STARTTLS": "false",
+        "LOG_LEVEL": log_level,
+        "STORAGE_BACKEND": storage_backend,
+        # Off by default: the suite measures latency, not 503s from a saturated limit
+        "LOAD_SHEDDING_ENABLED": "true" if load_shedding else "false",
+    })
+
+
+def load_app(use_mongomock: bool = True):
+    """
+    Import the FastAPI app and connect it to the storage stand-in
+
+    Args:
+        use_mongomock: Use an in-process mongomock client instead of MONGODB_URI
+            (ignored with the memory storage backend)
+
+    Returns:
+        tuple: (FastAPI app, storage backend)
+    """
+    from app.config.database import Database
+    from app.config.settings import settings
+    from app.storage import get_storage
+
+    if use_mongomock and settings.storage_backend == "mongo":
+        import mongomock
+        Database.client = mongomock.MongoClient()
+        Database.db = Database.client[settings.database_name]
+
+    from app.main import app
+    return app, get_storage()
+
+
+def reset_storage(storage):
+    """Drop every collection the benchmark may have written to (MongoDB only)"""
+    from app.storage.mongo import MongoStorage
+
+    if isinstance(storage, MongoStorage):
+        from app.config.database import Database
+        db = Database.get_db()
+        for name in db.list_collection_names():
+            db.drop_collection(name)
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import math
+import re
+import time
+
+
+_SERVER_TIMING_COUNT = re.compile(r'(db|storage);[^,]*desc="(\d+) ')
+
+
+def request_db_usage(response) -> tuple:
+    """
+    Database use of one request, read from its Server-Timing header
+
+    Only the request path counts: background writes (audit log, analytics)
+    and maintenance jobs are not attributed to any request.
+
+    Returns:
+        tuple: (MongoDB round trips seen by the command listener, storage operations)
+    """
+    counts = dict(_SERVER_TIMING_COUNT.findall(response.headers.get("server-timing", "")))
+    return int(counts.get("db", 0)), int(counts.get("storage", 0))
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(client, scenario, storage, requests: int, concurrency: int) -> dict:
+    """
+    Drive one scenario with a fixed number of requests at a fixed concurrency
+
+    Returns:
+        dict: requests, errors, throughput (req/s), p50/p95/p99/max latency (ms)
+        and, per request, MongoDB round trips (db_round_trips, zero with
+        mongomock or memory storage, which issue no wire commands) and storage
+        operations (db_ops, counted by both backends)
+    """
+    context = scenario.prepare(storage, requests)
+    latencies = []
+    errors = 0
+    round_trips = 0
+    operations = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, round_trips, operations, next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            path, body = scenario.build(index, context)
+            start = time.perf_counter()
+            response = await client.request(scenario.method, path, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            request_round_trips, request_operations = request_db_usage(response)
+            round_trips += request_round_trips
+            operations += request_operations
+            if response.status_code not in scenario.expected:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "db_round_trips": round(round_trips / requests, 2) if requests else 0.0,
+        "db_ops": round(operations / requests, 2) if requests else 0.0,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Flag scenarios that regressed against a stored baseline
+
+    A scenario regresses when its p95 latency, MongoDB round trips or
+    storage operations per request grow, or its throughput drops, by more than `tolerance` (a
+    fraction, e.g. 0.15 for 15%).
+
+    Returns:
+        list: Human readable regression descriptions
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']:.2f} ms -> {current['p95_ms']:.2f} ms"
+            )
+        if previous["throughput"] and current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput']:.1f} -> {current['throughput']:.1f} req/s"
+            )
+        previous_round_trips = previous.get("db_round_trips")
+        if previous_round_trips is not None and current["db_round_trips"] > previous_round_trips * (1 + tolerance):
+            regressions.append(
+                f"{name}: MongoDB round trips per request {previous_round_trips:.2f} -> {current['db_round_trips']:.2f}"
+            )
+        if previous.get("db_ops") is not None and current["db_ops"] > previous["db_ops"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: storage operations per request {previous['db_ops']:.2f} -> {current['db_ops']:.2f}"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def format_table(results: dict) -> str:
+    header = (
+        f"{'scenario':<18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        f" {'db rt':>7} {'db ops':>7} {'errors':>7}"
+    )
+    lines = [header, "-" * len(header)]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<18} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['max_ms']:>9.2f} "
+            f"{result.get('db_round_trips', 0.0):>7.2f} {result.get('db_ops', 0.0):>7.2f} {result['errors']:>7}"
+        )
+    return "\n".join(lines)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as baseline_file:
+        return json.load(baseline_file)["results"]
+
+
+def save_results(path: str, results: dict, metadata: dict):
+    with open(path, "w") as output_file:
+        json.dump({"metadata": metadata, "results": results}, output_file, indent=2, sort_keys=True)
@@ -0,0 +1,180 @@
+import uuid
+from datetime import datetime
+import bcrypt
+
+PASSWORD = "benchmark-password"
+OTP = "123456"
+
+
+class Scenario:
+    """
+    One endpoint under load
+
+    Args:
+        name: Scenario name used in reports and baselines
+        method: HTTP method
+        build: Callable (index, context) -> (path, json body or None)
+        prepare: Optional callable (storage, count) -> context, run before timing starts
+        expected: Status codes counted as successes
+    """
+
+    def __init__(self, name, method, build, prepare=None, expected=(200, 201)):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.prepare = prepare or (lambda storage, count: {})
+        self.expected = set(expected)
+
+
+_password_hash = None
+
+
+def _hashed_password() -> str:
+    # Hash once, every seeded user shares it
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return _password_hash
+
+
+def _insert_users(storage, count: int, **fields) -> list:
+    prefix = uuid.uuid4().hex[:8]
+    users = [
+        {
+            "email": f"bench-{prefix}-{index}@example.com",
+            "password": _hashed_password(),
+            "role": "client",
+            "firstLogin": True,
+            "verified": True,
+            "companyName": "Benchmark Inc",
+            "phoneNumber": "+10000000000",
+            **fields,
+        }
+        for index in range(count)
+    ]
+    for user in users:
+        storage.users.insert(user)
+    return users
+
+
+def _insert_assistants(storage, user_id, count: int) -> list:
+    now = datetime.utcnow()
+    assistants = [
+        {
+            "user_id": user_id,
+            "name": f"Assistant {index}",
+            "system_message": "You are a helpful voice assistant for a benchmark.",
+            "voice": "alloy",
+            "temperature": 0.6,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+    for assistant in assistants:
+        storage.assistants.insert(assistant)
+    return assistants
+
+
+def _single_user(storage, count):
+    return {"user": _insert_users(storage, 1)[0]}
+
+
+def _users_with_otp(storage, count):
+    return {"users": _insert_users(storage, count, verified=False, otp=OTP)}
+
+
+def _user_with_assistants(storage, count):
+    user = _insert_users(storage, 1)[0]
+    assistants = _insert_assistants(storage, user["_id"], 10)
+    return {"user": user, "assistants": assistants}
+
+
+def _assistants_to_delete(storage, count):
+    user = _insert_users(storage, 1)[0]
+    return {"assistants": _insert_assistants(storage, user["_id"], count)}
+
+
+def _run_prefix(storage, count):
+    return {"prefix": uuid.uuid4().hex[:8]}
+
+
+def _assistant_body(user) -> dict:
+    return {
+        "user_id": str(user["_id"]),
+        "name": "Benchmark assistant",
+        "system_message": "You are a helpful voice assistant for a benchmark.",
+        "voice": "alloy",
+        "temperature": 0.7,
+    }
+
+
+SCENARIOS = [
+    Scenario("health", "GET", lambda i, ctx: ("/health", None)),
+    Scenario(
+        "check_user", "POST",
+        lambda i, ctx: ("/api/register/check-user", {"email": ctx["user"]["email"]}),
+        prepare=_single_user,
+    ),
+    Scenario(
+        "register", "POST",
+        lambda i, ctx: ("/api/register/", {
+            "email": f"bench-register-{ctx['prefix']}-{i}@example.com",
+            "password": PASSWORD,
+            "companyName": "Benchmark Inc",
+            "phoneNumber": "+10000000000",
+        }),
+        prepare=_run_prefix,
+    ),
+    Scenario(
+        "verify_email", "POST",
+        lambda i, ctx: ("/api/register/verify-email", {"email": ctx["users"][i]["email"], "otp": OTP}),
+        prepare=_users_with_otp,
+    ),
+    Scenario(
+        "login", "POST",
+        lambda i, ctx: ("/api/access/login", {"email": ctx["user"]["email"], "password": PASSWORD}),
+        prepare=_single_user,
+    ),
+    Scenario("logout", "POST", lambda i, ctx: ("/api/access/logout", None)),
+    Scenario(
+        "send_otp", "POST",
+        lambda i, ctx: ("/api/forgot_password/send-otp", {"email": ctx["user"]["email"]}),
+        prepare=_single_user,
+    ),
+    Scenario(
+        "verify_otp", "POST",
+        lambda i, ctx: ("/api/forgot_password/verify-otp", {"email": ctx["users"][i]["email"], "otp": OTP}),
+        prepare=_users_with_otp,
+    ),
+    Scenario(
+        "reset_password", "POST",
+        lambda i, ctx: ("/api/forgot_password/reset-password", {"email": ctx["user"]["email"], "newPassword": PASSWORD}),
+        prepare=_single_user,
+    ),
+    Scenario(
+        "create_assistant", "POST",
+        lambda i, ctx: ("/api/ai-assistants/", _assistant_body(ctx["user"])),
+        prepare=_single_user,
+    ),
+    Scenario(
+        "list_assistants", "GET",
+        lambda i, ctx: (f"/api/ai-assistants/user/{ctx['user']['_id']}", None),
+        prepare=_user_with_assistants,
+    ),
+    Scenario(
+        "get_assistant", "GET",
+        lambda i, ctx: (f"/api/ai-assistants/{ctx['assistants'][i % 10]['_id']}", None),
+        prepare=_user_with_assistants,
+    ),
+    Scenario(
+        "update_assistant", "PUT",
+        lambda i, ctx: (f"/api/ai-assistants/{ctx['assistants'][i % 10]['_id']}", {"temperature": 0.5}),
+        prepare=_user_with_assistants,
+    ),
+    Scenario(
+        "delete_assistant", "DELETE",
+        lambda i, ctx: (f"/api/ai-assistants/{ctx['assistants'][i]['_id']}", None),
+        prepare=_assistants_to_delete,
+    ),
+]
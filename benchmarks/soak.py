@@ -0,0 +1,370 @@
+"""
+Soak test: a long mixed workload with memory growth and leak detection.
+
+Drives the real app in-process (like python -m benchmarks) against mongomock
+or a local mongod and the local SMTP sink for a fixed duration. The mix
+covers logins, OTP mail, registrations (cleaned up as it goes, so stored
+data stays flat), assistant reads and writes and config bundles. Every
+--sample-every seconds it records RSS, tracemalloc's traced memory and gc
+statistics; after the run it fits growth per 10k requests and diffs
+allocation snapshots by code location and live objects by type.
+
+The run fails (exit 1) when RSS or traced memory grows faster than the
+thresholds after the warm-up, during which pools, caches and ring
+buffers fill up to their steady size.
+
+    python -m benchmarks.soak --duration 3600 --concurrency 16
+    python -m benchmarks.soak --duration 300 --output soak.json
+    python -m benchmarks.soak --mongodb-uri mongodb://localhost:27017/ --tracemalloc-frames 10
+"""
+import argparse
+import asyncio
+import collections
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from .harness import configure_environment, load_app, reset_storage
+from .scenarios import OTP, PASSWORD, _insert_assistants, _insert_users
+from .smtp_sink import SMTPSink
+
+# Relative frequency of each operation in the mix
+MIX = {
+    "health": 5,
+    "check_user": 10,
+    "login": 3,
+    "logout": 3,
+    "register": 2,
+    "send_otp": 3,
+    "verify_otp": 5,
+    "reset_password": 1,
+    "list_assistants": 15,
+    "get_assistant": 20,
+    "assistant_bundle": 10,
+    "update_assistant": 10,
+    "create_assistant": 5,
+    "delete_assistant": 5,
+}
+
+# Registered users are deleted every this many requests
+CLEANUP_EVERY = 1000
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def type_counts() -> collections.Counter:
+    return collections.Counter(type(obj).__qualname__ for obj in gc.get_objects())
+
+
+def take_sample(started: float, requests: int, errors: int) -> dict:
+    traced, peak = tracemalloc.get_traced_memory()
+    return {
+        "elapsed_s": round(time.monotonic() - started, 1),
+        "requests": requests,
+        "errors": errors,
+        "rss_mb": round(rss_mb(), 2),
+        "traced_mb": round(traced / 2**20, 3),
+        "traced_peak_mb": round(peak / 2**20, 3),
+        "gc_objects": len(gc.get_objects()),
+        "gc_counts": gc.get_count(),
+        "gc_collections": [generation["collections"] for generation in gc.get_stats()],
+        "gc_uncollectable": sum(generation["uncollectable"] for generation in gc.get_stats()),
+    }
+
+
+def growth_per_10k(samples: list, field: str) -> float:
+    """Least-squares slope of `field` against the request count, per 10k requests"""
+    points = [(sample["requests"], sample[field]) for sample in samples]
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return 0.0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+    return round(slope * 10_000, 3)
+
+
+class Workload:
+    """Seeded users and assistants plus a builder for each operation in MIX"""
+
+    def __init__(self, storage, seed: int):
+        self.storage = storage
+        self.random = random.Random(seed)
+        self.operations = list(MIX)
+        self.weights = [MIX[name] for name in self.operations]
+        self.prefix = uuid.uuid4().hex[:8]
+        self.registered = 0
+        self.created = collections.deque()
+
+        self.user = _insert_users(storage, 1)[0]
+        self.otp_users = _insert_users(storage, 20, otp=OTP)
+        self.mail_user = _insert_users(storage, 1)[0]
+        self.assistants = _insert_assistants(storage, self.user["_id"], 10)
+
+    def next_request(self):
+        """
+        Pick the next operation
+
+        Returns:
+            tuple: (name, method, path, json body or None, expected status codes)
+        """
+        name = self.random.choices(self.operations, self.weights)[0]
+        if name == "delete_assistant" and not self.created:
+            name = "create_assistant"
+        assistant = self.random.choice(self.assistants)
+        user_id = self.user["_id"]
+
+        if name == "health":
+            return name, "GET", "/health", None, (200,)
+        if name == "check_user":
+            return name, "POST", "/api/register/check-user", {"email": self.user["email"]}, (200,)
+        if name == "login":
+            return name, "POST", "/api/access/login", {"email": self.user["email"], "password": PASSWORD}, (200,)
+        if name == "logout":
+            return name, "POST", "/api/access/logout", None, (200,)
+        if name == "register":
+            self.registered += 1
+            return name, "POST", "/api/register/", {
+                "email": f"soak-{self.prefix}-{self.registered}@example.com",
+                "password": PASSWORD,
+                "companyName": "Soak Inc",
+                "phoneNumber": "+10000000000",
+            }, (201,)
+        if name == "send_otp":
+            return name, "POST", "/api/forgot_password/send-otp", {"email": self.mail_user["email"]}, (200,)
+        if name == "verify_otp":
+            email = self.random.choice(self.otp_users)["email"]
+            return name, "POST", "/api/forgot_password/verify-otp", {"email": email, "otp": OTP}, (200,)
+        if name == "reset_password":
+            return name, "POST", "/api/forgot_password/reset-password", {"email": self.user["email"], "newPassword": PASSWORD}, (200,)
+        if name == "list_assistants":
+            return name, "GET", f"/api/ai-assistants/user/{user_id}", None, (200,)
+        if name == "get_assistant":
+            return name, "GET", f"/api/ai-assistants/{assistant['_id']}", None, (200,)
+        if name == "assistant_bundle":
+            return name, "GET", f"/api/ai-assistants/user/{user_id}/bundle", None, (200,)
+        if name == "update_assistant":
+            body = {"temperature": round(self.random.uniform(0, 2), 2)}
+            return name, "PUT", f"/api/ai-assistants/{assistant['_id']}", body, (200,)
+        if name == "create_assistant":
+            return name, "POST", "/api/ai-assistants/", {
+                "user_id": str(user_id),
+                "name": "Soak assistant",
+                "system_message": "You are a helpful voice assistant for a soak test.",
+                "voice": self.random.choice(("alloy", "echo", "nova")),
+                "temperature": 0.7,
+            }, (201,)
+        return name, "DELETE", f"/api/ai-assistants/{self.created.popleft()}", None, (200,)
+
+    def completed(self, name: str, response):
+        if name == "create_assistant" and response.status_code == 201:
+            self.created.append(response.json()["id"])
+
+    def clean_up(self):
+        """Delete users registered so far (the seeded users are all verified)"""
+        self.storage.users.delete_unverified(datetime.utcnow() + timedelta(days=1), 1_000_000)
+
+
+async def soak(app, storage, args) -> dict:
+    import httpx
+    from starlette.concurrency import run_in_threadpool
+    from app.utils.warmup import warm_up
+
+    await warm_up(app)
+    workload = Workload(storage, args.seed)
+    started = time.monotonic()
+    deadline = started + args.duration
+    warmup_until = started + args.warmup
+    counts = collections.Counter()
+    failures = collections.Counter()
+    requests = 0
+    errors = 0
+    samples = []
+    baseline = None
+
+    async def worker(client):
+        nonlocal requests, errors
+        while time.monotonic() < deadline:
+            name, method, path, body, expected = workload.next_request()
+            response = await client.request(method, path, json=body)
+            workload.completed(name, response)
+            counts[name] += 1
+            requests += 1
+            if response.status_code not in expected:
+                errors += 1
+                failures[f"{name} {response.status_code}"] += 1
+            if requests % CLEANUP_EVERY == 0:
+                await run_in_threadpool(workload.clean_up)
+
+    async def sampler():
+        nonlocal baseline
+        next_sample = warmup_until
+        while time.monotonic() < deadline:
+            await asyncio.sleep(max(0.0, min(next_sample, deadline) - time.monotonic()))
+            if time.monotonic() >= deadline:
+                break
+            gc.collect()
+            if baseline is None:
+                # Everything after warm-up is compared to this. Taken before
+                # the first sample so the snapshot's own memory is in every RSS reading
+                baseline = {"snapshot": tracemalloc.take_snapshot(), "types": type_counts()}
+                print(f"  warm-up done after {requests} requests", file=sys.stderr)
+            sample = take_sample(started, requests, errors)
+            samples.append(sample)
+            print(
+                f"  {sample['elapsed_s']:>7}s {requests:>8} req  RSS {sample['rss_mb']:>8} MB"
+                f"  traced {sample['traced_mb']:>8} MB  objects {sample['gc_objects']}",
+                file=sys.stderr,
+            )
+            next_sample += args.sample_every
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://soak", timeout=60) as client:
+        await asyncio.gather(sampler(), *(worker(client) for _ in range(args.concurrency)))
+
+    gc.collect()
+    final = take_sample(started, requests, errors)
+    samples.append(final)
+    report = {
+        "requests": requests,
+        "errors": errors,
+        "failures": dict(failures.most_common()),
+        "mix": dict(counts.most_common()),
+        "samples": samples,
+        "growth_per_10k": {
+            field: growth_per_10k(samples, field)
+            for field in ("rss_mb", "traced_mb", "gc_objects")
+        },
+        "top_allocation_growth": [],
+        "top_object_growth": [],
+    }
+    if baseline is not None:
+        types = type_counts()
+        types.subtract(baseline["types"])
+        report["top_object_growth"] = [
+            {"type": name, "count_diff": count}
+            for name, count in types.most_common(args.top) if count > 0
+        ]
+        snapshot = tracemalloc.take_snapshot()
+        filters = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+        diff = snapshot.filter_traces(filters).compare_to(baseline["snapshot"].filter_traces(filters), args.group_by)
+        report["top_allocation_growth"] = [
+            {
+                "site": [str(frame) for frame in stat.traceback],
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count_diff": stat.count_diff,
+            }
+            for stat in diff[:args.top] if stat.size_diff > 0
+        ]
+    return report
+
+
+def verdict(report: dict, args) -> list:
+    """Threshold violations, as human readable lines"""
+    problems = []
+    post_warmup = [sample for sample in report["samples"] if sample["elapsed_s"] >= args.warmup]
+    if len(post_warmup) < 3:
+        problems.append(f"only {len(post_warmup)} samples after warm-up; run longer or sample more often")
+        return problems
+    growth = report["growth_per_10k"]
+    if growth["rss_mb"] > args.max_rss_growth:
+        problems.append(f"RSS grows {growth['rss_mb']} MB per 10k requests (limit {args.max_rss_growth})")
+    if growth["traced_mb"] > args.max_traced_growth:
+        problems.append(f"traced memory grows {growth['traced_mb']} MB per 10k requests (limit {args.max_traced_growth})")
+    if report["samples"][-1]["gc_uncollectable"]:
+        problems.append(f"{report['samples'][-1]['gc_uncollectable']} uncollectable objects")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.soak", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=600.0, help="seconds to run (default 600)")
+    parser.add_argument("--warmup", type=float, default=60.0, help="seconds before growth is measured (default 60)")
+    parser.add_argument("--sample-every", type=float, default=30.0, help="seconds between samples (default 30)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--max-rss-growth", type=float, default=5.0, help="allowed RSS growth, MB per 10k requests")
+    parser.add_argument("--max-traced-growth", type=float, default=2.0, help="allowed traced memory growth, MB per 10k requests")
+    parser.add_argument("--tracemalloc-frames", type=int, default=1, help="frames kept per allocation (more is slower)")
+    parser.add_argument("--group-by", choices=("lineno", "filename", "traceback"), default="lineno",
+                        help="how allocation growth is grouped")
+    parser.add_argument("--top", type=int, default=15, help="allocation sites and object types to report")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the request mix")
+    parser.add_argument("--mongodb-uri", help="use a real MongoDB (its 'benchmark' database is dropped) instead of mongomock")
+    parser.add_argument("--audit", action="store_true",
+                        help="keep the audit log on (its retained events then count as growth)")
+    parser.add_argument("--output", help="write the full report as JSON to this path")
+    parser.add_argument("--log-level", default="ERROR", help="app log level during the run")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start(args.tracemalloc_frames)
+    with SMTPSink() as sink:
+        configure_environment(sink.host, sink.port, args.mongodb_uri, log_level=args.log_level)
+        # Retained data, not leaks: don't let them read as growth
+        os.environ.setdefault("AUDIT_ENABLED", "true" if args.audit else "false")
+        os.environ.setdefault("MAINTENANCE_ENABLED", "false")
+        # Small ring buffers fill up during warm-up instead of growing through the run
+        os.environ.setdefault("SSE_REPLAY_BUFFER_SIZE", "50")
+        os.environ.setdefault("TRACE_BUFFER_SIZE", "20")
+        app, storage = load_app(use_mongomock=args.mongodb_uri is None)
+
+        reset_storage(storage)
+        try:
+            report = asyncio.run(soak(app, storage, args))
+        finally:
+            reset_storage(storage)
+    tracemalloc.stop()
+
+    report["created_at"] = datetime.now(timezone.utc).isoformat()
+    report["arguments"] = vars(args)
+    problems = verdict(report, args)
+    report["passed"] = not problems
+
+    print(f"\n{report['requests']} requests, {report['errors']} errors")
+    for field, value in report["growth_per_10k"].items():
+        print(f"  {field:<10} {value:>10} per 10k requests")
+    if report["top_allocation_growth"]:
+        print("\nAllocation growth since warm-up:")
+        for stat in report["top_allocation_growth"]:
+            print(f"  {stat['size_diff_kb']:>10} KiB {stat['count_diff']:>8}  {stat['site'][-1] if stat['site'] else '?'}")
+    if report["top_object_growth"]:
+        print("\nLive object growth since warm-up:")
+        for entry in report["top_object_growth"]:
+            print(f"  {entry['count_diff']:>10}  {entry['type']}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2, default=str)
+
+    if problems:
+        print("\nSoak test FAILED:")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+    print("\nSoak test passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Throughput scaling with the number of uvicorn workers.
+
+Starts the production server configuration (app.server.build_config) with
+1, 2, 4, ... workers on a local port and drives it over real TCP sockets.
+Every worker gets its own mongomock database seeded with the same user and
+assistant, plus the shared local SMTP sink.
+
+    python -m benchmarks.workers --workers 1 2 4 --requests 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from bson import ObjectId
+
+from .harness import configure_environment
+from .runner import format_table, percentile
+from .smtp_sink import SMTPSink
+
+USER_ID = ObjectId("650000000000000000000001")
+ASSISTANT_ID = ObjectId("650000000000000000000002")
+EMAIL = "workers-benchmark@example.com"
+PASSWORD = "benchmark-password"
+
+
+def create_app():
+    """uvicorn app factory run inside each worker process"""
+    from datetime import datetime
+    import mongomock
+    from app.config.database import Database
+    from app.config.settings import settings
+
+    Database.client = mongomock.MongoClient()
+    Database.db = Database.client[settings.database_name]
+    now = datetime.utcnow()
+    Database.db["users"].insert_one({
+        "_id": USER_ID,
+        "email": EMAIL,
+        "password": os.environ["BENCHMARK_PASSWORD_HASH"],
+        "role": "client",
+        "verified": True,
+    })
+    Database.db["assistants"].insert_one({
+        "_id": ASSISTANT_ID,
+        "user_id": USER_ID,
+        "name": "Benchmark assistant",
+        "system_message": "You are a helpful voice assistant for a benchmark.",
+        "voice": "alloy",
+        "temperature": 0.6,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+    from app.main import app
+    return app
+
+
+def _serve(workers: int, port: int):
+    import uvicorn
+    from app.server import build_config
+
+    uvicorn.run(
+        "benchmarks.workers:create_app",
+        **build_config(host="127.0.0.1", port=port, workers=workers, proxy_headers=False),
+        factory=True,
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(port: int, timeout: float = 60.0):
+    """Poll /health until the workers have finished warming up"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (OSError, urllib.error.URLError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} was not ready within {timeout}s")
+
+
+async def _drive(port: int, method: str, path: str, body, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    latencies = []
+    errors = 0
+    next_index = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors, next_index
+            while next_index < requests:
+                next_index += 1
+                start = time.perf_counter()
+                response = await client.request(method, path, json=body)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.workers", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        _serve(args.serve, args.port)
+        return 0
+
+    import bcrypt
+
+    scenarios = [
+        ("login", "POST", "/api/access/login", {"email": EMAIL, "password": PASSWORD}),
+        ("get_assistant", "GET", f"/api/ai-assistants/{ASSISTANT_ID}", None),
+    ]
+    results = {}
+
+    with SMTPSink() as sink:
+        configure_environment(sink.host, sink.port)
+        os.environ["LOOP_MONITOR_ENABLED"] = "false"
+        os.environ["BENCHMARK_PASSWORD_HASH"] = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+        for workers in args.workers:
+            port = _free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.workers", "--serve", str(workers), "--port", str(port)],
+                env=os.environ.copy(),
+            )
+            try:
+                _wait_until_ready(port)
+                for name, method, path, body in scenarios:
+                    asyncio.run(_drive(port, method, path, body, min(20, args.requests), args.concurrency))
+                    result = asyncio.run(_drive(port, method, path, body, args.requests, args.concurrency))
+                    results[f"{name} x{workers}"] = result
+                    print(f"  {name} with {workers} worker(s): {result['throughput']:.1f} req/s", file=sys.stderr)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+
+    print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())